@@ -0,0 +1,81 @@
+"""
+Бенчмарк функций копирования файлов: shutil.copy2 против fast_copy_file
+(copy_file_range / sendfile + posix_fallocate) на множестве мелких JPEG и нескольких крупных файлах.
+
+Запуск: python benchmarks/benchmark_copy_function.py [--small 2000] [--small-kb 300] [--large 3] [--large-mb 256] [--dest ПУТЬ]
+"""
+import argparse
+import functools
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_renamer import fast_copy_file
+
+
+def make_files(folder, count, size):
+    """Создаёт count файлов заданного размера"""
+    os.makedirs(folder)
+    payload = os.urandom(min(size, 4 * 1024 * 1024))
+    for i in range(count):
+        with open(os.path.join(folder, f"img_{i:05d}.jpg"), "wb") as f:
+            written = 0
+            while written < size:
+                part = payload[:size - written]
+                f.write(part)
+                written += len(part)
+
+
+def run(copy_function, source, dest):
+    """Копирует все файлы папки и возвращает время в секундах"""
+    os.makedirs(dest)
+    names = os.listdir(source)
+    started = time.perf_counter()
+    for name in names:
+        copy_function(os.path.join(source, name), os.path.join(dest, name))
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(dest)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--small", type=int, default=2000)
+    parser.add_argument("--small-kb", type=int, default=300)
+    parser.add_argument("--large", type=int, default=3)
+    parser.add_argument("--large-mb", type=int, default=256)
+    parser.add_argument("--dest", help="папка назначения (по умолчанию во временной папке)")
+    args = parser.parse_args()
+
+    functions = {
+        "shutil.copy2": shutil.copy2,
+        "fast_copy_file": fast_copy_file,
+        "fast_copy_file без copystat": functools.partial(fast_copy_file, preserve_metadata=False),
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="renamer_bench_")
+    try:
+        sets = {
+            f"{args.small} x {args.small_kb} КБ": (os.path.join(work_dir, "small"), args.small, args.small_kb * 1024),
+            f"{args.large} x {args.large_mb} МБ": (os.path.join(work_dir, "large"), args.large, args.large_mb * 1024 * 1024),
+        }
+        dest_root = args.dest or os.path.join(work_dir, "dest")
+
+        for title, (folder, count, size) in sets.items():
+            make_files(folder, count, size)
+            total_mb = count * size / (1024 * 1024)
+            print(f"\n{title} ({total_mb:.0f} МБ)")
+            print(f"{'функция':<30} {'сек':>8} {'файлов/с':>10} {'МБ/с':>8}")
+            for name, function in functions.items():
+                elapsed = run(function, folder, os.path.join(dest_root, "bench_copy"))
+                print(f"{name:<30} {elapsed:>8.2f} {count / elapsed:>10.0f} {total_mb / elapsed:>8.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк параллельного копирования: пропускная способность в зависимости от числа потоков.
+
+Запуск: python benchmarks/benchmark_copy_workers.py [--folders 40] [--files 30] [--size-kb 512] [--dest ПУТЬ]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_renamer import copy_folder_job, run_in_pool
+
+
+def make_synthetic_source(root, folders, files, size_kb):
+    """Создаёт папки захвата со структурой Captures/Focus/Other + BestShot"""
+    payload = os.urandom(size_kb * 1024)
+    for i in range(1, folders + 1):
+        folder = os.path.join(root, f"capture_{i}")
+        for sub in ("Captures", "Focus", "Other"):
+            os.makedirs(os.path.join(folder, sub))
+        for j in range(files):
+            sub = ("Captures", "Focus", "Other")[j % 3]
+            with open(os.path.join(folder, sub, f"img_{j}.jpg"), "wb") as f:
+                f.write(payload)
+        with open(os.path.join(folder, "BestShot.jpg"), "wb") as f:
+            f.write(payload)
+
+
+def run(source, dest_root, workers, file_workers):
+    """Копирует все папки источника и возвращает время в секундах"""
+    dest = os.path.join(dest_root, f"run_{workers}_{file_workers}")
+    folders = sorted(os.listdir(source))
+    jobs = [(os.path.join(source, name), os.path.join(dest, str(100 + i)), file_workers)
+            for i, name in enumerate(folders)]
+    started = time.perf_counter()
+    for _ in run_in_pool(copy_folder_job, jobs, workers):
+        pass
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(dest)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--folders", type=int, default=40)
+    parser.add_argument("--files", type=int, default=30)
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--file-workers", type=int, default=1)
+    parser.add_argument("--dest", help="папка назначения (по умолчанию во временной папке)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="renamer_bench_")
+    try:
+        source = os.path.join(work_dir, "source")
+        make_synthetic_source(source, args.folders, args.files, args.size_kb)
+        dest_root = args.dest or os.path.join(work_dir, "dest")
+        os.makedirs(dest_root, exist_ok=True)
+
+        total_mb = args.folders * (args.files + 1) * args.size_kb / 1024
+        print(f"Источник: {args.folders} папок, {total_mb:.0f} МБ")
+        print(f"{'потоков':>8} {'сек':>8} {'папок/с':>9} {'МБ/с':>8}")
+        for workers in args.workers:
+            elapsed = run(source, dest_root, workers, args.file_workers)
+            print(f"{workers:>8} {elapsed:>8.2f} {args.folders / elapsed:>9.1f} {total_mb / elapsed:>8.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
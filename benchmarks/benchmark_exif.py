@@ -0,0 +1,131 @@
+"""
+Бенчмарк чтения даты съёмки: разбор заголовка JPEG (read_exif_datetime) против Pillow (_getexif)
+на тысячах файлов реального размера. Файлы создаются разреженными, поэтому не занимают места на диске.
+Без Pillow замеряется только разбор заголовка.
+
+Запуск: python benchmarks/benchmark_exif.py [--files 2000] [--size-kb 3000] [--dest ПУТЬ]
+"""
+import argparse
+import datetime
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_renamer import read_exif_datetime
+
+
+def ifd(entries, offset, next_ifd=0):
+    """Собирает IFD (little-endian) с данными значений сразу за ним. Возвращает байты"""
+    data_offset = offset + 2 + len(entries) * 12 + 4
+    table = struct.pack("<H", len(entries))
+    data = b""
+    for tag, value_type, value in sorted(entries):
+        if value_type == 2:
+            raw = value.encode("ascii") + b"\0"
+            if len(raw) <= 4:
+                table += struct.pack("<HHI4s", tag, 2, len(raw), raw)
+            else:
+                table += struct.pack("<HHII", tag, 2, len(raw), data_offset + len(data))
+                data += raw
+        else:
+            table += struct.pack("<HHII", tag, 4, 1, value)
+    return table + struct.pack("<I", next_ifd) + data
+
+
+def make_exif(date, subsec, thumbnail_kb=16):
+    """Сегмент APP1 с IFD0 (камера, указатель на Exif IFD) и Exif IFD с датой съёмки"""
+    ifd0_entries = [(0x010F, 2, "Kozen"), (0x0110, 2, "Capture Rig"), (0x0132, 2, date)]
+    ifd0_size = len(ifd(ifd0_entries + [(0x8769, 4, 0)], 8))
+    exif_entries = [(0x829A, 4, 1), (0x8827, 4, 100), (0x9003, 2, date), (0x9004, 2, date),
+                    (0x9291, 2, subsec), (0xA002, 4, 4000), (0xA003, 4, 3000)]
+    tiff = b"II*\0" + struct.pack("<I", 8)
+    tiff += ifd(ifd0_entries + [(0x8769, 4, 8 + ifd0_size)], 8)
+    tiff += ifd(exif_entries, 8 + ifd0_size)
+    # Миниатюра в конце APP1, как у настоящих камер
+    tiff += os.urandom(thumbnail_kb * 1024)
+    body = b"Exif\0\0" + tiff
+    return b"\xff\xe1" + struct.pack(">H", len(body) + 2) + body
+
+
+def make_jpeg(path, date, subsec, size):
+    """Минимальный корректный заголовок JPEG с EXIF, данные изображения - случайные, файл - разреженный"""
+    jfif = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0"
+    dqt = b"\xff\xdb" + struct.pack(">H", 67) + b"\0" + bytes(range(1, 65))
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, 3000, 4000, 3) + b"\x01\x22\x00\x02\x11\x00\x03\x11\x00"
+    sos = b"\xff\xda" + struct.pack(">HB", 12, 3) + b"\x01\x00\x02\x11\x03\x11\x00\x3f\x00"
+    with open(path, "wb") as f:
+        f.write(b"\xff\xd8" + jfif + make_exif(date, subsec) + dqt + sof + sos)
+        f.write(os.urandom(64 * 1024).replace(b"\xff", b"\x00"))
+        f.truncate(size - 2)
+        f.seek(0, os.SEEK_END)
+        f.write(b"\xff\xd9")
+
+
+def pillow_date(path):
+    """Путь через Pillow, как было раньше в get_image_shooting_date"""
+    from PIL import Image
+    from PIL.ExifTags import TAGS
+    with Image.open(path) as img:
+        exif_data = img._getexif()
+        if exif_data:
+            for tag_id, value in exif_data.items():
+                if TAGS.get(tag_id, tag_id) == 'DateTimeOriginal':
+                    return datetime.datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
+    return None
+
+
+def run(function, paths):
+    """Читает дату всех файлов и возвращает (время в секундах, даты)"""
+    started = time.perf_counter()
+    dates = [function(path) for path in paths]
+    return time.perf_counter() - started, dates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--size-kb", type=int, default=3000)
+    parser.add_argument("--dest", help="папка для файлов (по умолчанию во временной папке)")
+    args = parser.parse_args()
+
+    functions = {"read_exif_datetime": read_exif_datetime}
+    try:
+        import PIL  # noqa: F401
+        functions["Pillow _getexif"] = pillow_date
+    except ImportError:
+        print("Pillow не установлен - замеряется только разбор заголовка")
+
+    work_dir = tempfile.mkdtemp(prefix="renamer_bench_", dir=args.dest)
+    try:
+        start = datetime.datetime(2024, 5, 14, 9, 0, 0)
+        paths = []
+        for i in range(args.files):
+            date = (start + datetime.timedelta(seconds=7 * i)).strftime("%Y:%m:%d %H:%M:%S")
+            path = os.path.join(work_dir, f"img_{i:05d}.jpg")
+            make_jpeg(path, date, f"{i % 1000:03d}", args.size_kb * 1024)
+            paths.append(path)
+
+        print(f"{args.files} JPEG по {args.size_kb} КБ")
+        print(f"{'способ':<22} {'сек':>8} {'файлов/с':>10}")
+        results = {}
+        for name, function in functions.items():
+            elapsed, dates = run(function, paths)
+            results[name] = dates
+            print(f"{name:<22} {elapsed:>8.3f} {args.files / elapsed:>10.0f}")
+
+        # Pillow не читает доли секунды, поэтому даты сравниваются с точностью до секунды
+        if len(results) > 1:
+            fast, slow = results.values()
+            same = all(a is not None and a.replace(microsecond=0) == b for a, b in zip(fast, slow))
+            print("Даты совпадают" if same else "Даты НЕ совпадают")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
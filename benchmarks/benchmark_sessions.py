@@ -0,0 +1,99 @@
+"""
+Бенчмарк кластеризации времени съёмки на дни и сессии: numpy, чистый Python (array('d'))
+и прежний способ со словарями datetime по дням. Моменты съёмки генерируются сессиями по нескольку дней.
+
+Запуск: python benchmarks/benchmark_sessions.py [--count 1000000] [--legacy-count 100000]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folder_renamer
+from folder_renamer import cluster_sessions_python, wall_clock_seconds
+
+
+def make_timestamps(count, seed=1):
+    """Сессии по 20-400 снимков с шагом до минуты, между сессиями - от 10 минут до 6 часов"""
+    rng = random.Random(seed)
+    moment = wall_clock_seconds(datetime.datetime(2024, 5, 14, 9, 0, 0))
+    times = array('d')
+    while len(times) < count:
+        for _ in range(rng.randint(20, 400)):
+            moment += rng.uniform(1, 60)
+            times.append(moment)
+        moment += rng.uniform(600, 6 * 3600)
+    del times[count:]
+    # Порядок обхода папок не совпадает с порядком съёмки
+    shuffled = list(times)
+    rng.shuffle(shuffled)
+    return array('d', shuffled)
+
+
+def legacy_total(times):
+    """Прежний расчёт из calculate_shooting_time: словарь дней, сортировка каждого дня, .timestamp()"""
+    shooting_times = [datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=t) for t in times]
+    shooting_times.sort()
+    days_dict = {}
+    for time_obj in shooting_times:
+        days_dict.setdefault(time_obj.date(), []).append(time_obj)
+    total_seconds = 0
+    for day_times in days_dict.values():
+        day_times.sort()
+        sessions = []
+        current_session = [day_times[0]]
+        for i in range(1, len(day_times)):
+            if (day_times[i] - day_times[i - 1]).total_seconds() > 7200:
+                sessions.append(current_session)
+                current_session = [day_times[i]]
+            else:
+                current_session.append(day_times[i])
+        sessions.append(current_session)
+        for session in sessions:
+            if len(session) > 1:
+                total_seconds += session[-1].timestamp() - session[0].timestamp()
+            else:
+                total_seconds += 30
+    return total_seconds
+
+
+def measure(function, times):
+    started = time.perf_counter()
+    result = function(times)
+    return time.perf_counter() - started, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--legacy-count", type=int, default=100000,
+                        help="прежний способ медленный, поэтому меряется на меньшем объёме")
+    args = parser.parse_args()
+
+    times = make_timestamps(args.count)
+    functions = {"чистый Python": cluster_sessions_python}
+    if folder_renamer.np is not None:
+        functions["numpy"] = folder_renamer.cluster_sessions_numpy
+    else:
+        print("numpy не установлен - замеряется только чистый Python")
+
+    print(f"{'способ':<16} {'моментов':>10} {'сек':>8} {'сессий':>8} {'итого, ч':>10}")
+    for name, function in functions.items():
+        elapsed, clusters = measure(function, times)
+        print(f"{name:<16} {len(times):>10} {elapsed:>8.3f} {len(clusters.session_start):>8} "
+              f"{clusters.total / 3600:>10.1f}")
+
+    legacy_times = times[:args.legacy_count]
+    elapsed, total = measure(legacy_total, legacy_times)
+    clusters = cluster_sessions_python(legacy_times)
+    print(f"{'прежний':<16} {len(legacy_times):>10} {elapsed:>8.3f} {'':>8} {total / 3600:>10.1f}")
+    print("Итоги совпадают" if abs(total - clusters.total) < 1e-3 * max(total, 1) else "Итоги НЕ совпадают")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,1962 @@ import datetime
 import json
 import tkinter.simpledialog
 import re
+import struct
+import sys
+import errno
+import hashlib
+import functools
+import itertools
+import math
+import contextlib
+import csv
+import threading
+import queue
+import time
+import tarfile
+import tempfile
+import zipfile
+from array import array
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    import numpy as np
+except ImportError:  # без numpy кластеризация времени съёмки идёт в чистом Python
+    np = None
+
+try:
+    import sqlite3
+except ImportError:  # сборка Python без SQLite - кэш времени съёмки не используется
+    sqlite3 = None
+
+# Устройства в порядке распределения номеров
+DEVICES = ("kozen 10", "kozen 12")
+
+# Атаки, для которых номера при замене не обязаны входить в диапазоны
+RANGE_FREE_ATTACKS = ("10 Indoors", "11 Indoors. With attributes", "12 Indoors. Backlight",
+                      "13 Indoors. Insufficient lighting", "14 Indoors. Behind transparent glass", "15 Outside")
+
+# Количество папок, копируемых одновременно по умолчанию
+DEFAULT_COPY_WORKERS = min(4, os.cpu_count() or 1)
+
+# Папок, из которых одновременно читается дата съёмки: чтение заголовков упирается
+# в задержки диска или сети, а не в процессор, поэтому потоков больше, чем при копировании
+DEFAULT_EXIF_WORKERS = 8
+
+# Отчёт по времени съёмки проекта: столбцы строк по папкам, устройствам, атакам, ID и проекту
+SHOOTING_REPORT_FIELDS = ("level", "id", "attack", "device", "number", "folders", "dated", "days", "sessions",
+                          "seconds", "duration", "first", "last")
+
+# Кластеризация времени съёмки: перерыв, после которого начинается новая сессия,
+# время одиночной сессии (секунды) и сколько сессий дня показывать в логе
+SESSION_GAP = 7200
+MIN_SESSION_SECONDS = 30
+SESSION_LOG_LIMIT = 20
+
+# Изображения, по которым определяется время съёмки, и предел проверяемых файлов на папку
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif')
+BESTSHOT_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DEFAULT_SHOOTING_PROBE_LIMIT = 20
+
+# Режимы вывода: ключ → подпись в интерфейсе
+OUTPUT_MODES = {
+    "copy": "Копирование",
+    "link": "Ссылки (reflink / жёсткие ссылки)",
+    "move": "Перемещение (исходные папки удаляются)",
+    "archive": "Архив (ZIP / TAR) вместо папок",
+}
+
+# Форматы и сжатие для режима архива
+ARCHIVE_FORMATS = {"zip": "ZIP", "tar": "TAR"}
+ARCHIVE_COMPRESSION = {"stored": "Без сжатия", "deflate": "Со сжатием (deflate / gzip)"}
+
+# Манифест папок, дописываемый последним элементом архива устройства
+ARCHIVE_MANIFEST = "manifest.jsonl"
+
+# Архивы, из которых папки источника читаются без распаковки
+SOURCE_ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Одновременных операций на один физический диск по умолчанию
+DEFAULT_DEVICE_SLOTS = 8
+
+# Если по кэшу размеров запись занимает больше этой доли свободного места,
+# объём пересчитывается обходом диска: кэш не видит файлов, перезаписанных на месте
+SPACE_RECHECK_RATIO = 0.9
+
+# Глубина вложенных папок, время изменения которых входит в отпечаток кэша размеров
+SIZE_SIGNATURE_DEPTH = 2
+
+# Форматы манифеста запуска и его столбцы: по строке на каждую обработанную папку
+RUN_MANIFEST_FORMATS = {"csv": "CSV", "jsonl": "JSONL"}
+RUN_MANIFEST_FIELDS = ("time", "kind", "source", "attack", "device", "number", "files", "bytes",
+                       "duration", "overwrite", "status", "error")
+
+# Префиксы служебных папок рядом с номерами: недокопированная копия и заменённая версия
+STAGING_PREFIX = ".staging-"
+OLD_VERSION_PREFIX = ".old-"
+
+# Корзина заменённых номеров в папке атаки: .trash/<запуск>/<устройство>/<номер>
+TRASH_DIR = ".trash"
+
+# Манифест контрольных сумм в папке атаки
+CHECKSUM_MANIFEST = ".checksums.jsonl"
+
+# Служебные элементы папки атаки, которые не считаются посторонними
+SERVICE_ENTRIES = (TRASH_DIR, CHECKSUM_MANIFEST)
+
+# Статусы заданий пакетной очереди
+QUEUE_STATUSES = {"pending": "⏳ Ожидает", "running": "▶ Выполняется", "done": "✅ Готово", "failed": "❌ Ошибка"}
+
+# Ответы на вопросы в заданиях очереди: незавершённый запуск продолжаем, остальное - нет
+UNATTENDED_ANSWERS = {"Незавершённый запуск": True}
+
+# Алгоритмы контрольных сумм и размер блока чтения при хэшировании
+HASH_ALGORITHMS = ("blake2b", "sha256")
+HASH_BUFFER = 4 * 1024 * 1024
+
+# Теги EXIF: указатель на Exif IFD, DateTimeOriginal и SubSecTimeOriginal
+EXIF_IFD_POINTER = 0x8769
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_SUBSEC_TIME_ORIGINAL = 0x9291
+
+# Кэш дат съёмки рядом с конфигурацией атак: предел записей и возраст неиспользуемых записей
+SHOOTING_CACHE_FILE = "shooting_time_cache.sqlite"
+SHOOTING_CACHE_MAX_ENTRIES = 500000
+SHOOTING_CACHE_MAX_AGE_DAYS = 90
+
+# Размер порции для copy_file_range / sendfile и буфера для обычного чтения
+KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+FALLBACK_COPY_BUFFER = 1024 * 1024
+
+# ioctl FICLONE из linux/fs.h
+FICLONE = 0x40049409
+
+# Пары устройств (источник, назначение), где reflink уже не сработал - больше не пробуем
+_reflink_unsupported_devices = set()
+
+
+class JobCancelled(BaseException):
+    """
+    Операция отменена пользователем.
+    Наследуется от BaseException, чтобы не теряться в обработчиках ошибок отдельных папок.
+    """
+
+
+class CancelToken:
+    """Флаги отмены и паузы фоновой операции, проверяемые между файлами и папками"""
+    
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.running = threading.Event()
+        self.running.set()
+    
+    def cancel(self):
+        self.cancelled.set()
+        # Будим потоки, стоящие на паузе, чтобы они увидели отмену
+        self.running.set()
+    
+    def pause(self):
+        self.running.clear()
+    
+    def resume(self):
+        self.running.set()
+    
+    @property
+    def paused(self):
+        return not self.running.is_set()
+    
+    def checkpoint(self):
+        """Ждёт снятия паузы и выбрасывает JobCancelled, если операция отменена"""
+        self.running.wait()
+        if self.cancelled.is_set():
+            raise JobCancelled()
+
+
+def with_checkpoint(copy_function, token):
+    """Оборачивает функцию копирования: перед каждым файлом проверяет паузу и отмену"""
+    if token is None:
+        return copy_function
+    
+    def copy(src, dst, *args, **kwargs):
+        token.checkpoint()
+        return copy_function(src, dst, *args, **kwargs)
+    return copy
+
+
+def mount_point(path):
+    """Точка монтирования (корень диска) для пути"""
+    path = os.path.abspath(path)
+    device = os.stat(path).st_dev
+    while True:
+        parent = os.path.dirname(path)
+        if parent == path or os.stat(parent).st_dev != device:
+            return path
+        path = parent
+
+
+def parse_io_limits(text):
+    """
+    Разбирает ограничения по дискам, по строке на диск: "<путь>: <операций>[, <МБ/с>]".
+    Возвращает {путь: (операций, байт/с)}, где 0 байт/с - без ограничения скорости.
+    """
+    limits = {}
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        path, separator, values = line.rpartition(":")
+        parts = [part.strip() for part in values.split(",")]
+        try:
+            slots = int(parts[0])
+            rate = float(parts[1]) if len(parts) > 1 and parts[1] else 0
+        except ValueError:
+            slots = rate = -1
+        if not separator or not path.strip() or slots < 1 or rate < 0:
+            raise ValueError(f"Строка {number}: ожидается \"<путь>: <операций>[, <МБ/с>]\"")
+        limits[path.strip()] = (slots, int(rate * 1024 * 1024))
+    return limits
+
+
+class IOScheduler:
+    """
+    Планировщик ввода-вывода по физическим дискам (st_dev): у каждого диска свой лимит
+    одновременных операций и необязательный лимит скорости. Быстрые диски загружаются полностью,
+    а медленные (USB-флешки) не захлёбываются от общего числа потоков.
+    """
+    
+    def __init__(self, default_slots=DEFAULT_DEVICE_SLOTS):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.configure(default_slots)
+    
+    def configure(self, default_slots, limits=None):
+        """Задаёт лимиты: limits = {st_dev: (операций, байт/с)}. Вызывается, пока операции не идут"""
+        with self.lock:
+            self.default_slots = default_slots
+            self.limits = dict(limits or {})
+            self.semaphores = {}
+            self.next_free = {}
+            self.folder_devices = {}
+            self.device_paths = {}
+    
+    def device_of(self, path):
+        """Диск, на котором лежит файл или папка (по родительской папке, с кэшем)"""
+        folder = os.path.dirname(os.path.abspath(path))
+        device = self.folder_devices.get(folder)
+        if device is None:
+            device = os.stat(folder).st_dev
+            with self.lock:
+                self.folder_devices[folder] = device
+                self.device_paths.setdefault(device, folder)
+        return device
+    
+    def semaphore(self, device):
+        with self.lock:
+            semaphore = self.semaphores.get(device)
+            if semaphore is None:
+                slots = self.limits.get(device, (self.default_slots, 0))[0]
+                semaphore = self.semaphores[device] = threading.BoundedSemaphore(slots)
+            return semaphore
+    
+    @contextlib.contextmanager
+    def slots(self, devices):
+        """Занимает по слоту на каждом диске; порядок захвата один для всех, поэтому без взаимных блокировок"""
+        semaphores = [self.semaphore(device) for device in sorted(set(devices))]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+    
+    def throttle(self, device, size):
+        """Выдерживает лимит скорости диска; до секунды простоя копится как запас"""
+        rate = self.limits.get(device, (0, 0))[1]
+        if not rate or not size:
+            return
+        with self.lock:
+            now = time.monotonic()
+            ready = max(self.next_free.get(device, 0.0), now - 1.0)
+            self.next_free[device] = ready + size / rate
+            delay = self.next_free[device] - now
+        if delay > 0:
+            time.sleep(delay)
+    
+    def account(self, device, read=0, written=0):
+        with self.lock:
+            stats = self.stats.setdefault(device, [0, 0])
+            stats[0] += read
+            stats[1] += written
+    
+    def snapshot(self):
+        """Счётчики {st_dev: (прочитано, записано)} для расчёта скорости за период"""
+        with self.lock:
+            return {device: tuple(stats) for device, stats in self.stats.items()}
+    
+    def device_name(self, device):
+        path = self.device_paths.get(device)
+        try:
+            return mount_point(path) if path else str(device)
+        except OSError:
+            return path
+    
+    def transferred(self, src_device, dst_device, size):
+        """Учитывает перенос size байт между дисками и выдерживает их лимиты скорости"""
+        self.account(src_device, read=size)
+        self.account(dst_device, written=size)
+        self.throttle(src_device, size)
+        if dst_device != src_device:
+            self.throttle(dst_device, size)
+    
+    def wrap(self, copy_function):
+        """Оборачивает функцию копирования файла: слоты и лимиты обоих дисков, учёт байт"""
+        def copy(src, dst, *args, **kwargs):
+            src_device = self.device_of(src)
+            dst_device = self.device_of(dst)
+            with self.slots((src_device, dst_device)):
+                result = copy_function(src, dst, *args, **kwargs)
+            # link_file возвращает True для клона или жёсткой ссылки: данные не переносились,
+            # поэтому такой файл не учитывается в скорости и не ограничивается
+            if result is not True:
+                self.transferred(src_device, dst_device, os.stat(src).st_size)
+            return result
+        return copy
+
+
+def run_in_pool(func, jobs, workers):
+    """Выполняет задания в пуле потоков и отдаёт результаты строго в порядке заданий"""
+    jobs = list(jobs)
+    if workers <= 1 or len(jobs) <= 1:
+        for args in jobs:
+            yield func(*args)
+        return
+    
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(func, *args) for args in jobs]
+        for future in futures:
+            yield future.result()
+    finally:
+        # При ошибке или досрочном выходе не запускаем оставшиеся задания
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def stream_in_pool(func, jobs, workers, window=None):
+    """
+    Как run_in_pool, но задания берутся из итератора по мере выполнения: в работе не больше
+    window заданий, поэтому память не зависит от их общего числа. Результаты - в порядке заданий.
+    """
+    if workers <= 1:
+        for args in jobs:
+            yield func(*args)
+        return
+    
+    window = window or workers * 4
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        for args in jobs:
+            pending.append(executor.submit(func, *args))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def reflink_file(src, dst):
+    """Клонирует файл через FICLONE (btrfs, XFS). Возвращает False, если ФС не поддерживает клоны"""
+    if fcntl is None:
+        return False
+    
+    devices = (os.stat(src).st_dev, os.stat(os.path.dirname(dst) or '.').st_dev)
+    if devices in _reflink_unsupported_devices:
+        return False
+    
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            cloned = True
+        except OSError:
+            cloned = False
+    
+    if not cloned:
+        os.remove(dst)
+        _reflink_unsupported_devices.add(devices)
+        return False
+    
+    shutil.copystat(src, dst)
+    return True
+
+
+def kernel_copy(infd, outfd, size):
+    """Копирует size байт между дескрипторами: copy_file_range, затем sendfile, затем read/write"""
+    offset = 0
+    
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while offset < size:
+                sent = os.copy_file_range(infd, outfd, min(KERNEL_COPY_CHUNK, size - offset), offset, offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError as e:
+            # Разные ФС или старое ядро - продолжаем другим способом с того же места
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF):
+                raise
+        if offset >= size:
+            return
+    
+    os.lseek(outfd, offset, os.SEEK_SET)
+    if hasattr(os, 'sendfile'):
+        try:
+            while offset < size:
+                sent = os.sendfile(outfd, infd, offset, min(KERNEL_COPY_CHUNK, size - offset))
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSOCK):
+                raise
+        if offset >= size:
+            return
+    
+    os.lseek(infd, offset, os.SEEK_SET)
+    os.lseek(outfd, offset, os.SEEK_SET)
+    while True:
+        chunk = os.read(infd, FALLBACK_COPY_BUFFER)
+        if not chunk:
+            break
+        os.write(outfd, chunk)
+
+
+def fast_copy_file(src, dst, preserve_metadata=True):
+    """
+    Копирует файл средствами ядра с заранее выделенным местом (posix_fallocate).
+    Без preserve_metadata не копирует даты и права (copystat), что экономит системные вызовы.
+    """
+    if not hasattr(os, 'copy_file_range') and not hasattr(os, 'sendfile'):
+        # Windows: shutil и так использует системное копирование
+        shutil.copyfile(src, dst)
+    else:
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            infd = fsrc.fileno()
+            outfd = fdst.fileno()
+            size = os.fstat(infd).st_size
+            if size and hasattr(os, 'posix_fallocate'):
+                try:
+                    os.posix_fallocate(outfd, 0, size)
+                except OSError:
+                    pass
+            if size:
+                kernel_copy(infd, outfd, size)
+    
+    if preserve_metadata:
+        shutil.copystat(src, dst)
+    return dst
+
+
+def link_file(src, dst):
+    """
+    Создаёт файл без копирования данных: reflink, затем жёсткая ссылка, при смене диска - обычная копия.
+    Возвращает True, если данные не копировались, и False, если файл пришлось скопировать.
+    """
+    if reflink_file(src, dst):
+        return True
+    try:
+        os.link(src, dst)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+            raise
+        fast_copy_file(src, dst)
+        return False
+    return True
+
+
+def copytree_parallel(src, dst, file_workers=1, copy_function=shutil.copy2):
+    """Копирует дерево папок, при file_workers > 1 копирует файлы параллельно"""
+    if file_workers <= 1:
+        shutil.copytree(src, dst, copy_function=copy_function)
+        return
+    
+    file_jobs = []
+    dir_pairs = []
+    for root, dirs, files in os.walk(src):
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target_root, exist_ok=True)
+        dir_pairs.append((root, target_root))
+        for file in files:
+            file_jobs.append((os.path.join(root, file), os.path.join(target_root, file)))
+    
+    for _ in run_in_pool(copy_function, file_jobs, file_workers):
+        pass
+    
+    # Атрибуты папок копируем в конце, как это делает shutil.copytree
+    for root, target_root in reversed(dir_pairs):
+        shutil.copystat(root, target_root)
+
+
+def trees_match(src, dst, algorithm=None):
+    """Проверяет, что в dst есть все файлы из src с теми же размерами (и контрольными суммами)"""
+    for root, dirs, files in os.walk(src):
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        for file in files:
+            source_file = os.path.join(root, file)
+            target_file = os.path.join(target_root, file)
+            if not os.path.isfile(target_file):
+                return False
+            if os.path.getsize(source_file) != os.path.getsize(target_file):
+                return False
+            if algorithm and file_digest(source_file, algorithm) != file_digest(target_file, algorithm):
+                return False
+    return True
+
+
+def list_files(path):
+    """Относительные пути всех файлов папки в отсортированном порядке"""
+    files = []
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(path, relative)) as it:
+            for entry in it:
+                entry_path = os.path.join(relative, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry_path)
+                else:
+                    files.append(entry_path)
+    files.sort()
+    return files
+
+
+def folder_size(path):
+    """Считает количество файлов и их суммарный размер одним проходом os.scandir"""
+    files = 0
+    total = 0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        files += 1
+                        total += entry.stat(follow_symlinks=False).st_size
+        except OSError:
+            continue
+    return files, total
+
+
+def folder_signature(path, depth=SIZE_SIGNATURE_DEPTH):
+    """
+    Отпечаток папки для кэша размеров: время изменения её самой и вложенных папок до depth уровней.
+    Папка захвата хранит файлы в Captures/Focus/Other, поэтому отпечаток - несколько stat, а не обход дерева.
+    Не замечает изменений глубже depth и файлов, перезаписанных на месте: для этого пришлось бы
+    читать размеры всех файлов, то есть считать объём заново.
+    """
+    signature = [("", os.stat(path).st_mtime_ns)]
+    level = [""]
+    for _ in range(depth):
+        next_level = []
+        for relative in level:
+            with os.scandir(os.path.join(path, relative)) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        name = os.path.join(relative, entry.name)
+                        signature.append((name, entry.stat(follow_symlinks=False).st_mtime_ns))
+                        next_level.append(name)
+        level = next_level
+    return tuple(sorted(signature))
+
+
+def existing_parent(path):
+    """Ближайшая существующая папка на пути (для проверки диска назначения)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def commit_folder(ready_path, new_path):
+    """
+    Ставит готовую папку на место номера переименованием.
+    Существующая папка номера сдвигается в .old-<номер> и возвращается для отложенного удаления.
+    """
+    parent, name = os.path.split(new_path)
+    old_version = None
+    if os.path.exists(new_path):
+        old_version = os.path.join(parent, OLD_VERSION_PREFIX + name)
+        if os.path.exists(old_version):
+            shutil.rmtree(old_version)
+        os.rename(new_path, old_version)
+    os.rename(ready_path, new_path)
+    return old_version
+
+
+def cleanup_staging(device_folder):
+    """
+    Убирает следы прерванного запуска: удаляет .staging-* папки,
+    а .old-* возвращает на место, если номер так и не был заменён.
+    Возвращает (удалено, восстановлено).
+    """
+    removed = 0
+    restored = 0
+    if not os.path.isdir(device_folder):
+        return removed, restored
+    
+    for name in os.listdir(device_folder):
+        path = os.path.join(device_folder, name)
+        if name.startswith(STAGING_PREFIX):
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+        elif name.startswith(OLD_VERSION_PREFIX):
+            number_path = os.path.join(device_folder, name[len(OLD_VERSION_PREFIX):])
+            if os.path.exists(number_path):
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            else:
+                os.rename(path, number_path)
+                restored += 1
+    return removed, restored
+
+
+def new_run_id():
+    """
+    Имя папки запуска в корзине. С микросекундами: задания из очереди могут начаться в одну секунду,
+    и очистка корзины одного запуска не должна задеть сохранённую корзину другого.
+    """
+    return datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+
+
+def trash_folder(path, trash_root, name=None):
+    """
+    Переносит папку номера в корзину запуска одним переименованием: <корзина>/<устройство>/<номер>.
+    name задаёт номер, если папка уже отложена под служебным именем (.old-<номер>).
+    Если номер заменяется в запуске повторно, промежуточная версия получает суффикс ~N,
+    а исходная остаётся под своим номером. Возвращает путь в корзине или None, если папка удалена.
+    """
+    device_folder, folder_name = os.path.split(path)
+    name = name or folder_name
+    device_trash = os.path.join(trash_root, os.path.basename(device_folder))
+    os.makedirs(device_trash, exist_ok=True)
+    
+    target = os.path.join(device_trash, name)
+    suffix = 1
+    while os.path.exists(target):
+        suffix += 1
+        target = os.path.join(device_trash, f"{name}~{suffix}")
+    
+    try:
+        os.rename(path, target)
+    except OSError as e:
+        # Корзина на другом диске (точка монтирования внутри атаки) - удаляем сразу
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.rmtree(path)
+        return None
+    return target
+
+
+def restore_from_trash(run_dir, attack_folder, trash_root):
+    """
+    Возвращает номера из корзины запуска на их места в папке атаки.
+    Текущие версии этих номеров уходят в корзину trash_root, поэтому восстановление тоже обратимо.
+    Возвращает список восстановленных путей.
+    """
+    restored = []
+    for device in sorted(os.listdir(run_dir)):
+        device_trash = os.path.join(run_dir, device)
+        if not os.path.isdir(device_trash):
+            continue
+        for name in sorted(os.listdir(device_trash), key=natural_sort_key):
+            # Промежуточные версии (номер~N) не восстанавливаем
+            if not name.isdigit():
+                continue
+            number_path = os.path.join(attack_folder, device, name)
+            if os.path.exists(number_path):
+                trash_folder(number_path, trash_root)
+            os.makedirs(os.path.dirname(number_path), exist_ok=True)
+            os.rename(os.path.join(device_trash, name), number_path)
+            restored.append(number_path)
+    return restored
+
+
+def lower_thread_priority():
+    """Понижает приоритет текущего потока (в Linux приоритет nice задаётся для каждого потока)"""
+    if sys.platform.startswith("linux") and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except OSError:
+            pass
+
+
+def purge_trash(path):
+    """Удаляет корзину запуска (или всю корзину) и пустую папку .trash после неё"""
+    lower_thread_priority()
+    shutil.rmtree(path, ignore_errors=True)
+    trash = os.path.dirname(path)
+    if os.path.basename(trash) == TRASH_DIR:
+        try:
+            os.rmdir(trash)
+        except OSError:
+            pass
+
+
+def file_digest(path, algorithm="blake2b", buffer_size=HASH_BUFFER):
+    """Считает контрольную сумму файла, читая его большими блоками в один и тот же буфер"""
+    digest = hashlib.new(algorithm)
+    buffer = bytearray(buffer_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            # hashlib отпускает GIL на больших блоках, поэтому потоки хэшируют параллельно
+            digest.update(view[:read])
+    return digest.hexdigest()
+
+
+def folder_file_stats(path):
+    """Размер и mtime_ns всех файлов папки одним проходом os.scandir: {путь через /: (размер, mtime_ns)}"""
+    stats = {}
+    stack = [""]
+    while stack:
+        relative = stack.pop()
+        with os.scandir(os.path.join(path, relative)) as it:
+            for entry in it:
+                name = f"{relative}/{entry.name}" if relative else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                else:
+                    stat = entry.stat(follow_symlinks=False)
+                    stats[name] = (stat.st_size, stat.st_mtime_ns)
+    return stats
+
+
+def manifest_folders(attack_folder):
+    """Папки номеров атаки: в папках устройств или прямо в корне атаки"""
+    roots = [os.path.join(attack_folder, device) for device in DEVICES
+             if os.path.isdir(os.path.join(attack_folder, device))] or [attack_folder]
+    folders = []
+    for root in roots:
+        for name in sorted(os.listdir(root), key=natural_sort_key):
+            path = os.path.join(root, name)
+            if name.isdigit() and os.path.isdir(path):
+                folders.append(path)
+    return folders
+
+
+def find_attack_folders(folder, attack_names, depth=2):
+    """Папки атак внутри папки атаки, ID или проекта - по известным названиям атак"""
+    if os.path.basename(os.path.normpath(folder)) in attack_names:
+        return [folder]
+    if depth == 0:
+        return []
+    found = []
+    for name in sorted(os.listdir(folder), key=natural_sort_key):
+        path = os.path.join(folder, name)
+        if not name.startswith(".") and os.path.isdir(path):
+            found.extend(find_attack_folders(path, attack_names, depth - 1))
+    return found
+
+
+# Папка номера в проекте: ID → атака → устройство (пусто для плоской атаки) → номер
+ProjectFolder = namedtuple("ProjectFolder", "id attack device number path")
+
+
+def sorted_subfolders(path):
+    """Подпапки в естественном порядке, без служебных (.trash, .staging-...)"""
+    try:
+        with os.scandir(path) as it:
+            names = [entry.name for entry in it if entry.is_dir() and not entry.name.startswith(".")]
+    except OSError:
+        return []
+    return sorted(names, key=natural_sort_key)
+
+
+def iter_project_folders(project_folder, attack_names):
+    """
+    Лениво перечисляет папки номеров проекта в порядке ID → атака → устройство → номер.
+    Папка ID - папка, в которой есть хотя бы одна папка атаки, как в общей проверке.
+    """
+    for id_name in sorted_subfolders(project_folder):
+        id_path = os.path.join(project_folder, id_name)
+        attacks = [name for name in sorted_subfolders(id_path) if name in attack_names]
+        for attack in attacks:
+            attack_path = os.path.join(id_path, attack)
+            devices = [device for device in DEVICES if os.path.isdir(os.path.join(attack_path, device))] or [""]
+            for device in devices:
+                device_path = os.path.join(attack_path, device) if device else attack_path
+                for number in sorted_subfolders(device_path):
+                    if number.isdigit():
+                        yield ProjectFolder(id_name, attack, device, int(number), os.path.join(device_path, number))
+
+
+class ShootingReportWriter:
+    """Потоковая запись отчёта по времени съёмки в CSV или JSON (массив строк) - строка за строкой"""
+    
+    def __init__(self, path):
+        self.format = "json" if path.lower().endswith(".json") else "csv"
+        self.file = open(path, 'w', encoding='utf-8', newline='')
+        self.rows = 0
+        if self.format == "csv":
+            self.writer = csv.DictWriter(self.file, SHOOTING_REPORT_FIELDS)
+            self.writer.writeheader()
+        else:
+            self.file.write("[")
+    
+    def write(self, row):
+        if self.format == "csv":
+            self.writer.writerow(row)
+        else:
+            self.file.write(("," if self.rows else "") + "\n" + json.dumps(row, ensure_ascii=False))
+        self.rows += 1
+    
+    def close(self):
+        if self.format == "json":
+            self.file.write("\n]\n")
+        self.file.close()
+
+
+def verify_file(src, dst, algorithm="blake2b"):
+    """
+    Сверяет копию с оригиналом по контрольной сумме.
+    Без src только хэширует копию. Возвращает (размер, mtime_ns, хэш копии, совпадает ли).
+    """
+    stat = os.stat(dst)
+    digest = file_digest(dst, algorithm)
+    matches = src is None or file_digest(src, algorithm) == digest
+    return stat.st_size, stat.st_mtime_ns, digest, matches
+
+
+def files_equal(src_entry, dst_entry, use_hash=False):
+    """Сравнивает файл источника с файлом назначения по размеру и времени изменения (или по хэшу)"""
+    src_stat = src_entry.stat()
+    dst_stat = dst_entry.stat()
+    if src_stat.st_size != dst_stat.st_size:
+        return False
+    if use_hash:
+        return file_digest(src_entry.path) == file_digest(dst_entry.path)
+    # Допуск 2 секунды - точность времени на FAT/exFAT флешках
+    return abs(src_stat.st_mtime - dst_stat.st_mtime) < 2
+
+
+def sync_tree(src, dst, copy_function=shutil.copy2, use_hash=False):
+    """
+    Приводит dst к содержимому src: копирует новые и изменённые файлы, удаляет лишние.
+    Возвращает (скопировано файлов, удалено элементов).
+    """
+    copied = 0
+    removed = 0
+    os.makedirs(dst, exist_ok=True)
+    
+    existing = {}
+    with os.scandir(dst) as it:
+        for entry in it:
+            existing[entry.name] = entry
+    
+    with os.scandir(src) as it:
+        src_entries = list(it)
+    
+    for entry in src_entries:
+        target = os.path.join(dst, entry.name)
+        dst_entry = existing.pop(entry.name, None)
+        
+        if entry.is_dir(follow_symlinks=False):
+            if dst_entry is not None and not dst_entry.is_dir(follow_symlinks=False):
+                os.remove(target)
+                removed += 1
+            sub_copied, sub_removed = sync_tree(entry.path, target, copy_function, use_hash)
+            copied += sub_copied
+            removed += sub_removed
+            continue
+        
+        if dst_entry is not None:
+            if dst_entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(target)
+                removed += 1
+            else:
+                if files_equal(entry, dst_entry, use_hash):
+                    continue
+                os.remove(target)
+        
+        copy_function(entry.path, target)
+        copied += 1
+    
+    # Всё, чего нет в источнике, удаляем
+    for name, dst_entry in existing.items():
+        if dst_entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(dst_entry.path)
+        else:
+            os.remove(dst_entry.path)
+        removed += 1
+    
+    shutil.copystat(src, dst)
+    return copied, removed
+
+
+def copy_folder_job(old_path, new_path, file_workers=1, mode="copy", sync=False, use_hash=False,
+                    preserve_metadata=True, token=None, verify=None, io=None, staged=None):
+    """
+    Переносит папку на место номера и возвращает словарь с результатом.
+    Данные сначала пишутся в скрытую .staging-папку и подменяют номер переименованием,
+    поэтому при сбое или отмене номер остаётся в прежнем виде.
+    staged - уже заполненная .staging-папка (папки сжатого архива распаковываются заранее одним проходом).
+    """
+    if token is not None:
+        token.checkpoint()
+    result = {"existed": os.path.exists(new_path), "synced": False, "copied": 0, "removed": 0,
+              "old_version": None}
+    # Из архива папка только копируется: ссылки, перемещение и синхронизация требуют файлов на диске
+    archive = source_archive_of(old_path)
+    if archive is not None:
+        mode, sync = "copy", False
+    if mode == "link":
+        copy_function = link_file
+    else:
+        # Перемещённая копия остаётся единственной, поэтому даты файлов при переносе сохраняются всегда
+        copy_function = functools.partial(fast_copy_file, preserve_metadata=preserve_metadata or mode == "move")
+    if io is not None:
+        copy_function = io.wrap(copy_function)
+    copy_function = with_checkpoint(copy_function, token)
+    
+    # Существующий номер можно досинхронизировать вместо полного перекопирования.
+    # Синхронизация сравнивает даты файлов, поэтому всегда их сохраняет.
+    # Она пишет прямо в папку номера, поэтому отмена и пауза вступают в силу только после всей папки
+    if result["existed"] and sync and mode != "move":
+        sync_copy = link_file if mode == "link" else fast_copy_file
+        if io is not None:
+            sync_copy = io.wrap(sync_copy)
+        result["copied"], result["removed"] = sync_tree(old_path, new_path, sync_copy, use_hash)
+        result["synced"] = True
+        return result
+    
+    parent, name = os.path.split(new_path)
+    os.makedirs(parent, exist_ok=True)
+    
+    # На том же диске перемещение - это одно переименование
+    if mode == "move" and os.stat(old_path).st_dev == os.stat(parent).st_dev:
+        result["old_version"] = commit_folder(old_path, new_path)
+        return result
+    
+    staging = staged or os.path.join(parent, STAGING_PREFIX + name)
+    try:
+        if staged is not None:
+            pass
+        elif archive is not None:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+            archive.extract_folder(os.path.basename(old_path), staging, token, io)
+        else:
+            if os.path.exists(staging):
+                shutil.rmtree(staging)
+            copytree_parallel(old_path, staging, file_workers, copy_function)
+        # Источник удаляется, поэтому при перемещении копия сверяется до этого (verify - алгоритм хэша)
+        if mode == "move" and not trees_match(old_path, staging, verify):
+            raise OSError(f"Копия папки {os.path.basename(old_path)} не совпадает с оригиналом, источник не удалён")
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    
+    result["old_version"] = commit_folder(staging, new_path)
+    if mode == "move":
+        shutil.rmtree(old_path)
+    return result
+
+
+def iter_operation_files(operations):
+    """
+    Файлы папок плана для записи в архив: (операция, путь в папке, размер, поток, mtime),
+    а после последнего файла папки - (операция, None, 0, None, None).
+    У файлов на диске размер, поток и mtime - None: файл добавляется по пути.
+    Папки одного архива-источника читаются вместе: сжатый TAR - одним проходом на все папки.
+    """
+    archives = {}
+    for op in operations:
+        archive = source_archive_of(op.source_path)
+        if archive is not None:
+            archives.setdefault(archive, {})[os.path.basename(op.source_path)] = op
+            continue
+        for relative in list_files(op.source_path):
+            yield op, relative, None, None, None
+        yield op, None, 0, None, None
+    
+    for archive, folder_operations in archives.items():
+        for name, relative, size, info, member in archive.iter_members(list(folder_operations)):
+            mtime = archive.member_mtime(info) if info is not None else None
+            yield folder_operations[name], relative, size, member, mtime
+
+
+def archive_path(attack_folder, device, archive_format, compression):
+    """Архив устройства рядом с папкой атаки: <атака> - <устройство>.zip / .tar / .tar.gz"""
+    if archive_format == "zip":
+        extension = "zip"
+    else:
+        extension = "tar.gz" if compression == "deflate" else "tar"
+    return f"{attack_folder} - {device}.{extension}"
+
+
+class ArchiveWriter:
+    """Потоковая запись файлов в ZIP или TAR под заданными именами внутри архива"""
+    
+    def __init__(self, path, archive_format="zip", compression="stored"):
+        self.archive_format = archive_format
+        if archive_format == "zip":
+            zip_compression = zipfile.ZIP_DEFLATED if compression == "deflate" else zipfile.ZIP_STORED
+            self.archive = zipfile.ZipFile(path, "w", zip_compression, allowZip64=True)
+        else:
+            # PAX хранит длинные и не-ASCII имена без искажений
+            self.archive = tarfile.open(path, "w:gz" if compression == "deflate" else "w",
+                                        format=tarfile.PAX_FORMAT)
+    
+    def add_file(self, path, name):
+        if self.archive_format == "zip":
+            self.archive.write(path, name)
+        else:
+            self.archive.add(path, name, recursive=False)
+    
+    def add_stream(self, fileobj, size, name, mtime=None):
+        """
+        Добавляет содержимое открытого файла: файла архива-источника с его mtime
+        или временного манифеста (mtime=None - текущее время).
+        """
+        if mtime is None:
+            mtime = time.time()
+        if self.archive_format == "zip":
+            # ZIP хранит местное время с точностью 2 секунды и не раньше 1980 года
+            info = zipfile.ZipInfo(name, date_time=max(time.localtime(mtime)[:6], (1980, 1, 1, 0, 0, 0)))
+            info.compress_type = self.archive.compression
+            info.external_attr = 0o644 << 16
+            with self.archive.open(info, "w", force_zip64=True) as target:
+                shutil.copyfileobj(fileobj, target, HASH_BUFFER)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = size
+            info.mtime = int(mtime)
+            self.archive.addfile(info, fileobj)
+    
+    def close(self):
+        self.archive.close()
+
+
+# Подпапки, по которым папка архива узнаётся как папка захвата
+CAPTURE_SUBFOLDERS = ('Captures', 'Focus')
+
+
+class SourceArchive:
+    """
+    ZIP или TAR с папками захвата, читаемый без распаковки. Индекс строится один раз при открытии;
+    если всё лежит в одной корневой папке с папками захвата внутри, папками источника считается её содержимое.
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.is_zip = zipfile.is_zipfile(path)
+        # TarFile не рассчитан на чтение из нескольких потоков, ZipFile - рассчитан
+        self.lock = threading.Lock()
+        # Сжатый TAR нельзя читать вразнобой: переход назад распаковывает поток с начала
+        self.sequential = False
+        if self.is_zip:
+            self.archive = zipfile.ZipFile(path)
+            members = [(info.filename, info.is_dir(), info.file_size, info) for info in self.archive.infolist()]
+        else:
+            try:
+                self.archive = tarfile.open(path, "r:")
+            except tarfile.ReadError:
+                self.archive = tarfile.open(path, "r:*")
+                self.sequential = True
+            members = [(info.name, info.isdir(), info.size, info) for info in self.archive.getmembers()
+                       if info.isdir() or info.isfile()]
+        
+        entries = []
+        for name, is_dir, size, info in members:
+            parts = tuple(part for part in name.replace("\\", "/").split("/") if part not in ("", "."))
+            if parts and ".." not in parts:
+                entries.append((parts, is_dir, size, info))
+        
+        # Единственная корневая папка раскрывается, только если она сама не папка захвата,
+        # а внутри лежат папки захвата (с BestShot или подпапками Captures/Focus)
+        tops = {parts[0] for parts, _, _, _ in entries}
+        skip = 0
+        if len(tops) == 1:
+            root = next(iter(tops))
+            children = {}
+            for parts, is_dir, _, _ in entries:
+                for depth in (1, 2):
+                    if len(parts) > depth:
+                        children.setdefault(parts[:depth], set()).add(
+                            (parts[depth], is_dir or len(parts) > depth + 1))
+            
+            def looks_like_capture(folder):
+                return any(("bestshot" in name.lower() and not is_dir) or (name in CAPTURE_SUBFOLDERS and is_dir)
+                           for name, is_dir in children.get(folder, ()))
+            
+            if not looks_like_capture((root,)) and any(
+                    is_dir and looks_like_capture((root, name)) for name, is_dir in children.get((root,), ())):
+                skip = 1
+        
+        self.dirs = {(): set()}
+        self.folder_files = {}
+        self.folder_dirs = {}
+        for parts, is_dir, size, info in entries:
+            parts = parts[skip:]
+            if not parts:
+                continue
+            self.add_dir(parts if is_dir else parts[:-1])
+            if not is_dir and len(parts) > 1:
+                self.dirs[parts[:-1]].add(parts[-1])
+                self.folder_files.setdefault(parts[0], []).append((os.path.join(*parts[1:]), size, info))
+        for files in self.folder_files.values():
+            files.sort(key=lambda item: item[0])
+    
+    def add_dir(self, parts):
+        for i in range(1, len(parts) + 1):
+            if parts[:i] not in self.dirs:
+                self.dirs[parts[:i]] = set()
+                self.dirs[parts[:i - 1]].add(parts[i - 1])
+                if i > 1:
+                    self.folder_dirs.setdefault(parts[0], []).append(parts[1:i])
+    
+    def folder_names(self):
+        """Папки верхнего уровня в естественном порядке"""
+        return sorted(self.dirs[()], key=natural_sort_key)
+    
+    def has_folder(self, name):
+        return (name,) in self.dirs
+    
+    def folder_summary(self, name):
+        """Подпапки, файлы и пустота подпапок папки верхнего уровня - по индексу, как os.listdir"""
+        folder = (name,)
+        if folder not in self.dirs:
+            raise FileNotFoundError(f"В архиве {os.path.basename(self.path)} нет папки {name}")
+        folders = sorted(item for item in self.dirs[folder] if folder + (item,) in self.dirs)
+        files = sorted(item for item in self.dirs[folder] if folder + (item,) not in self.dirs)
+        empty_folders = {item: not self.dirs[folder + (item,)] for item in folders}
+        return folders, files, empty_folders
+    
+    def list_files(self, name):
+        """Файлы папки: [(путь относительно папки, размер, элемент архива)] в отсортированном порядке"""
+        return self.folder_files.get(name, [])
+    
+    def folder_size(self, name):
+        files = self.list_files(name)
+        return len(files), sum(size for _, size, _ in files)
+    
+    def member_mtime(self, info):
+        if self.is_zip:
+            return time.mktime(info.date_time + (0, 0, -1))
+        return info.mtime
+    
+    @contextlib.contextmanager
+    def open_member(self, info):
+        """Открывает файл архива на чтение потоком"""
+        if self.is_zip:
+            with self.archive.open(info) as member:
+                yield member
+        else:
+            with self.lock:
+                yield self.archive.extractfile(info)
+    
+    def iter_members(self, names):
+        """
+        Файлы нескольких папок с открытым потоком каждого: (папка, путь в папке, размер, элемент, поток),
+        а после последнего файла папки - (папка, None, 0, None, None). Сжатый TAR читается одним
+        последовательным проходом в порядке архива для всех папок сразу; ZIP и обычный TAR - по индексу.
+        """
+        if not self.sequential:
+            for name in names:
+                for relative, size, info in self.list_files(name):
+                    with self.open_member(info) as member:
+                        yield name, relative, size, info, member
+                yield name, None, 0, None, None
+            return
+        
+        wanted = {}
+        remaining = {}
+        for name in names:
+            files = self.list_files(name)
+            remaining[name] = len(files)
+            for relative, size, info in files:
+                wanted[info.name] = (name, relative, size, info)
+            if not files:
+                yield name, None, 0, None, None
+        if not wanted:
+            return
+        with tarfile.open(self.path, "r|*") as stream:
+            for member in stream:
+                entry = wanted.pop(member.name, None)
+                if entry is None:
+                    continue
+                yield entry + (stream.extractfile(member),)
+                name = entry[0]
+                remaining[name] -= 1
+                if not remaining[name]:
+                    yield name, None, 0, None, None
+                if not wanted:
+                    break
+    
+    def extract_folders(self, targets, token=None, io=None):
+        """
+        Пишет папки архива потоком, без промежуточной распаковки всего архива: targets = {папка: путь}.
+        Все папки пишутся за один проход по архиву; по мере готовности отдаёт имена папок.
+        """
+        for name, target in targets.items():
+            if not self.has_folder(name):
+                raise FileNotFoundError(f"В архиве {os.path.basename(self.path)} нет папки {name}")
+            os.makedirs(target)
+            for parts in self.folder_dirs.get(name, []):
+                os.makedirs(os.path.join(target, *parts), exist_ok=True)
+        
+        src_device = io.device_of(self.path) if io is not None else None
+        for name, relative, size, info, member in self.iter_members(list(targets)):
+            if relative is None:
+                yield name
+                continue
+            if token is not None:
+                token.checkpoint()
+            path = os.path.join(targets[name], relative)
+            if io is not None:
+                dst_device = io.device_of(path)
+                slots = io.slots((src_device, dst_device))
+            else:
+                slots = contextlib.nullcontext()
+            with slots, open(path, "wb") as f:
+                shutil.copyfileobj(member, f, HASH_BUFFER)
+            mtime = self.member_mtime(info)
+            os.utime(path, (mtime, mtime))
+            if io is not None:
+                io.transferred(src_device, dst_device, size)
+    
+    def extract_folder(self, name, target, token=None, io=None):
+        """Пишет одну папку архива в target"""
+        for _ in self.extract_folders({name: target}, token, io):
+            pass
+    
+    def close(self):
+        self.archive.close()
+
+
+# Открытые архивы-источники: путь → ((mtime_ns, размер), SourceArchive)
+_source_archives = {}
+_source_archives_lock = threading.Lock()
+
+
+def is_source_archive(path):
+    """Путь указывает на файл архива, из которого можно читать папки источника"""
+    return path.lower().endswith(SOURCE_ARCHIVE_EXTENSIONS) and os.path.isfile(path)
+
+
+def open_source_archive(path):
+    """Архив-источник с готовым индексом; изменённый на диске архив индексируется заново"""
+    stat = os.stat(path)
+    key = os.path.abspath(path)
+    with _source_archives_lock:
+        cached = _source_archives.get(key)
+        if cached and cached[0] == (stat.st_mtime_ns, stat.st_size):
+            return cached[1]
+        if cached:
+            # Архив изменился на диске: прежний индекс больше не нужен, его файл закрывается
+            cached[1].close()
+        archive = SourceArchive(path)
+        _source_archives[key] = ((stat.st_mtime_ns, stat.st_size), archive)
+        return archive
+
+
+def source_archive_of(path):
+    """Архив, внутри которого лежит папка источника (<архив>/<папка>), или None для папки на диске"""
+    archive_file = os.path.dirname(path)
+    if not is_source_archive(archive_file):
+        return None
+    return open_source_archive(archive_file)
+
+
+# Сессия и день съёмки: время - секунды по местному времени, count - число снимков (папок)
+ShootingSession = namedtuple("ShootingSession", "start end count duration")
+ShootingDay = namedtuple("ShootingDay", "date start end count duration sessions")
+
+
+class ShootingClusters(namedtuple("ShootingClusters", "session_start session_end session_count "
+                                                      "session_duration day_sessions total")):
+    """
+    Результат кластеризации: списки по сессиям в порядке времени и границы дней в них -
+    сессии i-го дня занимают индексы day_sessions[i]..day_sessions[i + 1].
+    """
+    
+    def days(self):
+        """Дни съёмки по порядку вместе с их сессиями"""
+        for first, last in zip(self.day_sessions, self.day_sessions[1:]):
+            sessions = [ShootingSession(*fields) for fields in zip(
+                self.session_start[first:last], self.session_end[first:last],
+                self.session_count[first:last], self.session_duration[first:last])]
+            yield ShootingDay(datetime.date(1970, 1, 1) + datetime.timedelta(days=sessions[0].start // 86400),
+                              sessions[0].start, sessions[-1].end, sum(session.count for session in sessions),
+                              sum(session.duration for session in sessions), sessions)
+
+
+def wall_clock_seconds(moment):
+    """Секунды от 1970-01-01 по местному времени снимка: день съёмки - целая часть от деления на 86400"""
+    return (moment - datetime.datetime(1970, 1, 1)).total_seconds()
+
+
+def wall_clock_datetime(seconds):
+    """Обратное к wall_clock_seconds: момент по местному времени"""
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def cluster_sessions_numpy(timestamps, gap=SESSION_GAP, min_session=MIN_SESSION_SECONDS):
+    """Кластеризация на numpy: одна сортировка и векторное сравнение соседних моментов"""
+    times = np.sort(np.asarray(timestamps, dtype=np.float64))
+    if not times.size:
+        return ShootingClusters([], [], [], [], [0], 0.0)
+    days = np.floor_divide(times, 86400)
+    
+    # Новая сессия - после перерыва больше gap или с началом нового дня
+    breaks = np.empty(times.size, dtype=bool)
+    breaks[0] = True
+    np.logical_or(np.diff(times) > gap, np.diff(days) != 0, out=breaks[1:])
+    starts = np.flatnonzero(breaks)
+    ends = np.append(starts[1:], times.size) - 1
+    counts = ends - starts + 1
+    durations = np.where(counts > 1, times[ends] - times[starts], float(min_session))
+    
+    session_days = days[starts]
+    day_starts = np.flatnonzero(np.append(True, session_days[1:] != session_days[:-1]))
+    return ShootingClusters(times[starts].tolist(), times[ends].tolist(), counts.tolist(), durations.tolist(),
+                            np.append(day_starts, starts.size).tolist(), float(durations.sum()))
+
+
+def cluster_sessions_python(timestamps, gap=SESSION_GAP, min_session=MIN_SESSION_SECONDS):
+    """Та же кластеризация одним проходом по array('d') - когда numpy не установлен"""
+    times = array('d', sorted(timestamps))
+    session_start, session_end, session_count, session_duration = [], [], [], []
+    day_sessions = [0]
+    if not times:
+        return ShootingClusters(session_start, session_end, session_count, session_duration, day_sessions, 0.0)
+    
+    def close_session(first, last, count):
+        session_start.append(first)
+        session_end.append(last)
+        session_count.append(count)
+        session_duration.append(last - first if count > 1 else float(min_session))
+    
+    first = previous = times[0]
+    day = first // 86400
+    count = 1
+    for moment in itertools.islice(times, 1, None):
+        moment_day = moment // 86400
+        if moment - previous > gap or moment_day != day:
+            close_session(first, previous, count)
+            if moment_day != day:
+                day_sessions.append(len(session_start))
+                day = moment_day
+            first = moment
+            count = 0
+        previous = moment
+        count += 1
+    close_session(first, previous, count)
+    day_sessions.append(len(session_start))
+    return ShootingClusters(session_start, session_end, session_count, session_duration, day_sessions,
+                            math.fsum(session_duration))
+
+
+def cluster_sessions(timestamps, gap=SESSION_GAP, min_session=MIN_SESSION_SECONDS):
+    """
+    Делит моменты съёмки (секунды по местному времени - numpy-массив, array('d') или список) на дни и сессии.
+    Длительность сессии - от первого до последнего снимка, одиночная сессия считается за min_session.
+    """
+    if np is not None:
+        return cluster_sessions_numpy(timestamps, gap, min_session)
+    return cluster_sessions_python(timestamps, gap, min_session)
+
+
+def parse_exif_datetime(text, subsec=None):
+    """Разбирает "ГГГГ:ММ:ДД чч:мм:сс" и доли секунды из EXIF; None, если значение повреждено"""
+    try:
+        date = datetime.datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]),
+                                 int(text[11:13]), int(text[14:16]), int(text[17:19]))
+    except ValueError:
+        return None
+    if subsec and subsec.isdigit():
+        date = date.replace(microsecond=int(subsec[:6].ljust(6, "0")))
+    return date
+
+
+def read_tiff_datetime(read_at):
+    """
+    Ищет DateTimeOriginal в структуре TIFF: IFD0 → Exif IFD → тег 0x9003.
+    read_at(offset, size) читает байты от начала TIFF-заголовка, поэтому читаются только нужные записи.
+    """
+    header = read_at(0, 8)
+    if header[:4] == b"II*\0":
+        order = "<"
+    elif header[:4] == b"MM\0*":
+        order = ">"
+    else:
+        return None
+    
+    def entries(offset):
+        count_bytes = read_at(offset, 2)
+        if len(count_bytes) < 2:
+            return
+        count = min(struct.unpack(order + "H", count_bytes)[0], 1024)
+        data = read_at(offset + 2, count * 12)
+        for i in range(len(data) // 12):
+            yield struct.unpack_from(order + "HHI4s", data, i * 12)
+    
+    def text(count, value):
+        raw = value[:count] if count <= 4 else read_at(struct.unpack(order + "I", value)[0], count)
+        return raw.split(b"\0", 1)[0].decode("ascii", "replace").strip()
+    
+    exif_ifd = None
+    for tag, _, _, value in entries(struct.unpack(order + "I", header[4:8])[0]):
+        if tag == EXIF_IFD_POINTER:
+            exif_ifd = struct.unpack(order + "I", value)[0]
+            break
+    if exif_ifd is None:
+        return None
+    
+    original = subsec = None
+    for tag, value_type, count, value in entries(exif_ifd):
+        # Оба тега - ASCII-строки (тип 2)
+        if tag == EXIF_DATETIME_ORIGINAL and value_type == 2:
+            original = text(count, value)
+        elif tag == EXIF_SUBSEC_TIME_ORIGINAL and value_type == 2:
+            subsec = text(count, value)
+    return parse_exif_datetime(original, subsec) if original else None
+
+
+def read_exif_datetime(source):
+    """
+    Дата съёмки из EXIF без декодирования изображения: у JPEG читается только сегмент APP1,
+    у TIFF - нужные записи IFD. source - путь или открытый двоичный файл с seek.
+    Для других форматов - ValueError, их можно разобрать полным декодером.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return read_exif_datetime(f)
+    
+    f = source
+    start = f.tell()
+    
+    def reader(base):
+        def read_at(offset, size):
+            f.seek(base + offset)
+            return f.read(size)
+        return read_at
+    
+    head = f.read(4)
+    if head[:4] in (b"II*\0", b"MM\0*"):
+        return read_tiff_datetime(reader(start))
+    if head[:2] != b"\xff\xd8":
+        f.seek(start)
+        raise ValueError("не JPEG и не TIFF")
+    
+    # Сегменты JPEG до начала данных изображения (SOS): маркер, длина, содержимое
+    f.seek(start + 2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        if marker[1] == 0xFF:
+            # Байт-заполнитель перед маркером
+            f.seek(-1, 1)
+            continue
+        if marker[1] in (0xD9, 0xDA):
+            return None
+        if 0xD0 <= marker[1] <= 0xD7 or marker[1] == 0x01:
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0]
+        if marker[1] == 0xE1 and length >= 8:
+            if f.read(6) == b"Exif\0\0":
+                return read_tiff_datetime(reader(f.tell()))
+            f.seek(length - 8, 1)
+        else:
+            f.seek(length - 2, 1)
+
+
+def iter_images(folder_path):
+    """Лениво обходит изображения папки через os.scandir: файлы папки, затем подпапки в естественном порядке"""
+    stack = [folder_path]
+    while stack:
+        path = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = sorted(it, key=lambda entry: natural_sort_key(entry.name))
+        except OSError:
+            continue
+        folders = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                folders.append(entry.path)
+            elif entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+        stack.extend(reversed(folders))
+
+
+def iter_shooting_candidates(folder_path):
+    """
+    Изображения папки захвата в порядке поиска даты съёмки: BestShot, Captures, Focus, затем вся папка.
+    Каталоги читаются только по мере надобности, поэтому поиск обычно заканчивается на первом файле.
+    """
+    tried = set()
+    try:
+        with os.scandir(folder_path) as it:
+            bestshots = sorted(entry.path for entry in it
+                               if "bestshot" in entry.name.lower()
+                               and entry.name.lower().endswith(BESTSHOT_EXTENSIONS) and entry.is_file())
+    except OSError:
+        return
+    for path in bestshots:
+        tried.add(path)
+        yield path
+    for path in itertools.chain(iter_images(os.path.join(folder_path, 'Captures')),
+                                iter_images(os.path.join(folder_path, 'Focus')),
+                                iter_images(folder_path)):
+        if path not in tried:
+            tried.add(path)
+            yield path
+
+
+def natural_sort_key(s):
+    """Ключ для естественной сортировки как в проводнике Windows"""
+    return [int(text) if text.isdigit() else text.lower()
+            for text in re.split('([0-9]+)', s)]
+
+
+def list_source_folders(source_folder):
+    """Список папок источника (папки на диске или архива) в естественном порядке за один проход os.scandir"""
+    if is_source_archive(source_folder):
+        return open_source_archive(source_folder).folder_names()
+    with os.scandir(source_folder) as it:
+        folders = [entry.name for entry in it if entry.is_dir()]
+    folders.sort(key=natural_sort_key)
+    return folders
+
+
+# Одна операция плана: папка источника → устройство/номер
+PlanOperation = namedtuple("PlanOperation", "source source_path device number target_path label bytes files",
+                           defaults=(0,))
+
+
+class RenamePlan(namedtuple("RenamePlan", "kind attack attack_folder operations messages skipped")):
+    """
+    Неизменяемый план запуска: упорядоченные операции папка → устройство/номер.
+    Строится без чтения содержимого файлов, может быть показан, сохранён в JSON,
+    проверен и выполнен любым режимом вывода (копирование, ссылки, перемещение).
+    """
+    __slots__ = ()
+    
+    @property
+    def devices(self):
+        """Устройства плана в порядке появления"""
+        return list(dict.fromkeys(op.device for op in self.operations))
+    
+    @property
+    def total_bytes(self):
+        return sum(op.bytes for op in self.operations)
+    
+    def with_sizes(self, sizes):
+        """Возвращает копию плана с размерами папок из словаря {путь источника: (файлов, байт)}"""
+        operations = tuple(op._replace(files=sizes[op.source_path][0], bytes=sizes[op.source_path][1])
+                           if op.source_path in sizes else op for op in self.operations)
+        return self._replace(operations=operations)
+    
+    def validate(self):
+        """Проверяет план перед выполнением и возвращает список ошибок"""
+        errors = []
+        attack_folder = os.path.abspath(self.attack_folder)
+        # Повтор номера допустим, как и раньше: копирование выполнит такие операции по очереди
+        for op in self.operations:
+            archive = source_archive_of(op.source_path)
+            if archive is not None:
+                exists = archive.has_folder(os.path.basename(op.source_path))
+            else:
+                exists = os.path.isdir(op.source_path)
+            if not exists:
+                errors.append(f"Исходная папка не найдена: {op.source_path}")
+            if os.path.dirname(os.path.dirname(os.path.abspath(op.target_path))) != attack_folder:
+                errors.append(f"Номер {op.label} вне папки атаки")
+            if not (1 <= op.number <= 9999):
+                errors.append(f"Недопустимый номер папки: {op.number}")
+        return errors
+    
+    def preview_lines(self):
+        """Строки для предпросмотра плана в логе"""
+        for op in self.operations:
+            size = f" ({op.bytes / (1024 * 1024):.1f} МБ)" if op.bytes else ""
+            yield f"{op.source} → {op.label}{size}"
+    
+    def to_json(self, path):
+        data = {"kind": self.kind, "attack": self.attack, "attack_folder": self.attack_folder,
+                "skipped": self.skipped, "operations": [op._asdict() for op in self.operations]}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+    
+    @classmethod
+    def from_json(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        operations = tuple(PlanOperation(**op) for op in data["operations"])
+        return cls(data["kind"], data["attack"], data["attack_folder"], operations, (), data.get("skipped", 0))
+
+
+def attack_devices(attack_ranges, attack, device):
+    """Устройства, между которыми распределяются номера атаки"""
+    ranges = attack_ranges.get(attack, {})
+    if device == "все":
+        devices = [name for name in DEVICES if name in ranges]
+        if not devices:
+            raise ValueError(f"Для атаки {attack} не заданы диапазоны")
+        return devices
+    if device not in ranges:
+        raise ValueError(f"Выбранная комбинация атаки {attack} и устройства {device} недоступна")
+    return [device]
+
+
+def plan_renaming(folders, source_folder, attack_folder, attack, device, attack_ranges):
+    """
+    Распределяет папки источника по номерам атаки.
+    При двух устройствах папки делятся поровну, лишние папки отбрасываются.
+    """
+    ranges = attack_ranges.get(attack, {})
+    devices = attack_devices(attack_ranges, attack, device)
+    messages = []
+    
+    expected_count = sum(ranges[name][1] - ranges[name][0] + 1 for name in devices)
+    folders_to_process = list(folders)
+    if expected_count > 0 and len(folders_to_process) > expected_count:
+        messages.append(("WARNING", f"⚠️ Внимание: в исходной папке {len(folders_to_process)} папок, "
+                                    f"но требуется только {expected_count}"))
+        messages.append(("INFO", f"ℹ️ Будет обработано только {expected_count} папок"))
+        folders_to_process = folders_to_process[:expected_count]
+    
+    if len(devices) == 1:
+        groups = [(devices[0], folders_to_process)]
+    else:
+        # РАСПРЕДЕЛЯЕМ ПАПКИ ПОРОВНУ МЕЖДУ УСТРОЙСТВАМИ
+        half = len(folders_to_process) // 2
+        groups = [(devices[0], folders_to_process[:half]),
+                  (devices[1], folders_to_process[half:half * 2])]
+    
+    operations = []
+    for device_name, group in groups:
+        start_num, end_num = ranges[device_name]
+        available = end_num - start_num + 1
+        count = min(len(group), available)
+        if count < len(group):
+            if len(devices) == 1:
+                messages.append(("WARNING", f"⚠️ Доступно только {available} номеров, обрабатываем {count} папок"))
+            else:
+                messages.append(("WARNING", f"⚠️ Для {device_name} доступно только {available} номеров, "
+                                            f"обрабатываем {count} папок"))
+        
+        for offset, folder in enumerate(group[:count]):
+            number = start_num + offset
+            label = f"{device_name}/{number}" if device == "все" else str(number)
+            operations.append(PlanOperation(folder, os.path.join(source_folder, folder), device_name, number,
+                                            os.path.join(attack_folder, device_name, str(number)), label, 0))
+    
+    skipped = len(folders) - len(operations)
+    return RenamePlan("renaming", attack, attack_folder, tuple(operations), tuple(messages), skipped)
+
+
+def plan_replacement(folders, source_folder, attack_folder, attack, device, attack_ranges, numbers):
+    """Ставит папки источника на заданные номера по порядку; номер определяет устройство"""
+    if len(folders) != len(numbers):
+        raise ValueError(f"Количество папок в исходной папке ({len(folders)}) "
+                         f"не соответствует количеству номеров для замены ({len(numbers)})")
+    
+    ranges = attack_ranges.get(attack, {})
+    devices = attack_devices(attack_ranges, attack, device)
+    
+    operations = []
+    for folder, number in zip(folders, numbers):
+        found_device = None
+        for device_name in devices:
+            start_num, end_num = ranges[device_name]
+            if start_num <= number <= end_num:
+                found_device = device_name
+                break
+        
+        # Для атак 10-15 пропускаем проверку диапазонов
+        if not found_device:
+            if attack not in RANGE_FREE_ATTACKS:
+                if device == "все":
+                    raise ValueError(f"Номер {number} не входит ни в один диапазон атаки {attack}")
+                start_num, end_num = ranges[device]
+                raise ValueError(f"Номер {number} вне диапазона {start_num}-{end_num}")
+            found_device = devices[0]
+        
+        label = f"{found_device}/{number}" if device == "все" else str(number)
+        operations.append(PlanOperation(folder, os.path.join(source_folder, folder), found_device, number,
+                                        os.path.join(attack_folder, found_device, str(number)), label, 0))
+    
+    return RenamePlan("replacement", attack, attack_folder, tuple(operations), (), 0)
+
+
+class ChecksumManifest:
+    """
+    Манифест контрольных сумм папки атаки (.checksums.jsonl): по строке на папку номера
+    со списком файлов [путь, размер, mtime_ns, хэш]. Более поздняя запись папки заменяет прежнюю,
+    поэтому заменённые номера не требуют переписывать файл.
+    """
+    
+    def __init__(self, attack_folder):
+        self.attack_folder = attack_folder
+        self.path = os.path.join(attack_folder, CHECKSUM_MANIFEST)
+        self.lock = threading.Lock()
+    
+    def folder_key(self, folder_path):
+        """Ключ папки номера в манифесте: путь от папки атаки через /"""
+        return os.path.relpath(folder_path, self.attack_folder).replace(os.sep, "/")
+    
+    def load(self):
+        """Возвращает словарь {папка: запись} с последней записью каждой папки"""
+        folders = {}
+        if not os.path.exists(self.path):
+            return folders
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                folders[entry["folder"]] = entry
+        return folders
+    
+    def make_entry(self, folder_path, algorithm, files):
+        return {"folder": self.folder_key(folder_path), "algorithm": algorithm,
+                "time": datetime.datetime.now().isoformat(timespec='seconds'), "files": files}
+    
+    def append(self, folder_path, algorithm, files):
+        """Дописывает запись папки номера"""
+        entry = self.make_entry(folder_path, algorithm, files)
+        with self.lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+    
+    def rewrite(self, entries):
+        """Перезаписывает манифест целиком, по записи на папку, через временный файл"""
+        temp_path = self.path + ".tmp"
+        with self.lock:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+
+
+class RunJournal:
+    """
+    Журнал запуска в формате JSONL: первая строка - задание и список операций,
+    далее по строке на каждую папку. Каждая запись сбрасывается на диск (fsync),
+    поэтому после сбоя запуск можно продолжить, пропустив выполненные папки.
+    """
+    
+    def __init__(self, journal_dir, job):
+        os.makedirs(journal_dir, exist_ok=True)
+        key = json.dumps(job, sort_keys=True, ensure_ascii=False)
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+        self.path = os.path.join(journal_dir, f"{job['kind']}-{digest}.jsonl")
+        self.job = job
+        self.operations = None
+        self.completed = {}
+        self.finished = False
+        self.load()
+    
+    def load(self):
+        """Читает существующий журнал и строит индекс выполненных папок"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла не дописаться при сбое
+                    continue
+                if entry.get("type") == "job":
+                    self.operations = [PlanOperation(*op) for op in entry["operations"]]
+                elif entry.get("type") == "folder":
+                    # Папка, забракованная после копирования, снова считается невыполненной
+                    if entry.get("status") == "done":
+                        self.completed[(entry["source"], entry["path"])] = entry
+                    else:
+                        self.completed.pop((entry["source"], entry["path"]), None)
+                elif entry.get("type") == "finished":
+                    self.finished = True
+    
+    def can_resume(self):
+        """Есть ли незавершённый запуск, который можно продолжить"""
+        return self.operations is not None and not self.finished and bool(self.completed)
+    
+    def start(self, operations):
+        """Начинает журнал заново для списка операций"""
+        self.operations = list(operations)
+        self.completed = {}
+        self.finished = False
+        with open(self.path, 'w', encoding='utf-8') as f:
+            pass
+        self.write({"type": "job", "job": self.job, "operations": self.operations,
+                    "started_at": datetime.datetime.now().isoformat(timespec='seconds')})
+    
+    def write(self, entry):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def is_done(self, source, new_path):
+        return (source, new_path) in self.completed
+    
+    def record(self, source, new_path, status, files=0, size=0, error=None):
+        """Записывает результат обработки одной папки"""
+        entry = {"type": "folder", "source": source,
+                 "device": os.path.basename(os.path.dirname(new_path)),
+                 "number": os.path.basename(new_path), "path": new_path,
+                 "files": files, "bytes": size, "status": status,
+                 "time": datetime.datetime.now().isoformat(timespec='seconds')}
+        if error:
+            entry["error"] = error
+        self.write(entry)
+        if status == "done":
+            self.completed[(source, new_path)] = entry
+        else:
+            self.completed.pop((source, new_path), None)
+    
+    def finish(self):
+        self.write({"type": "finished", "time": datetime.datetime.now().isoformat(timespec='seconds')})
+        self.finished = True
+    
+    def summary(self):
+        """Итог запуска по журналу, без повторного обхода дисков"""
+        return {"folders": len(self.completed),
+                "files": sum(entry["files"] for entry in self.completed.values()),
+                "bytes": sum(entry["bytes"] for entry in self.completed.values())}
+
+
+class ShootingTimeCache:
+    """
+    Кэш дат съёмки в SQLite: (путь, размер, mtime_ns) → время съёмки по местным часам снимка, без часового пояса.
+    Изменённый файл не совпадёт по размеру или mtime и будет прочитан заново.
+    Давно не использованные записи и записи сверх предела вытесняются при сохранении.
+    """
+    
+    def __init__(self, path, max_entries=SHOOTING_CACHE_MAX_ENTRIES, max_age_days=SHOOTING_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400
+        # Соединение общее для потоков, обращения к нему идут под блокировкой
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        # Версия 1 хранит время съёмки по местным часам снимка; прежние записи зависели от часового пояса машины
+        if self.db.execute("PRAGMA user_version").fetchone()[0] < 1:
+            self.db.execute("DROP TABLE IF EXISTS shooting_time")
+            self.db.execute("PRAGMA user_version = 1")
+        self.db.execute("CREATE TABLE IF NOT EXISTS shooting_time (path TEXT PRIMARY KEY, size INTEGER, "
+                        "mtime_ns INTEGER, taken REAL, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS shooting_time_used ON shooting_time (used)")
+        self.db.commit()
+        self.used = set()
+        self.hits = 0
+    
+    def get(self, path, size, mtime_ns):
+        """Время съёмки из кэша или None"""
+        with self.lock:
+            row = self.db.execute("SELECT taken FROM shooting_time WHERE path = ? AND size = ? AND mtime_ns = ?",
+                                  (path, size, mtime_ns)).fetchone()
+            if row is None:
+                return None
+            # Время обращения обновляется пачкой при сохранении, а не отдельной записью на каждое попадание
+            self.used.add(path)
+            self.hits += 1
+        return wall_clock_datetime(row[0])
+    
+    def put(self, path, size, mtime_ns, taken):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO shooting_time VALUES (?, ?, ?, ?, ?)",
+                            (path, size, mtime_ns, wall_clock_seconds(taken), time.time()))
+    
+    def save(self):
+        """Сохраняет новые записи и вытесняет старые: сначала по возрасту, затем самые давние сверх предела"""
+        now = time.time()
+        with self.lock:
+            self.db.executemany("UPDATE shooting_time SET used = ? WHERE path = ?",
+                                [(now, path) for path in self.used])
+            self.used.clear()
+            self.db.execute("DELETE FROM shooting_time WHERE used < ?", (now - self.max_age,))
+            count = self.db.execute("SELECT COUNT(*) FROM shooting_time").fetchone()[0]
+            if count > self.max_entries:
+                self.db.execute("DELETE FROM shooting_time WHERE path IN "
+                                "(SELECT path FROM shooting_time ORDER BY used LIMIT ?)",
+                                (count - self.max_entries,))
+            self.db.commit()
+    
+    def close(self):
+        self.db.close()
+
+
+class RunManifest:
+    """
+    Манифест запуска в CSV или JSONL. Строка о папке пишется сразу после её обработки,
+    поэтому в памяти ничего не копится, а запись о запуске остаётся после закрытия окна.
+    """
+    
+    def __init__(self, manifest_dir, kind, attack, manifest_format="csv"):
+        os.makedirs(manifest_dir, exist_ok=True)
+        name = f"{new_run_id()} {kind} {attack}"
+        self.path = os.path.join(manifest_dir, f"{name}.{manifest_format}")
+        suffix = 1
+        while os.path.exists(self.path):
+            suffix += 1
+            self.path = os.path.join(manifest_dir, f"{name} ({suffix}).{manifest_format}")
+        self.kind = kind
+        self.attack = attack
+        self.format = manifest_format
+        # Архивы устройств пишутся параллельно и отчитываются из своих потоков
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'w', encoding='utf-8', newline='')
+        if manifest_format == "csv":
+            self.writer = csv.DictWriter(self.file, RUN_MANIFEST_FIELDS)
+            self.writer.writeheader()
+            self.file.flush()
+    
+    def record(self, op, status, files=0, size=0, duration=0.0, overwrite="", error=None):
+        """Дописывает строку о папке и сразу сбрасывает её в файл"""
+        row = {"time": datetime.datetime.now().isoformat(timespec='seconds'), "kind": self.kind,
+               "source": op.source, "attack": self.attack, "device": op.device, "number": op.number,
+               "files": files, "bytes": size, "duration": round(duration, 3), "overwrite": overwrite,
+               "status": status, "error": error or ""}
+        with self.lock:
+            if self.format == "csv":
+                self.writer.writerow(row)
+            else:
+                self.file.write(json.dumps(row, ensure_ascii=False) + "\n")
+            self.file.flush()
+    
+    def close(self):
+        self.file.close()
+
 
 class ModernFolderRenamer:
     def __init__(self, root):
@@ -22,10 +1978,42 @@ class ModernFolderRenamer:
         self.config_file = "attack_config.json"
         self.load_attack_config()
         
+        # Кэш дат съёмки рядом с конфигурацией: повторный запуск не открывает изображения
+        self.shooting_cache = self.open_shooting_cache()
+        
+        # Журналы запусков для продолжения после сбоя
+        self.journal_dir = "journals"
+        
+        # Манифесты запусков (CSV / JSONL) - постоянная запись о том, что сделано
+        self.run_manifest_dir = "run_manifests"
+        
+        # Пакетная очередь заданий хранится рядом с конфигурацией атак
+        self.queue_file = "job_queue.json"
+        self.queue_lock = threading.Lock()
+        self.unattended = threading.local()
+        self.load_job_queue()
+        
+        # Кэш размеров папок источника: путь → (отпечаток, (файлов, байт))
+        self.size_cache = {}
+        self.size_cache_lock = threading.Lock()
+        
+        # Лимиты ввода-вывода по физическим дискам, общие для всех операций
+        self.io_scheduler = IOScheduler()
+        
+        # Фоновые операции: поток и очередь событий для главного потока Tk
+        self.events = queue.Queue()
+        self.job_thread = None
+        self.job_token = CancelToken()
+        self.job_buttons = []
+        self.progress_phase = None
+        self.phase_started = 0
+        
         # Стили
         self.setup_styles()
         self.setup_ui()
         
+        self.root.after(50, self.process_events)
+        
     def center_window(self):
         """Центрирование окна на экране"""
         self.root.update_idletasks()
@@ -166,6 +2154,28 @@ class ModernFolderRenamer:
                               pady=12)
         title_label.pack()
         
+        # Строка состояния с прогрессом фоновых операций
+        status_frame = self.create_rounded_frame(self.root)
+        status_frame.pack(side="bottom", fill="x", padx=15, pady=(0, 10))
+        
+        self.progress_bar = ttk.Progressbar(status_frame, mode="determinate")
+        self.progress_bar.pack(fill="x", padx=12, pady=(8, 4))
+        
+        status_row = tk.Frame(status_frame, bg=self.colors['surface'])
+        status_row.pack(fill="x", padx=12, pady=(0, 8))
+        
+        self.progress_label = tk.Label(status_row, text="", font=("Segoe UI", 8),
+                                      bg=self.colors['surface'], fg=self.colors['text_secondary'])
+        self.progress_label.pack(side="left")
+        
+        self.cancel_btn = ttk.Button(status_row, text="⏹ Отмена", command=self.cancel_job,
+                                     style="Secondary.TButton", state="disabled")
+        self.cancel_btn.pack(side="right")
+        
+        self.pause_btn = ttk.Button(status_row, text="⏸ Пауза", command=self.toggle_pause,
+                                    style="Secondary.TButton", state="disabled")
+        self.pause_btn.pack(side="right", padx=(0, 8))
+        
         # Основной контейнер с вкладками
         notebook = ttk.Notebook(self.root)
         notebook.pack(fill="both", expand=True, padx=15, pady=8)
@@ -182,9 +2192,19 @@ class ModernFolderRenamer:
         settings_tab = self.create_rounded_frame(notebook)
         notebook.add(settings_tab, text="⚙️ Настройки атак")
         
+        # Вкладка параметров выполнения
+        execution_tab = self.create_rounded_frame(notebook)
+        notebook.add(execution_tab, text="🛠 Параметры выполнения")
+        
+        # Вкладка очереди заданий
+        queue_tab = self.create_rounded_frame(notebook)
+        notebook.add(queue_tab, text="📋 Очередь")
+        
         self.setup_main_tab(main_tab)
         self.setup_check_tab(check_tab)
         self.setup_settings_tab(settings_tab)
+        self.setup_execution_tab(execution_tab)
+        self.setup_queue_tab(queue_tab)
     
     def setup_main_tab(self, parent):
         # Создаем разделяемый фрейм для левой (настройки) и правой (логи) части
@@ -218,6 +2238,8 @@ class ModernFolderRenamer:
         
         ttk.Button(input_frame1, text="Обзор", 
                   command=self.browse_source, style="Secondary.TButton").grid(row=0, column=1)
+        ttk.Button(input_frame1, text="Архив",
+                  command=self.browse_source_archive, style="Secondary.TButton").grid(row=0, column=2, padx=(8, 0))
         
         # Информация о количестве папок в исходной папке
         self.source_info_label = tk.Label(folder_frame, text="", font=("Segoe UI", 8),
@@ -336,6 +2358,23 @@ class ModernFolderRenamer:
                                     style="Warning.TButton")
         self.replace_btn.pack(fill="x", pady=2)
         
+        plan_btn_frame = tk.Frame(btn_container, bg=self.colors['background'])
+        plan_btn_frame.pack(fill="x", pady=2)
+        plan_btn_frame.columnconfigure(0, weight=1)
+        plan_btn_frame.columnconfigure(1, weight=1)
+        
+        self.preview_btn = ttk.Button(plan_btn_frame, text="👁 Предпросмотр плана", 
+                                    command=self.preview_plan, 
+                                    style="Secondary.TButton")
+        self.preview_btn.grid(row=0, column=0, sticky="ew", padx=(0, 2))
+        
+        self.plan_file_btn = ttk.Button(plan_btn_frame, text="📂 Выполнить план из файла", 
+                                      command=self.execute_plan_file, 
+                                      style="Secondary.TButton")
+        self.plan_file_btn.grid(row=0, column=1, sticky="ew", padx=(2, 0))
+        
+        self.job_buttons.extend([self.rename_btn, self.replace_btn, self.preview_btn, self.plan_file_btn])
+        
         self.update_range_info()
         
         # Настройка правой части - логи
@@ -406,9 +2445,11 @@ class ModernFolderRenamer:
         
         input_frame1.columnconfigure(1, weight=1)
         
-        ttk.Button(attack_check_frame, text="🔍 Проверить атаку", 
+        self.check_attack_btn = ttk.Button(attack_check_frame, text="🔍 Проверить атаку", 
                   command=self.check_attack, 
-                  style="Rounded.TButton").pack(pady=8)
+                  style="Rounded.TButton")
+        self.check_attack_btn.pack(pady=8)
+        self.job_buttons.append(self.check_attack_btn)
         
         # Фрейм для проверки ID
         id_check_frame = self.create_rounded_frame(left_frame)
@@ -434,9 +2475,11 @@ class ModernFolderRenamer:
         
         input_frame2.columnconfigure(1, weight=1)
         
-        ttk.Button(id_check_frame, text="🔍 Проверить ID", 
+        self.check_id_btn = ttk.Button(id_check_frame, text="🔍 Проверить ID", 
                   command=self.check_id, 
-                  style="Rounded.TButton").pack(pady=8)
+                  style="Rounded.TButton")
+        self.check_id_btn.pack(pady=8)
+        self.job_buttons.append(self.check_id_btn)
         
         # Фрейм для общей проверки
         global_check_frame = self.create_rounded_frame(left_frame)
@@ -462,9 +2505,59 @@ class ModernFolderRenamer:
         
         input_frame3.columnconfigure(1, weight=1)
         
-        ttk.Button(global_check_frame, text="🔍 Выполнить общую проверку", 
+        self.check_global_btn = ttk.Button(global_check_frame, text="🔍 Выполнить общую проверку", 
                   command=self.check_global, 
-                  style="Rounded.TButton").pack(pady=8)
+                  style="Rounded.TButton")
+        self.check_global_btn.pack(pady=8)
+        self.job_buttons.append(self.check_global_btn)
+        
+        self.shooting_report_btn = ttk.Button(global_check_frame, text="⏱ Отчёт по времени съёмки (CSV / JSON)", 
+                  command=self.shooting_report, 
+                  style="Secondary.TButton")
+        self.shooting_report_btn.pack(pady=(0, 8))
+        self.job_buttons.append(self.shooting_report_btn)
+        
+        # Фрейм контрольных сумм
+        manifest_frame = self.create_rounded_frame(left_frame)
+        manifest_frame.pack(fill="x", padx=10, pady=8)
+        
+        tk.Label(manifest_frame, text="🔒 Контрольные суммы", 
+                font=("Segoe UI", 11, "bold"),
+                bg=self.colors['surface']).pack(anchor="w", pady=(12, 8), padx=12)
+        
+        input_frame4 = tk.Frame(manifest_frame, bg=self.colors['surface'])
+        input_frame4.pack(fill="x", padx=12, pady=8)
+        
+        tk.Label(input_frame4, text="Папка атаки, ID или проекта:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=0, column=0, sticky="w")
+        
+        self.manifest_entry = ttk.Entry(input_frame4, font=("Segoe UI", 9))
+        self.manifest_entry.grid(row=0, column=1, sticky="ew", padx=8)
+        
+        ttk.Button(input_frame4, text="Обзор", 
+                  command=lambda: self.browse_folder(self.manifest_entry),
+                  style="Secondary.TButton").grid(row=0, column=2, padx=(5, 0))
+        
+        input_frame4.columnconfigure(1, weight=1)
+        
+        self.full_verify_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(manifest_frame, text="Пересчитать суммы всех файлов, а не только изменившихся", 
+                       variable=self.full_verify_var).pack(anchor="w", padx=12, pady=4)
+        
+        manifest_buttons = tk.Frame(manifest_frame, bg=self.colors['surface'])
+        manifest_buttons.pack(pady=8)
+        
+        self.build_manifest_btn = ttk.Button(manifest_buttons, text="📝 Создать манифест", 
+                  command=self.build_manifests, 
+                  style="Secondary.TButton")
+        self.build_manifest_btn.pack(side="left", padx=4)
+        
+        self.verify_manifest_btn = ttk.Button(manifest_buttons, text="🔒 Перепроверить", 
+                  command=self.verify_manifests, 
+                  style="Rounded.TButton")
+        self.verify_manifest_btn.pack(side="left", padx=4)
+        self.job_buttons.extend([self.build_manifest_btn, self.verify_manifest_btn])
         
         # Настройка правой части - логов проверки
         check_log_header = tk.Frame(right_frame, bg=self.colors['surface'])
@@ -562,6 +2655,233 @@ class ModernFolderRenamer:
         ttk.Button(bottom_button_frame, text="🗑️ Удалить атаку", 
                   command=self.delete_attack, style="Secondary.TButton").pack(side="left", padx=2)
     
+    def setup_execution_tab(self, parent):
+        options_frame = self.create_rounded_frame(parent)
+        options_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        tk.Label(options_frame, text="🛠 Параметры копирования", 
+                font=("Segoe UI", 11, "bold"),
+                bg=self.colors['surface']).pack(anchor="w", pady=(12, 15), padx=12)
+        
+        workers_frame = tk.Frame(options_frame, bg=self.colors['surface'])
+        workers_frame.pack(fill="x", padx=12, pady=8)
+        
+        tk.Label(workers_frame, text="Папок одновременно:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=0, column=0, sticky="w", pady=4)
+        
+        self.copy_workers_var = tk.IntVar(value=DEFAULT_COPY_WORKERS)
+        ttk.Spinbox(workers_frame, from_=1, to=32, textvariable=self.copy_workers_var,
+                   width=6, font=("Segoe UI", 9)).grid(row=0, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(workers_frame, text="Файлов одновременно в папке:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=1, column=0, sticky="w", pady=4)
+        
+        self.file_workers_var = tk.IntVar(value=1)
+        ttk.Spinbox(workers_frame, from_=1, to=16, textvariable=self.file_workers_var,
+                   width=6, font=("Segoe UI", 9)).grid(row=1, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(workers_frame, text="Папок одновременно при чтении времени съёмки:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=2, column=0, sticky="w", pady=4)
+        
+        self.exif_workers_var = tk.IntVar(value=DEFAULT_EXIF_WORKERS)
+        ttk.Spinbox(workers_frame, from_=1, to=64, textvariable=self.exif_workers_var,
+                   width=6, font=("Segoe UI", 9)).grid(row=2, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(workers_frame, text="Снимков на папку при поиске времени съёмки, не больше:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=3, column=0, sticky="w", pady=4)
+        
+        self.shooting_probe_limit_var = tk.IntVar(value=DEFAULT_SHOOTING_PROBE_LIMIT)
+        ttk.Spinbox(workers_frame, from_=1, to=1000, textvariable=self.shooting_probe_limit_var,
+                   width=6, font=("Segoe UI", 9)).grid(row=3, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(options_frame, text="Для SSD и NAS помогает 4-8 папок одновременно, для USB-флешек лучше 1-2", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=12, pady=(0, 12))
+        
+        mode_frame = tk.Frame(options_frame, bg=self.colors['surface'])
+        mode_frame.pack(fill="x", padx=12, pady=8)
+        
+        tk.Label(mode_frame, text="Режим вывода:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=0, column=0, sticky="w", pady=4)
+        
+        self.output_mode_var = tk.StringVar(value=OUTPUT_MODES["copy"])
+        ttk.Combobox(mode_frame, textvariable=self.output_mode_var,
+                    values=list(OUTPUT_MODES.values()),
+                    state="readonly", width=40, font=("Segoe UI", 9)).grid(row=0, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(mode_frame, text="Архив:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=1, column=0, sticky="w", pady=4)
+        
+        archive_frame = tk.Frame(mode_frame, bg=self.colors['surface'])
+        archive_frame.grid(row=1, column=1, sticky="w", padx=8, pady=4)
+        
+        self.archive_format_var = tk.StringVar(value=ARCHIVE_FORMATS["zip"])
+        ttk.Combobox(archive_frame, textvariable=self.archive_format_var,
+                    values=list(ARCHIVE_FORMATS.values()),
+                    state="readonly", width=6, font=("Segoe UI", 9)).pack(side="left")
+        
+        self.archive_compression_var = tk.StringVar(value=ARCHIVE_COMPRESSION["stored"])
+        ttk.Combobox(archive_frame, textvariable=self.archive_compression_var,
+                    values=list(ARCHIVE_COMPRESSION.values()),
+                    state="readonly", width=28, font=("Segoe UI", 9)).pack(side="left", padx=(8, 0))
+        
+        tk.Label(options_frame, text="Ссылки работают мгновенно, если источник и назначение на одном диске; "
+                                     "при разных дисках файлы копируются. "
+                                     "Архив пишется по одному на устройство: <атака> - <устройство>.zip", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=12, pady=(0, 12))
+        
+        self.sync_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="🔁 Существующие номера синхронизировать, а не перекопировать целиком", 
+                       variable=self.sync_var).pack(anchor="w", padx=12, pady=4)
+        
+        self.sync_hash_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Сравнивать файлы по содержимому (хэш), а не по размеру и дате", 
+                       variable=self.sync_hash_var).pack(anchor="w", padx=32, pady=4)
+        
+        self.preserve_metadata_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(options_frame, text="📅 Сохранять даты и права файлов при копировании", 
+                       variable=self.preserve_metadata_var).pack(anchor="w", padx=12, pady=4)
+        
+        verify_frame = tk.Frame(options_frame, bg=self.colors['surface'])
+        verify_frame.pack(fill="x", padx=12, pady=4)
+        
+        self.verify_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(verify_frame, text="🔒 Сверять копии с источником по контрольным суммам", 
+                       variable=self.verify_var).pack(side="left")
+        
+        self.verify_algorithm_var = tk.StringVar(value=HASH_ALGORITHMS[0])
+        ttk.Combobox(verify_frame, textvariable=self.verify_algorithm_var,
+                    values=list(HASH_ALGORITHMS),
+                    state="readonly", width=10, font=("Segoe UI", 9)).pack(side="left", padx=8)
+        
+        tk.Label(options_frame, text=f"Сверка идёт параллельно копированию следующих папок, "
+                                     f"суммы сохраняются в {CHECKSUM_MANIFEST} папки атаки", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=32, pady=(0, 8))
+        
+        run_manifest_frame = tk.Frame(options_frame, bg=self.colors['surface'])
+        run_manifest_frame.pack(fill="x", padx=12, pady=4)
+        
+        self.run_manifest_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(run_manifest_frame, text="📄 Записывать манифест запуска", 
+                       variable=self.run_manifest_var).pack(side="left")
+        
+        self.run_manifest_format_var = tk.StringVar(value=RUN_MANIFEST_FORMATS["csv"])
+        ttk.Combobox(run_manifest_frame, textvariable=self.run_manifest_format_var,
+                    values=list(RUN_MANIFEST_FORMATS.values()),
+                    state="readonly", width=8, font=("Segoe UI", 9)).pack(side="left", padx=8)
+        
+        tk.Label(options_frame, text=f"Строка о каждой папке (источник, номер, файлы, объём, длительность, замена) "
+                                     f"пишется сразу после её обработки в папку {self.run_manifest_dir}", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=32, pady=(0, 8))
+        
+        tk.Label(options_frame, text="💽 Диски", 
+                font=("Segoe UI", 11, "bold"),
+                bg=self.colors['surface']).pack(anchor="w", pady=(20, 10), padx=12)
+        
+        io_frame = tk.Frame(options_frame, bg=self.colors['surface'])
+        io_frame.pack(fill="x", padx=12, pady=4)
+        
+        tk.Label(io_frame, text="Операций на один диск одновременно:", 
+                font=("Segoe UI", 9),
+                bg=self.colors['surface']).grid(row=0, column=0, sticky="w", pady=4)
+        
+        self.io_slots_var = tk.IntVar(value=DEFAULT_DEVICE_SLOTS)
+        ttk.Spinbox(io_frame, from_=1, to=64, textvariable=self.io_slots_var,
+                   width=6, font=("Segoe UI", 9)).grid(row=0, column=1, sticky="w", padx=8, pady=4)
+        
+        tk.Label(options_frame, text="Ограничения отдельных дисков, по строке: <путь на диске>: <операций>[, <МБ/с>]", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=12, pady=(4, 2))
+        
+        self.io_limits_text = tk.Text(options_frame, height=3, font=("Consolas", 9), relief="solid", bd=1)
+        self.io_limits_text.pack(fill="x", padx=12, pady=(0, 8))
+        
+        tk.Label(options_frame, text="🗑 Корзина заменённых папок", 
+                font=("Segoe UI", 11, "bold"),
+                bg=self.colors['surface']).pack(anchor="w", pady=(20, 10), padx=12)
+        
+        self.keep_trash_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(options_frame, text="Хранить заменённые папки в корзине до ручной очистки", 
+                       variable=self.keep_trash_var).pack(anchor="w", padx=12, pady=4)
+        
+        tk.Label(options_frame, text="Заменённые номера мгновенно переносятся в .trash папки атаки; "
+                                     "без хранения корзина очищается в фоне после запуска", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=12, pady=(0, 8))
+        
+        trash_buttons = tk.Frame(options_frame, bg=self.colors['surface'])
+        trash_buttons.pack(fill="x", padx=12, pady=8)
+        
+        self.restore_trash_btn = ttk.Button(trash_buttons, text="♻ Восстановить из корзины", 
+                                           command=self.restore_trash, style="Secondary.TButton")
+        self.restore_trash_btn.pack(side="left", padx=(0, 8))
+        
+        self.purge_trash_btn = ttk.Button(trash_buttons, text="🗑 Очистить корзину", 
+                                         command=self.purge_attack_trash, style="Secondary.TButton")
+        self.purge_trash_btn.pack(side="left")
+        self.job_buttons.extend([self.restore_trash_btn, self.purge_trash_btn])
+    
+    def setup_queue_tab(self, parent):
+        queue_frame = self.create_rounded_frame(parent)
+        queue_frame.pack(fill="both", expand=True, padx=10, pady=10)
+        
+        tk.Label(queue_frame, text="📋 Очередь заданий", 
+                font=("Segoe UI", 11, "bold"),
+                bg=self.colors['surface']).pack(anchor="w", pady=(12, 8), padx=12)
+        
+        tk.Label(queue_frame, text="Задания на разных дисках выполняются одновременно, на общем диске - по очереди. "
+                                   "Очередь сохраняется между запусками программы", 
+                font=("Segoe UI", 8),
+                bg=self.colors['surface'],
+                fg=self.colors['text_secondary']).pack(anchor="w", padx=12, pady=(0, 8))
+        
+        columns = ("id", "source", "attack", "device", "numbers", "mode", "status")
+        self.queue_tree = ttk.Treeview(queue_frame, columns=columns, show="headings", height=12)
+        for column, title, width in (("id", "№", 40), ("source", "Источник", 260), ("attack", "Атака", 180),
+                                     ("device", "Устройство", 90), ("numbers", "Номера", 110),
+                                     ("mode", "Режим", 150), ("status", "Статус", 220)):
+            self.queue_tree.heading(column, text=title)
+            self.queue_tree.column(column, width=width, anchor="w")
+        self.queue_tree.pack(fill="both", expand=True, padx=12, pady=8)
+        
+        button_frame = tk.Frame(queue_frame, bg=self.colors['surface'])
+        button_frame.pack(fill="x", padx=12, pady=(0, 12))
+        
+        queue_buttons = [
+            ttk.Button(button_frame, text="➕ Добавить текущие параметры", 
+                      command=self.add_current_to_queue, style="Secondary.TButton"),
+            ttk.Button(button_frame, text="📂 Загрузить пакет", 
+                      command=self.load_batch_file, style="Secondary.TButton"),
+            ttk.Button(button_frame, text="🗑️ Удалить выбранные", 
+                      command=self.remove_queue_jobs, style="Secondary.TButton"),
+            ttk.Button(button_frame, text="🧹 Убрать выполненные", 
+                      command=self.clear_done_jobs, style="Secondary.TButton"),
+        ]
+        for button in queue_buttons:
+            button.pack(side="left", padx=(0, 8))
+        
+        self.run_queue_btn = ttk.Button(button_frame, text="▶ Запустить очередь", 
+                                       command=self.run_queue, style="Success.TButton")
+        self.run_queue_btn.pack(side="right")
+        self.job_buttons.extend(queue_buttons + [self.run_queue_btn])
+        
+        self.refresh_queue_view()
+    
     def browse_source(self):
         folder = filedialog.askdirectory()
         if folder:
@@ -569,6 +2889,14 @@ class ModernFolderRenamer:
             self.source_entry.insert(0, folder)
             self.update_source_info()
     
+    def browse_source_archive(self):
+        path = filedialog.askopenfilename(title="Выберите архив с папками",
+                                          filetypes=[("Архив", " ".join("*" + ext for ext in SOURCE_ARCHIVE_EXTENSIONS))])
+        if path:
+            self.source_entry.delete(0, tk.END)
+            self.source_entry.insert(0, path)
+            self.update_source_info()
+    
     def browse_dest(self):
         folder = filedialog.askdirectory()
         if folder:
@@ -584,11 +2912,13 @@ class ModernFolderRenamer:
     def update_source_info(self, event=None):
         """Обновляет информацию о количестве папок в исходной папке"""
         source_folder = self.source_entry.get()
-        if source_folder and os.path.exists(source_folder):
+        if source_folder and is_source_archive(source_folder):
+            # Индекс архива (для .tar.gz - полная распаковка) строится в фоне, чтобы окно не замирало
+            self.source_info_label.config(text="📦 Чтение архива...")
+            threading.Thread(target=self.index_source_archive, args=(source_folder,), daemon=True).start()
+        elif source_folder and os.path.exists(source_folder):
             try:
-                folders = [f for f in os.listdir(source_folder) 
-                          if os.path.isdir(os.path.join(source_folder, f))]
-                count = len(folders)
+                count = len(list_source_folders(source_folder))
                 self.source_info_label.config(text=f"📁 Найдено папок: {count}")
                 
                 # Также обновляем информацию о диапазоне
@@ -598,6 +2928,20 @@ class ModernFolderRenamer:
         else:
             self.source_info_label.config(text="")
     
+    def index_source_archive(self, path):
+        """Строит индекс архива-источника в фоновом потоке и передаёт итог в главный поток"""
+        try:
+            text = f"📦 Найдено папок в архиве: {len(list_source_folders(path))}"
+        except Exception:
+            text = "❌ Ошибка чтения архива"
+        self.events.put(("call", self.show_source_archive_info, (path, text), {}, threading.Event(), {}))
+    
+    def show_source_archive_info(self, path, text):
+        # Пока архив читался, в поле могли выбрать другой источник
+        if self.source_entry.get() == path:
+            self.source_info_label.config(text=text)
+            self.update_range_info()
+    
     def update_range_info(self, event=None):
         attack = self.attack_var.get()
         device = self.device_var.get()
@@ -626,8 +2970,53 @@ class ModernFolderRenamer:
         else:
             self.range_info.config(text="❌ Выбранная комбинация недоступна")
     
+    def open_shooting_cache(self):
+        """Открывает кэш дат съёмки; без SQLite или при ошибке работа идёт без кэша"""
+        if sqlite3 is None:
+            return None
+        path = os.path.join(os.path.dirname(os.path.abspath(self.config_file)), SHOOTING_CACHE_FILE)
+        try:
+            return ShootingTimeCache(path)
+        except sqlite3.Error:
+            return None
+    
     def get_image_shooting_date(self, image_path):
+        """Получает дату съёмки изображения, по возможности из кэша"""
+        if self.shooting_cache is None or not isinstance(image_path, str):
+            return self.read_image_shooting_date(image_path)
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        key = (os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        date = self.shooting_cache.get(*key)
+        if date is None:
+            date = self.read_image_shooting_date(image_path)
+            if date:
+                self.shooting_cache.put(*key, date)
+        return date
+    
+    def read_image_shooting_date(self, image_path):
         """Получает дату съёмки из EXIF данных изображений"""
+        try:
+            # JPEG и TIFF разбираются по заголовку, без Pillow и декодирования изображения
+            date = read_exif_datetime(image_path)
+        except ValueError:
+            date = self.get_pillow_shooting_date(image_path)
+        except Exception:
+            date = None
+        if date:
+            return date
+        
+        # Если EXIF недоступен, используем дату создания файла как fallback
+        try:
+            timestamp = os.path.getctime(image_path)
+            return datetime.datetime.fromtimestamp(timestamp)
+        except Exception:
+            return None
+    
+    def get_pillow_shooting_date(self, image_path):
+        """Дата съёмки из EXIF через Pillow - для форматов, которые не разбираются по заголовку"""
         try:
             # Для получения EXIF данных потребуется установка Pillow
             # pip install Pillow
@@ -641,152 +3030,114 @@ class ModernFolderRenamer:
                         tag = TAGS.get(tag_id, tag_id)
                         if tag == 'DateTimeOriginal':
                             # Формат: "2023:10:15 14:30:25"
-                            return datetime.datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
-        except Exception:
-            pass
-        
-        # Если EXIF недоступен, используем дату создания файла как fallback
-        try:
-            timestamp = os.path.getctime(image_path)
-            return datetime.datetime.fromtimestamp(timestamp)
-        except Exception:
-            return None
-    
-    def find_image_files(self, folder_path):
-        """Находит все файлы изображений в папке"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif'}
-        image_files = []
-        
-        try:
-            for root, dirs, files in os.walk(folder_path):
-                for file in files:
-                    if any(file.lower().endswith(ext) for ext in image_extensions):
-                        image_files.append(os.path.join(root, file))
-        except Exception:
-            pass
-        
-        return image_files
-    
-    def get_folder_shooting_time(self, folder_path):
-        """Получает время съёмки для папки на основе EXIF данных изображений"""
-        # Сначала ищем BestShot
-        bestshot_files = []
-        try:
-            for file in os.listdir(folder_path):
-                if "bestshot" in file.lower() and any(file.lower().endswith(ext) for ext in ['.jpg', '.jpeg', '.png']):
-                    bestshot_files.append(os.path.join(folder_path, file))
+                            return datetime.datetime.strptime(value, '%Y:%m:%d %H:%M:%S')
         except Exception:
             pass
+        return None
+    
+    def get_folder_shooting_time(self, folder_path, probe_limit=DEFAULT_SHOOTING_PROBE_LIMIT):
+        """
+        Получает время съёмки для папки на основе EXIF данных изображений.
+        Проверяется не больше probe_limit файлов, поиск останавливается на первой найденной дате.
+        """
+        archive = source_archive_of(folder_path)
+        if archive is not None:
+            return self.get_archive_shooting_time(archive, os.path.basename(folder_path), probe_limit)
         
-        if bestshot_files:
-            date = self.get_image_shooting_date(bestshot_files[0])
+        # BestShot, затем Captures и Focus, затем любые изображения в папке
+        candidates = iter_shooting_candidates(folder_path)
+        for image_file in itertools.islice(candidates, probe_limit):
+            date = self.get_image_shooting_date(image_file)
             if date:
                 return date
         
-        # Если BestShot не найден, ищем в папках Captures и Focus
-        subfolders_to_check = ['Captures', 'Focus']
-        
-        for subfolder in subfolders_to_check:
-            subfolder_path = os.path.join(folder_path, subfolder)
-            if os.path.exists(subfolder_path):
-                image_files = self.find_image_files(subfolder_path)
-                for image_file in image_files:
-                    date = self.get_image_shooting_date(image_file)
-                    if date:
-                        return date
-        
-        # Если ничего не найдено, ищем любые изображения в папке
-        image_files = self.find_image_files(folder_path)
-        for image_file in image_files:
-            date = self.get_image_shooting_date(image_file)
+        return None
+    
+    def read_folder_shooting_time(self, folder_path, probe_limit=DEFAULT_SHOOTING_PROBE_LIMIT):
+        """Время съёмки папки для пула потоков: чтение идёт через планировщик дисков, как и проверка содержимого"""
+        with self.io_scheduler.slots((self.io_scheduler.device_of(folder_path),)):
+            return self.get_folder_shooting_time(folder_path, probe_limit)
+    
+    def get_archive_shooting_time(self, archive, folder, probe_limit=DEFAULT_SHOOTING_PROBE_LIMIT):
+        """Время съёмки папки архива: BestShot, затем Captures и Focus, затем любые изображения - без распаковки"""
+        
+        def priority(relative):
+            parts = relative.split(os.sep)
+            if len(parts) == 1 and "bestshot" in relative.lower():
+                return 0
+            if parts[0] in ('Captures', 'Focus') and len(parts) > 1:
+                return 1 + ('Captures', 'Focus').index(parts[0])
+            return 3
+        
+        images = [(relative, size, info) for relative, size, info in archive.list_files(folder)
+                  if relative.lower().endswith(IMAGE_EXTENSIONS)]
+        images.sort(key=lambda item: priority(item[0]))
+        for relative, size, info in images[:probe_limit]:
+            mtime = archive.member_mtime(info)
+            key = (os.path.join(os.path.abspath(archive.path), folder, relative), size, int(mtime * 1e9))
+            date = self.shooting_cache.get(*key) if self.shooting_cache is not None else None
+            if date:
+                return date
+            try:
+                with archive.open_member(info) as member:
+                    date = self.get_image_shooting_date(member)
+            except Exception:
+                date = None
             if date:
+                if self.shooting_cache is not None:
+                    self.shooting_cache.put(*key, date)
                 return date
         
+        # Ни в одном из probe_limit файлов нет EXIF: вместо даты создания файла - дата первого файла в архиве
+        if images:
+            return datetime.datetime.fromtimestamp(archive.member_mtime(images[0][2]))
         return None
     
-    def calculate_shooting_time(self, folders, source_folder):
-        """Вычисляет время съёмки на основе дат съёмки из EXIF данных"""
+    def calculate_shooting_time(self, folders, source_folder, workers=DEFAULT_EXIF_WORKERS,
+                                probe_limit=DEFAULT_SHOOTING_PROBE_LIMIT):
+        """
+        Вычисляет время съёмки на основе дат съёмки из EXIF данных.
+        Даты папок читаются в пуле потоков, результаты собираются в порядке папок.
+        """
         if not folders:
             return "не удалось вычислить"
         
         try:
             # Получаем времена съёмки всех папок из EXIF
             shooting_times = []
-            for folder in folders:
-                folder_path = os.path.join(source_folder, folder)
-                shooting_time = self.get_folder_shooting_time(folder_path)
-                if shooting_time:
-                    shooting_times.append((folder, shooting_time))
-            
-            if not shooting_times:
-                return "не удалось вычислить"
+            hits_before = self.shooting_cache.hits if self.shooting_cache is not None else 0
             
-            # Сортируем по времени съёмки
-            shooting_times.sort(key=lambda x: x[1])
+            jobs = [(os.path.join(source_folder, folder), probe_limit) for folder in folders]
+            results = run_in_pool(self.in_job_context(self.read_folder_shooting_time), jobs, workers)
+            try:
+                for done, (folder, shooting_time) in enumerate(zip(folders, results), 1):
+                    self.checkpoint()
+                    self.report_progress("Время съёмки", done, len(folders))
+                    if shooting_time:
+                        shooting_times.append((folder, shooting_time))
+            finally:
+                results.close()
             
-            # Группируем по дням
-            days_dict = {}
-            for folder, time_obj in shooting_times:
-                day_key = time_obj.date()
-                if day_key not in days_dict:
-                    days_dict[day_key] = []
-                days_dict[day_key].append((folder, time_obj))
+            if self.shooting_cache is not None:
+                hits = self.shooting_cache.hits - hits_before
+                try:
+                    self.shooting_cache.save()
+                except sqlite3.Error as e:
+                    self.log(f"Не удалось сохранить кэш времени съёмки: {str(e)}", "WARNING")
+                if hits:
+                    self.log(f"⚡ Дат съёмки из кэша: {hits}", "DETAIL")
             
-            total_seconds = 0
-            day_count = 0
+            if not shooting_times:
+                return "не удалось вычислить"
             
-            # Обрабатываем каждый день отдельно
-            for day, day_times in days_dict.items():
-                day_count += 1
-                day_times.sort(key=lambda x: x[1])
-                
-                # Разбиваем на сессии внутри дня (группы с интервалом менее 2 часов)
-                sessions = []
-                current_session = [day_times[0]]
-                
-                for i in range(1, len(day_times)):
-                    time_diff = (day_times[i][1] - day_times[i-1][1]).total_seconds()
-                    if time_diff > 7200:  # 2 часа в секундах
-                        sessions.append(current_session)
-                        current_session = [day_times[i]]
-                    else:
-                        current_session.append(day_times[i])
-                
-                sessions.append(current_session)
-                
-                # Вычисляем время съёмки для дня
-                day_seconds = 0
-                for session in sessions:
-                    if len(session) > 1:
-                        first_time = session[0][1].timestamp()
-                        last_time = session[-1][1].timestamp()
-                        session_duration = last_time - first_time
-                        day_seconds += session_duration
-                    else:
-                        # Для одиночных сессий используем минимальное время 30 секунд
-                        day_seconds += 30
-                
-                total_seconds += day_seconds
-                
-                # Логируем информацию о дне
-                first_dt = day_times[0][1]
-                last_dt = day_times[-1][1]
-                self.log(f"📅 День {day_count} ({first_dt.strftime('%Y-%m-%d')}): {len(day_times)} папок, время: {self.format_duration(day_seconds)}", "DETAIL")
-                
-                # Логируем сессии внутри дня
-                for i, session in enumerate(sessions, 1):
-                    if len(session) > 1:
-                        first_session_time = session[0][1]
-                        last_session_time = session[-1][1]
-                        session_duration = last_session_time.timestamp() - first_session_time.timestamp()
-                        self.log(f"  📊 Сессия {i}: {first_session_time.strftime('%H:%M:%S')} - {last_session_time.strftime('%H:%M:%S')} "
-                               f"({len(session)} папок, время: {self.format_duration(session_duration)})", "DETAIL")
-                    else:
-                        self.log(f"  📊 Сессия {i}: 1 папка, время: 00:00:30", "DETAIL")
+            # Дни и сессии считает движок кластеризации, лог собирается одной записью
+            clusters = cluster_sessions(array('d', (wall_clock_seconds(moment) for _, moment in shooting_times)))
+            self.log("\n".join(self.format_shooting_clusters(clusters)), "DETAIL")
+            total_seconds = clusters.total
             
             if total_seconds == 0:
                 # Минимальное время съемки - 30 секунд на папку
-                return self.format_duration(len(folders) * 30)
+                return self.format_duration(len(folders) * MIN_SESSION_SECONDS)
             
             return self.format_duration(total_seconds)
             
@@ -794,6 +3145,23 @@ class ModernFolderRenamer:
             self.log(f"Ошибка вычисления времени съёмки: {str(e)}", "WARNING")
             return "не удалось вычислить"
     
+    def format_shooting_clusters(self, clusters):
+        """Строки лога по дням и сессиям съёмки; длинные списки сессий сокращаются"""
+        lines = []
+        for number, day in enumerate(clusters.days(), 1):
+            lines.append(f"📅 День {number} ({day.date.strftime('%Y-%m-%d')}): {day.count} папок, "
+                         f"время: {self.format_duration(day.duration)}")
+            for i, session in enumerate(day.sessions[:SESSION_LOG_LIMIT], 1):
+                if session.count > 1:
+                    lines.append(f"  📊 Сессия {i}: {self.format_duration(session.start % 86400)} - "
+                                 f"{self.format_duration(session.end % 86400)} "
+                                 f"({session.count} папок, время: {self.format_duration(session.duration)})")
+                else:
+                    lines.append(f"  📊 Сессия {i}: 1 папка, время: {self.format_duration(session.duration)}")
+            if len(day.sessions) > SESSION_LOG_LIMIT:
+                lines.append(f"  📊 ... ещё сессий: {len(day.sessions) - SESSION_LOG_LIMIT}")
+        return lines
+    
     def format_duration(self, total_seconds):
         """Форматирует длительность в формат HH:MM:SS"""
         hours = int(total_seconds // 3600)
@@ -835,8 +3203,7 @@ class ModernFolderRenamer:
     
     def natural_sort_key(self, s):
         """Ключ для естественной сортировки как в проводнике Windows"""
-        return [int(text) if text.isdigit() else text.lower()
-                for text in re.split('([0-9]+)', s)]
+        return natural_sort_key(s)
     
     def get_attack_expected_count(self, attack_name, device):
         """Получает ожидаемое количество папок для атаки и устройства"""
@@ -888,9 +3255,7 @@ class ModernFolderRenamer:
         
         formatted_message = f"[{timestamp}] {icon} {message}\n"
         
-        self.log_text.insert(tk.END, formatted_message, tag)
-        self.log_text.see(tk.END)
-        self.root.update()
+        self.write_log(self.log_text, formatted_message, tag)
     
     def check_log(self, message, level="INFO", indent=0):
         """Логирование для вкладки проверки с поддержкой отступов"""
@@ -924,144 +3289,1244 @@ class ModernFolderRenamer:
         indent_str = "  " * indent
         formatted_message = f"{indent_str}{icon} {message}\n"
         
-        self.check_log_text.insert(tk.END, formatted_message, tag)
-        self.check_log_text.see(tk.END)
-        self.root.update()
+        self.write_log(self.check_log_text, formatted_message, tag)
+    
+    def write_log(self, widget, text, tag):
+        """Пишет в лог напрямую из главного потока или через очередь из фонового"""
+        if threading.current_thread() is threading.main_thread():
+            widget.insert(tk.END, text, tag)
+            widget.see(tk.END)
+        else:
+            self.events.put(("log", widget, text, tag))
+    
+    def call_in_ui(self, func, *args, **kwargs):
+        """Выполняет функцию (например, диалог) в главном потоке и ждёт её результата"""
+        if getattr(self.unattended, "active", False) and getattr(func, "__module__", None) == messagebox.__name__:
+            return self.answer_unattended(func.__name__, args)
+        
+        if threading.current_thread() is threading.main_thread():
+            return func(*args, **kwargs)
+        
+        done = threading.Event()
+        result = {}
+        self.events.put(("call", func, args, kwargs, done, result))
+        done.wait()
+        if "error" in result:
+            raise result["error"]
+        return result.get("value")
+    
+    def in_job_context(self, func):
+        """
+        Оборачивает функцию для потоков пула: режим задания очереди (без диалогов и прогресса)
+        хранится в потоке задания, поэтому передаётся потокам пула явно.
+        """
+        active = getattr(self.unattended, "active", False)
+        messages = getattr(self.unattended, "messages", None)
+        
+        def run(*args):
+            self.unattended.active = active
+            self.unattended.messages = messages
+            try:
+                return func(*args)
+            finally:
+                self.unattended.active = False
+        return run
+    
+    def report_progress(self, phase, done, total=None, done_bytes=0, total_bytes=0):
+        """Отправляет состояние прогресса в строку состояния"""
+        # В очереди строка состояния показывает прогресс по заданиям, а не по отдельным папкам
+        if getattr(self.unattended, "active", False):
+            return
+        self.events.put(("progress", phase, done, total, done_bytes, total_bytes))
+    
+    def start_job(self, title, func, *args):
+        """Запускает тяжёлую операцию в фоновом потоке, не блокируя интерфейс"""
+        if self.job_thread and self.job_thread.is_alive():
+            messagebox.showwarning("Подождите", "Уже выполняется другая операция")
+            return
+        
+        if not self.configure_io():
+            return
+        
+        for button in self.job_buttons:
+            button.config(state="disabled")
+        self.job_token = CancelToken()
+        self.pause_btn.config(text="⏸ Пауза", state="normal")
+        self.cancel_btn.config(state="normal")
+        self.progress_phase = None
+        self.progress_bar.config(mode="determinate", value=0)
+        self.progress_label.config(text=f"⏳ {title}...")
+        
+        self.job_thread = threading.Thread(target=self.run_job, args=(func, args), daemon=True)
+        self.job_thread.start()
+    
+    def run_job(self, func, args):
+        try:
+            func(*args)
+        except JobCancelled:
+            if func in (self.run_check_attack, self.run_check_id, self.run_check_global,
+                        self.run_build_manifests, self.run_verify_manifests, self.run_shooting_report):
+                self.check_log("⏹ Проверка отменена", "WARNING")
+            else:
+                self.log("⏹ Операция отменена. Уже готовые папки сохранены, незавершённые копии удалены", "WARNING")
+        except Exception as e:
+            self.log(f"Ошибка: {str(e)}", "ERROR")
+        finally:
+            self.events.put(("done",))
+    
+    def checkpoint(self):
+        """Точка проверки паузы и отмены для циклов фоновой операции"""
+        self.job_token.checkpoint()
+    
+    def toggle_pause(self):
+        """Приостанавливает операцию, освобождая диск, или продолжает её"""
+        if self.job_token.paused:
+            self.job_token.resume()
+            self.pause_btn.config(text="⏸ Пауза")
+            self.log("▶ Операция продолжена", "INFO")
+        else:
+            self.job_token.pause()
+            self.pause_btn.config(text="▶ Продолжить")
+            self.progress_label.config(text="⏸ Пауза: операция остановится после текущих файлов")
+            self.log("⏸ Операция приостановлена", "WARNING")
+    
+    def cancel_job(self):
+        """Отменяет текущую операцию после текущих файлов"""
+        if not self.job_token.cancelled.is_set():
+            self.job_token.cancel()
+            self.pause_btn.config(state="disabled")
+            self.cancel_btn.config(state="disabled")
+            self.progress_label.config(text="⏹ Отмена: дожидаемся текущих файлов...")
+    
+    def finish_job(self):
+        """Возвращает интерфейс в исходное состояние после фоновой операции"""
+        for button in self.job_buttons:
+            button.config(state="normal")
+        self.pause_btn.config(text="⏸ Пауза", state="disabled")
+        self.cancel_btn.config(state="disabled")
+        if str(self.progress_bar['mode']) == "indeterminate":
+            self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", value=0)
+    
+    def update_progress(self, phase, done, total, done_bytes, total_bytes):
+        """Обновляет прогресс-бар: папки/с, МБ/с и оставшееся время"""
+        now = time.monotonic()
+        if self.job_token.paused:
+            return
+        if phase != self.progress_phase:
+            self.progress_phase = phase
+            self.phase_started = now
+        elapsed = max(now - self.phase_started, 1e-6)
+        
+        if total:
+            if str(self.progress_bar['mode']) == "indeterminate":
+                self.progress_bar.stop()
+            self.progress_bar.config(mode="determinate", maximum=total, value=done)
+        elif str(self.progress_bar['mode']) != "indeterminate":
+            self.progress_bar.config(mode="indeterminate")
+            self.progress_bar.start(15)
+        
+        parts = [f"{phase}: {done}/{total} папок" if total else f"{phase}: {done} папок",
+                 f"{done / elapsed:.1f} папок/с"]
+        if done_bytes:
+            parts.append(f"{done_bytes / elapsed / (1024 * 1024):.1f} МБ/с")
+        if total and done:
+            if total_bytes and done_bytes:
+                remaining = (total_bytes - done_bytes) / (done_bytes / elapsed)
+            else:
+                remaining = (total - done) / (done / elapsed)
+            parts.append(f"осталось {self.format_duration(max(remaining, 0))}")
+        self.progress_label.config(text=" • ".join(parts))
+    
+    def process_events(self):
+        """Разбирает очередь событий фонового потока в главном потоке Tk"""
+        touched = set()
+        try:
+            # Ограничиваем пачку, чтобы окно оставалось отзывчивым при потоке логов
+            for _ in range(500):
+                event = self.events.get_nowait()
+                kind = event[0]
+                if kind == "log":
+                    _, widget, text, tag = event
+                    widget.insert(tk.END, text, tag)
+                    touched.add(widget)
+                elif kind == "progress":
+                    self.update_progress(*event[1:])
+                elif kind == "call":
+                    _, func, args, kwargs, done, result = event
+                    try:
+                        result["value"] = func(*args, **kwargs)
+                    except Exception as e:
+                        result["error"] = e
+                    finally:
+                        done.set()
+                elif kind == "queue":
+                    self.refresh_queue_view()
+                elif kind == "done":
+                    self.finish_job()
+        except queue.Empty:
+            pass
+        
+        for widget in touched:
+            widget.see(tk.END)
+        self.root.after(50, self.process_events)
     
     def clear_logs(self):
         self.log_text.delete(1.0, tk.END)
         self.log("Логи очищены", "INFO")
     
-    def clear_check_logs(self):
-        self.check_log_text.delete(1.0, tk.END)
-        self.check_log("Логи проверки очищены", "INFO")
+    def clear_check_logs(self):
+        self.check_log_text.delete(1.0, tk.END)
+        self.check_log("Логи проверки очищены", "INFO")
+    
+    def check_folder_content(self, folder_path, log_errors=True, indent=0, check_names=False, log_to_main=False):
+        """
+        Проверка содержимого папки
+        check_names: если True, проверяет что имена папок числовые (для проверки атак)
+        log_to_main: если True, логирует в основной лог вместо лога проверки
+        """
+        try:
+            archive = source_archive_of(folder_path)
+            if archive is not None:
+                # Папка внутри архива проверяется по его индексу, без чтения диска
+                folders, files, empty_folders = archive.folder_summary(os.path.basename(folder_path))
+            else:
+                # Чтение диска идёт через планировщик, чтобы проверка не мешала копированию на медленном диске
+                with self.io_scheduler.slots((self.io_scheduler.device_of(folder_path),)):
+                    items = os.listdir(folder_path)
+                    folders = [item for item in items if os.path.isdir(os.path.join(folder_path, item))]
+                    files = [item for item in items if os.path.isfile(os.path.join(folder_path, item))]
+                    
+                    empty_folders = {}
+                    for folder in folders:
+                        try:
+                            empty_folders[folder] = not os.listdir(os.path.join(folder_path, folder))
+                        except PermissionError:
+                            empty_folders[folder] = None
+            
+            errors = []
+            warnings = []
+            
+            # Проверка количества папок
+            if len(folders) != 3:
+                errors.append(f"Найдено {len(folders)} папок вместо 3")
+            
+            # Проверка наличия BestShot файла
+            bestshot_files = [f for f in files if "bestshot" in f.lower()]
+            if not bestshot_files:
+                errors.append("Не найден файл BestShot")
+            elif len(bestshot_files) > 1:
+                warnings.append(f"Найдено {len(bestshot_files)} файлов BestShot")
+            
+            # Проверка что папки не пустые
+            for folder in folders:
+                if empty_folders[folder] is None:
+                    errors.append(f"Нет доступа к папке '{folder}'")
+                elif empty_folders[folder]:
+                    errors.append(f"Папка '{folder}' пустая")
+            
+            # Проверка числовых имен (только при check_names=True)
+            if check_names:
+                non_numeric = [f for f in folders if not self.is_numeric_folder(f)]
+                if non_numeric:
+                    errors.append(f"Нечисловые имена папок: {', '.join(non_numeric)}")
+            
+            if log_errors:
+                if log_to_main:
+                    # Логирование в основной лог
+                    if errors:
+                        for error in errors:
+                            self.log(f"Ошибка в папке {os.path.basename(folder_path)}: {error}", "ERROR")
+                    if warnings:
+                        for warning in warnings:
+                            self.log(f"Предупреждение в папке {os.path.basename(folder_path)}: {warning}", "WARNING")
+                    if not errors and not warnings:
+                        self.log(f"Папка {os.path.basename(folder_path)}: содержимое в порядке", "SUCCESS")
+                else:
+                    # Логирование в лог проверки
+                    if errors:
+                        for error in errors:
+                            self.check_log(f"Ошибка: {error}", "ERROR", indent)
+                    if warnings:
+                        for warning in warnings:
+                            self.check_log(f"Предупреждение: {warning}", "WARNING", indent)
+                    if not errors and not warnings:
+                        self.check_log("Содержимое папки в порядке", "SUCCESS", indent)
+            
+            return len(errors) == 0
+            
+        except Exception as e:
+            if log_errors:
+                error_msg = f"Ошибка проверки папки: {str(e)}"
+                if log_to_main:
+                    self.log(f"Ошибка проверки папки {os.path.basename(folder_path)}: {str(e)}", "ERROR")
+                else:
+                    self.check_log(error_msg, "ERROR", indent)
+            return False
+    
+    def get_worker_count(self, var, default):
+        """Читает количество потоков из поля настроек"""
+        try:
+            return max(1, int(var.get()))
+        except (tk.TclError, ValueError):
+            return default
+    
+    def get_output_mode(self):
+        """Возвращает ключ выбранного режима вывода"""
+        return self.get_choice_key(self.output_mode_var, OUTPUT_MODES, "copy")
+    
+    def get_choice_key(self, var, choices, default):
+        """Ключ словаря вариантов по подписи, выбранной в выпадающем списке"""
+        label = var.get()
+        for key, choice_label in choices.items():
+            if choice_label == label:
+                return key
+        return default
+    
+    def open_journal(self, job, operations):
+        """
+        Открывает журнал запуска. Если прошлый такой же запуск не завершён,
+        предлагает продолжить его и возвращает сохранённый список операций.
+        """
+        journal = RunJournal(self.journal_dir, job)
+        if job.get("mode") == "move" and journal.operations is not None and not journal.finished:
+            # Перемещённых папок в источнике уже нет: новый план занял бы номера с начала диапазона
+            # и отправил бы их в корзину, поэтому прерванное перемещение только продолжается,
+            # даже если в журнал не успела попасть ни одна папка
+            self.log(f"⏯️ Прерванное перемещение продолжается с места остановки: выполнено "
+                     f"{len(journal.completed)} из {len(journal.operations)} папок", "WARNING")
+            return journal, journal.operations
+        if journal.can_resume():
+            done = len(journal.completed)
+            total = len(journal.operations)
+            if self.call_in_ui(messagebox.askyesno, "Незавершённый запуск",
+                                   f"Найден незавершённый запуск: выполнено {done} из {total} папок.\n\n"
+                                   f"Продолжить с места остановки?"):
+                self.log(f"⏯️ Продолжение прерванного запуска: выполнено {done} из {total} папок", "INFO")
+                return journal, journal.operations
+        journal.start(operations)
+        return journal, operations
+    
+    def format_size(self, size):
+        """Форматирует размер в байтах в читаемый вид"""
+        for unit in ("Б", "КБ", "МБ", "ГБ"):
+            if size < 1024:
+                return f"{size:.1f} {unit}" if unit != "Б" else f"{size} {unit}"
+            size /= 1024
+        return f"{size:.1f} ТБ"
+    
+    def get_copy_options(self):
+        """Снимает параметры копирования с вкладки параметров выполнения"""
+        return {
+            "workers": self.get_worker_count(self.copy_workers_var, DEFAULT_COPY_WORKERS),
+            "file_workers": self.get_worker_count(self.file_workers_var, 1),
+            "exif_workers": self.get_worker_count(self.exif_workers_var, DEFAULT_EXIF_WORKERS),
+            "shooting_probe_limit": self.get_worker_count(self.shooting_probe_limit_var, DEFAULT_SHOOTING_PROBE_LIMIT),
+            "mode": self.get_output_mode(),
+            "sync": self.sync_var.get(),
+            "use_hash": self.sync_hash_var.get(),
+            "preserve_metadata": self.preserve_metadata_var.get(),
+            "keep_trash": self.keep_trash_var.get(),
+            "verify": self.verify_algorithm_var.get() if self.verify_var.get() else None,
+            "run_manifest": (self.get_choice_key(self.run_manifest_format_var, RUN_MANIFEST_FORMATS, "csv")
+                             if self.run_manifest_var.get() else None),
+            "archive_format": self.get_choice_key(self.archive_format_var, ARCHIVE_FORMATS, "zip"),
+            "archive_compression": self.get_choice_key(self.archive_compression_var, ARCHIVE_COMPRESSION, "stored"),
+        }
+    
+    def copy_folders(self, operations, verb, options, log_removed=True, journal=None, manifest=None):
+        """
+        Копирует папки по списку операций плана в пуле потоков.
+        Результаты логируются в порядке операций, поэтому соответствие папка → номер не меняется.
+        Уже выполненные по журналу операции пропускаются.
+        """
+        if journal:
+            pending = [op for op in operations if not journal.is_done(op.source, op.target_path)]
+            if len(pending) < len(operations):
+                self.log(f"⏭️ Пропущено выполненных ранее папок: {len(operations) - len(pending)}", "INFO")
+            operations = pending
+            
+            # Папка, перенесённая до сбоя, но не попавшая в журнал: источника уже нет, а номер на месте
+            if options["mode"] == "move":
+                moved = [op for op in operations
+                         if not os.path.exists(op.source_path) and os.path.isdir(op.target_path)]
+                for op in moved:
+                    journal.record(op.source, op.target_path, "done", op.files, op.bytes)
+                    self.log(f"⏭️ Папка уже перенесена: {op.source} → {op.label}", "INFO")
+                if moved:
+                    operations = [op for op in operations if op not in moved]
+        
+        workers = options["workers"]
+        file_workers = options["file_workers"]
+        mode = options["mode"]
+        sync = options["sync"]
+        use_hash = options["use_hash"]
+        preserve_metadata = options["preserve_metadata"]
+        verify = options.get("verify")
+        
+        # Один и тот же номер, указанный дважды, нельзя копировать одновременно
+        if len({op.target_path for op in operations}) != len(operations):
+            workers = 1
+        
+        if workers > 1:
+            self.log(f"⚙️ Копирование в {workers} потоков", "INFO")
+        if mode == "link":
+            self.log("🔗 Режим ссылок: файлы на том же диске не копируются", "INFO")
+        elif mode == "move":
+            self.log("📦 Режим перемещения: исходные папки будут удалены после переноса", "WARNING")
+        
+        # Убираем следы прошлого прерванного запуска
+        for device_folder in sorted({os.path.dirname(op.target_path) for op in operations}):
+            removed, restored = cleanup_staging(device_folder)
+            if removed or restored:
+                self.log(f"🧹 {os.path.basename(device_folder)}: удалено незавершённых копий {removed}, "
+                         f"восстановлено папок {restored}", "WARNING")
+        
+        token = self.job_token
+        failed = threading.Event()
+        
+        def job(*args):
+            # После ошибки новые папки не начинаются, а начатые доводятся до конца и попадают в журнал
+            if failed.is_set():
+                return None
+            started = time.monotonic()
+            # Отменённая или упавшая папка не прерывает разбор уже готовых результатов
+            try:
+                result = copy_folder_job(*args)
+            except JobCancelled:
+                return None
+            except Exception as e:
+                failed.set()
+                return e
+            result["duration"] = time.monotonic() - started
+            return result
+        
+        staged = self.stage_sequential_archives(operations, token)
+        jobs = [(op.source_path, op.target_path, file_workers, mode, sync, use_hash, preserve_metadata, token,
+                 verify if mode == "move" else None, self.io_scheduler, staged.get(index))
+                for index, op in enumerate(operations)]
+        copied_count = 0
+        copied_bytes = 0
+        total_bytes = sum(op.bytes for op in operations)
+        run_id = new_run_id()
+        trash_roots = set()
+        trashed_count = 0
+        cancelled = False
+        failure = None
+        verified = not verify
+        # Сверка готовых папок идёт в своём пуле, пока копируются следующие
+        verify_pool = ThreadPoolExecutor(max_workers=max(workers, 2)) if verify else None
+        verifications = []
+        if verify:
+            self.log(f"🔒 Копии будут сверены с источником по {verify}", "INFO")
+        io_before = self.io_scheduler.snapshot()
+        io_started = time.monotonic()
+        results = run_in_pool(job, jobs, workers)
+        try:
+            for op in operations:
+                folder, new_path, label = op.source, op.target_path, op.label
+                result = next(results)
+                if isinstance(result, Exception):
+                    self.log(f"❌ {folder} → {label}: {str(result)}", "ERROR")
+                    if journal:
+                        journal.record(folder, new_path, "failed", error=str(result))
+                    if manifest:
+                        manifest.record(op, "failed", error=str(result))
+                    failure = failure or result
+                    continue
+                if result is None:
+                    # Папки, не начатые из-за ошибки, отменой не считаются
+                    cancelled = cancelled or failure is None
+                    continue
+                # Объём папки известен по предварительному подсчёту, назначение заново не обходится
+                files, size = op.files, op.bytes
+                if journal:
+                    # Сверяемая папка выполнена только после сверки: при отмене её скопируют заново
+                    journal.record(folder, new_path, "verifying" if verify_pool else "done", files, size)
+                if manifest:
+                    overwrite = "synced" if result["synced"] else "replaced" if result["existed"] else ""
+                    manifest.record(op, "done", files, size, result["duration"], overwrite)
+                if verify_pool:
+                    # Копию из архива сравнить с файлом на диске нельзя, её суммы только записываются в манифест
+                    check_source = mode != "move" and source_archive_of(op.source_path) is None
+                    verifications.append((op, self.submit_verification(verify_pool, op, verify, check_source)))
+                if result["old_version"]:
+                    # Заменённая версия уходит в корзину переименованием, удаление - в фоне
+                    trash_root = os.path.join(os.path.dirname(os.path.dirname(new_path)), TRASH_DIR, run_id)
+                    if trash_folder(result["old_version"], trash_root, os.path.basename(new_path)):
+                        trash_roots.add(trash_root)
+                    trashed_count += 1
+                if result["existed"] and log_removed and not result["synced"]:
+                    self.log(f"Существующая папка перенесена в корзину: {label}", "WARNING")
+                self.log(f"{verb}: {folder} → {label}", "SUCCESS")
+                if result["synced"]:
+                    self.log(f"🔁 Синхронизация {label}: обновлено файлов {result['copied']}, удалено {result['removed']}", "DETAIL")
+                copied_count += 1
+                copied_bytes += size
+                self.report_progress("Копирование", copied_count, len(operations), copied_bytes, total_bytes)
+            
+            if verifications and not cancelled and failure is None:
+                self.finish_verification(verifications, verify, journal, manifest)
+                verified = True
+            self.log_io_throughput(io_before, time.monotonic() - io_started)
+        finally:
+            results.close()
+            # Распакованные заранее папки, которые так и не встали на место номера
+            for staging in staged.values():
+                shutil.rmtree(staging, ignore_errors=True)
+            if verify_pool:
+                verify_pool.shutdown(wait=True, cancel_futures=True)
+            if trashed_count:
+                if options.get("keep_trash"):
+                    self.log(f"🗑 Заменённых версий в корзине: {trashed_count} "
+                             f"({TRASH_DIR}/{run_id}), восстановить можно на вкладке параметров", "INFO")
+                elif not verified:
+                    # Без успешной сверки прежние версии могут оказаться единственными верными копиями
+                    self.log(f"🗑 Сверка не пройдена или не завершена, заменённые версии сохранены в корзине: {trashed_count} "
+                             f"({TRASH_DIR}/{run_id}), восстановить можно на вкладке параметров", "WARNING")
+                else:
+                    self.log(f"🗑 Заменённых версий в корзине: {trashed_count}, очистка идёт в фоне", "DETAIL")
+                    for trash_root in sorted(trash_roots):
+                        self.start_purge(trash_root)
+        
+        if failure is not None:
+            raise failure
+        if cancelled:
+            self.log(f"⏹ Отмена: готово папок {copied_count} из {len(operations)}, "
+                     f"запуск можно продолжить по журналу", "WARNING")
+            raise JobCancelled()
+        return copied_count
+    
+    def stage_sequential_archives(self, operations, token):
+        """
+        Папки сжатого TAR нельзя читать по отдельности без повторной распаковки потока,
+        поэтому все они распаковываются одним проходом в .staging-папки своих номеров.
+        Возвращает {индекс операции: .staging-папка}.
+        """
+        groups = {}
+        for index, op in enumerate(operations):
+            archive = source_archive_of(op.source_path)
+            if archive is not None and archive.sequential:
+                groups.setdefault(archive, []).append(index)
+        
+        staged = {}
+        try:
+            for archive, indexes in groups.items():
+                targets = {}
+                for index in indexes:
+                    op = operations[index]
+                    parent, name = os.path.split(op.target_path)
+                    os.makedirs(parent, exist_ok=True)
+                    # Номер операции в имени: одна и та же папка номера может встретиться в плане дважды
+                    staged[index] = os.path.join(parent, f"{STAGING_PREFIX}{name}-{index}")
+                    targets[os.path.basename(op.source_path)] = staged[index]
+                self.log(f"📦 {os.path.basename(archive.path)}: сжатый архив распаковывается одним проходом, "
+                         f"папок: {len(targets)}", "INFO")
+                for done, _ in enumerate(archive.extract_folders(targets, token, self.io_scheduler), 1):
+                    self.report_progress("Распаковка архива", done, len(targets))
+        except BaseException:
+            for staging in staged.values():
+                shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return staged
+    
+    def archive_folders(self, operations, verb, options, journal, run_manifest=None):
+        """
+        Режим архива: папки пишутся потоком прямо в архивы устройств под именами
+        <атака>/<устройство>/<номер>/..., архивы разных устройств - параллельно.
+        """
+        groups = {}
+        for op in operations:
+            groups.setdefault(op.device, []).append(op)
+        
+        archive_format = options["archive_format"]
+        compression = options["archive_compression"]
+        self.log(f"🗜 Режим архива: {ARCHIVE_FORMATS[archive_format]}, {ARCHIVE_COMPRESSION[compression].lower()}, "
+                 f"архивов: {len(groups)}", "INFO")
+        if options.get("verify"):
+            self.log("🔒 Сверка копий в режиме архива не выполняется", "WARNING")
+        
+        progress = {"folders": 0, "bytes": 0, "total": len(operations),
+                    "total_bytes": sum(op.bytes for op in operations), "lock": threading.Lock()}
+        io_before = self.io_scheduler.snapshot()
+        io_started = time.monotonic()
+        jobs = [(device, device_operations, verb, options, journal, progress, run_manifest)
+                for device, device_operations in groups.items()]
+        for path in run_in_pool(self.in_job_context(self.write_device_archive), jobs, len(jobs)):
+            self.log(f"🗜 Архив записан: {path}", "SUCCESS")
+        self.log_io_throughput(io_before, time.monotonic() - io_started)
+        return progress["folders"]
+    
+    def write_device_archive(self, device, operations, verb, options, journal, progress, run_manifest=None):
+        """
+        Пишет архив одного устройства. Архив создаётся под именем .partial и заменяет
+        прежний только целиком, манифест папок дописывается последним элементом.
+        """
+        attack_folder = os.path.dirname(os.path.dirname(operations[0].target_path))
+        attack = os.path.basename(attack_folder)
+        path = archive_path(attack_folder, device, options["archive_format"], options["archive_compression"])
+        partial = path + ".partial"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            self.log(f"Существующий архив будет заменён: {os.path.basename(path)}", "WARNING")
+        
+        dst_device = self.io_scheduler.device_of(partial)
+        writer = ArchiveWriter(partial, options["archive_format"], options["archive_compression"])
+        # Папки считаются выполненными только вместе с архивом: записи о них ждут его замены
+        archived = []
+        # Начатые папки: операция → файлы, байты и время начала
+        current = {}
+        try:
+            # Манифест копится во временном файле, а не в памяти
+            with tempfile.TemporaryFile() as manifest:
+                for op, relative, size, member, mtime in iter_operation_files(operations):
+                    if op not in current:
+                        self.checkpoint()
+                        current[op] = {"files": [], "bytes": 0, "started": time.monotonic()}
+                    folder = current[op]
+                    if relative is not None:
+                        prefix = f"{attack}/{device}/{os.path.basename(op.target_path)}"
+                        name = relative.replace(os.sep, "/")
+                        if member is None:
+                            source = os.path.join(op.source_path, relative)
+                            size = os.path.getsize(source)
+                            src_device = self.io_scheduler.device_of(source)
+                        else:
+                            # Папка архива-источника перепаковывается потоком, без распаковки на диск
+                            src_device = self.io_scheduler.device_of(op.source_path)
+                        with self.io_scheduler.slots((src_device, dst_device)):
+                            if member is None:
+                                writer.add_file(source, f"{prefix}/{name}")
+                            else:
+                                writer.add_stream(member, size, f"{prefix}/{name}", mtime)
+                        self.io_scheduler.transferred(src_device, dst_device, size)
+                        folder["files"].append([name, size])
+                        folder["bytes"] += size
+                        continue
+                    
+                    # Папка записана целиком
+                    del current[op]
+                    files, folder_bytes = folder["files"], folder["bytes"]
+                    entry = {"folder": f"{device}/{os.path.basename(op.target_path)}", "source": op.source,
+                             "files": files, "bytes": folder_bytes}
+                    manifest.write((json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8"))
+                    archived.append((op, len(files), folder_bytes, time.monotonic() - folder["started"]))
+                    self.log(f"{verb}: {op.source} → {op.label}", "SUCCESS")
+                    
+                    with progress["lock"]:
+                        progress["folders"] += 1
+                        progress["bytes"] += folder_bytes
+                        self.report_progress("Архивирование", progress["folders"], progress["total"],
+                                             progress["bytes"], progress["total_bytes"])
+                
+                size = manifest.tell()
+                manifest.seek(0)
+                writer.add_stream(manifest, size, f"{attack}/{device}/{ARCHIVE_MANIFEST}")
+            writer.close()
+            os.replace(partial, path)
+        except BaseException as e:
+            with contextlib.suppress(Exception):
+                writer.close()
+            with contextlib.suppress(OSError):
+                os.remove(partial)
+            # Все папки недописанного архива потеряны вместе с ним
+            error = "Отменено" if isinstance(e, JobCancelled) else str(e)
+            lost = [op for op, *_ in archived] + list(current)
+            for op in lost:
+                journal.record(op.source, op.target_path, "failed", error=error)
+                if run_manifest:
+                    run_manifest.record(op, "failed", error=error)
+            raise
+        
+        for op, files, folder_bytes, duration in archived:
+            journal.record(op.source, op.target_path, "done", files, folder_bytes)
+            if run_manifest:
+                run_manifest.record(op, "done", files, folder_bytes, duration)
+        return path
+    
+    def log_io_throughput(self, before, elapsed):
+        """Пишет в лог объём и скорость по каждому диску за период"""
+        for device, (read, written) in sorted(self.io_scheduler.snapshot().items()):
+            read -= before.get(device, (0, 0))[0]
+            written -= before.get(device, (0, 0))[1]
+            if not read and not written:
+                continue
+            speed = max(read, written) / max(elapsed, 1e-6)
+            self.log(f"💽 {self.io_scheduler.device_name(device)}: прочитано {self.format_size(read)}, "
+                     f"записано {self.format_size(written)}, {self.format_size(speed)}/с", "DETAIL")
+    
+    def configure_io(self):
+        """Передаёт планировщику ввода-вывода лимиты с вкладки параметров. Возвращает False при ошибке"""
+        try:
+            limits = parse_io_limits(self.io_limits_text.get("1.0", tk.END))
+            devices = {os.stat(existing_parent(path)).st_dev: limit for path, limit in limits.items()}
+        except (ValueError, OSError) as e:
+            messagebox.showerror("Ошибка", f"Неверные ограничения дисков: {str(e)}")
+            return False
+        self.io_scheduler.configure(self.get_worker_count(self.io_slots_var, DEFAULT_DEVICE_SLOTS), devices)
+        return True
+    
+    def submit_verification(self, pool, op, algorithm, check_source):
+        """Ставит файлы готовой папки в очередь сверки. Возвращает [(путь в папке, future)]"""
+        verification = []
+        for relative in list_files(op.target_path):
+            source = os.path.join(op.source_path, relative) if check_source else None
+            future = pool.submit(verify_file, source, os.path.join(op.target_path, relative), algorithm)
+            verification.append((relative, future))
+        return verification
+    
+    def finish_verification(self, verifications, algorithm, journal=None, manifest=None):
+        """
+        Дожидается сверки всех папок и дописывает их суммы в манифест атаки.
+        Совпавшие папки отмечаются в журнале выполненными, несовпавшие - испорченными,
+        чтобы повторный запуск скопировал их заново.
+        """
+        manifests = {}
+        corrupted = []
+        for done, (op, verification) in enumerate(verifications, 1):
+            self.checkpoint()
+            files = []
+            mismatched = []
+            for relative, future in verification:
+                size, mtime_ns, digest, matches = future.result()
+                files.append([relative.replace(os.sep, "/"), size, mtime_ns, digest])
+                if not matches:
+                    mismatched.append(relative)
+            self.report_progress("Сверка копий", done, len(verifications))
+            
+            if mismatched:
+                corrupted.append(op.label)
+                shown = ", ".join(mismatched[:5]) + (" ..." if len(mismatched) > 5 else "")
+                self.log(f"❌ Копия {op.label} не совпала с источником ({len(mismatched)} файлов): {shown}", "ERROR")
+                if journal:
+                    journal.record(op.source, op.target_path, "corrupt", error=f"не совпали файлы: {shown}")
+                if manifest:
+                    manifest.record(op, "corrupt", error=f"не совпали файлы: {shown}")
+                continue
+            
+            attack_folder = os.path.dirname(os.path.dirname(op.target_path))
+            if attack_folder not in manifests:
+                manifests[attack_folder] = ChecksumManifest(attack_folder)
+            manifests[attack_folder].append(op.target_path, algorithm, files)
+            if journal:
+                journal.record(op.source, op.target_path, "done", op.files, op.bytes)
+        
+        if corrupted:
+            raise OSError(f"Копии не совпали с источником: {', '.join(corrupted)}. "
+                          f"Повторите запуск, чтобы скопировать эти папки заново")
+        self.log(f"🔒 Сверено папок: {len(verifications)}, суммы записаны в {CHECKSUM_MANIFEST}", "SUCCESS")
+    
+    def start_purge(self, path):
+        """Очищает корзину в отдельном потоке с низким приоритетом, не задерживая основную операцию"""
+        thread = threading.Thread(target=self.run_purge, args=(path,), daemon=True)
+        thread.start()
+    
+    def run_purge(self, path):
+        try:
+            purge_trash(path)
+            self.log(f"🗑 Корзина очищена: {path}", "DETAIL")
+        except Exception as e:
+            self.log(f"Ошибка очистки корзины {path}: {str(e)}", "ERROR")
+    
+    def get_trash_folder(self):
+        """Корзина папки атаки, выбранной на основной вкладке"""
+        dest_folder = self.dest_entry.get()
+        if not dest_folder:
+            messagebox.showerror("Ошибка", "Пожалуйста, выберите папку назначения")
+            return None
+        trash = os.path.join(dest_folder, self.attack_var.get(), TRASH_DIR)
+        if not os.path.isdir(trash):
+            messagebox.showinfo("Корзина", "Корзина выбранной атаки пуста")
+            return None
+        return trash
+    
+    def restore_trash(self):
+        """Восстанавливает номера из выбранного запуска в корзине"""
+        trash = self.get_trash_folder()
+        if not trash:
+            return
+        run_dir = filedialog.askdirectory(initialdir=trash, title="Выберите запуск в корзине")
+        if not run_dir:
+            return
+        if os.path.normpath(os.path.dirname(run_dir)) != os.path.normpath(trash):
+            messagebox.showerror("Ошибка", "Выберите папку запуска внутри корзины атаки")
+            return
+        self.start_job("Восстановление из корзины", self.run_restore_trash, run_dir, trash)
+    
+    def run_restore_trash(self, run_dir, trash):
+        attack_folder = os.path.dirname(trash)
+        restored = restore_from_trash(run_dir, attack_folder, os.path.join(trash, "restore-" + new_run_id()))
+        for path in restored:
+            self.log(f"♻ Восстановлено: {os.path.relpath(path, attack_folder)}", "SUCCESS")
+        self.start_purge(run_dir)
+        self.log(f"♻ Восстановлено папок: {len(restored)}, текущие версии перенесены в корзину", "INFO")
+        self.call_in_ui(messagebox.showinfo, "Корзина", f"Восстановлено папок: {len(restored)}")
+    
+    def purge_attack_trash(self):
+        """Очищает всю корзину выбранной атаки"""
+        trash = self.get_trash_folder()
+        if not trash:
+            return
+        if messagebox.askyesno("Очистка корзины", f"Удалить без возможности восстановления:\n{trash}?"):
+            self.start_purge(trash)
+    
+    def precheck_content(self, folders, source_folder, action):
+        """Предварительная проверка содержимого папок источника. Возвращает True, если ошибок нет"""
+        self.log("🔍 Начинается предварительная проверка содержимого...", "INFO")
+        content_errors = False
+        error_details = []
+        
+        for i, folder in enumerate(folders, 1):
+            old_path = os.path.join(source_folder, folder)
+            self.log(f"🔍 Проверка {i}/{len(folders)}: {folder}", "DETAIL")
+            self.checkpoint()
+            self.report_progress("Проверка содержимого", i, len(folders))
+            
+            # Подробная проверка с выводом ошибок в ОСНОВНОЙ лог
+            try:
+                if not self.check_folder_content(old_path, log_errors=True, indent=1, check_names=False, log_to_main=True):
+                    content_errors = True
+                    error_details.append(folder)
+                    self.log(f"❌ Обнаружены ошибки в папке: {folder}", "ERROR")
+                else:
+                    self.log(f"✅ Папка {folder} проверена успешно", "SUCCESS")
+            except Exception as e:
+                content_errors = True
+                error_details.append(folder)
+                self.log(f"❌ Ошибка при проверке папки {folder}: {str(e)}", "ERROR")
+        
+        if content_errors:
+            self.log(f"🚫 ОБНАРУЖЕНЫ ОШИБКИ! {action} отменено.", "ERROR")
+            self.log(f"📂 Папки с ошибками: {', '.join(error_details)}", "ERROR")
+            self.call_in_ui(messagebox.showerror, "Ошибка", 
+                            "Обнаружены ошибки в содержимом папок! "
+                            f"{action} отменено. Проверьте логи для деталей.")
+            return False
+        
+        self.log("✅ Все папки проверены успешно!", "SUCCESS")
+        return True
+    
+    def measure_sources(self, paths, workers, use_cache=True):
+        """
+        Размеры папок источника (файлов, байт): параллельный обход os.scandir по папкам.
+        Неизменившиеся папки берутся из кэша, поэтому повторный запуск по тому же источнику мгновенный.
+        Возвращает (размеры, сколько папок взято из кэша).
+        """
+        sizes = {}
+        cached_count = 0
+        to_scan = []
+        for path in paths:
+            # Размеры папок архива уже есть в его индексе
+            archive = source_archive_of(path)
+            if archive is not None:
+                sizes[path] = archive.folder_size(os.path.basename(path))
+                continue
+            signature = folder_signature(path)
+            with self.size_cache_lock:
+                cached = self.size_cache.get(path)
+            if use_cache and cached and cached[0] == signature:
+                sizes[path] = cached[1]
+                cached_count += 1
+            else:
+                to_scan.append((path, signature))
+        
+        if to_scan:
+            results = run_in_pool(folder_size, [(path,) for path, _ in to_scan], workers)
+            for done, ((path, signature), size) in enumerate(zip(to_scan, results), 1):
+                self.checkpoint()
+                sizes[path] = size
+                with self.size_cache_lock:
+                    self.size_cache[path] = (signature, size)
+                self.report_progress("Подсчёт объёма", done, len(to_scan))
+        return sizes, cached_count
+    
+    def preflight(self, plan, options):
+        """
+        Подсчитывает объём плана и сверяет его со свободным местом на диске назначения
+        до любых изменений. Возвращает план с размерами или None, если запуск отменён.
+        """
+        paths = [op.source_path for op in plan.operations]
+        sizes, cached_count = self.measure_sources(paths, options["workers"])
+        target = existing_parent(plan.attack_folder)
+        free = shutil.disk_usage(target).free
+        
+        # Ссылки и перемещение в пределах одного диска места не занимают
+        same_disk = (options["mode"] in ("link", "move") and plan.operations and
+                     os.stat(plan.operations[0].source_path).st_dev == os.stat(target).st_dev)
+        needed = 0 if same_disk else sum(size for _, size in sizes.values())
+        
+        # Решение о месте впритык не принимается по кэшу: перезаписанный на месте файл он не замечает
+        if cached_count and needed > free * SPACE_RECHECK_RATIO:
+            self.log("📦 Места впритык - объём пересчитывается без кэша", "DETAIL")
+            sizes, _ = self.measure_sources(paths, options["workers"], use_cache=False)
+            needed = 0 if same_disk else sum(size for _, size in sizes.values())
+        
+        plan = plan.with_sizes(sizes)
+        total_files = sum(files for files, _ in sizes.values())
+        self.log(f"📦 Объём к записи: {self.format_size(plan.total_bytes)} ({total_files} файлов), "
+                 f"свободно: {self.format_size(free)}", "INFO")
+        
+        if needed > free:
+            self.log(f"🚫 Недостаточно места: нужно {self.format_size(needed)}, свободно {self.format_size(free)}", "ERROR")
+            if not self.call_in_ui(messagebox.askyesno, "Недостаточно места",
+                                   f"Для записи нужно {self.format_size(needed)}, "
+                                   f"а свободно только {self.format_size(free)}.\n\n"
+                                   f"Продолжить всё равно?"):
+                return None
+        return plan
+    
+    def execute_plan(self, plan, verb, options, job, log_removed=True):
+        """
+        Выполняет план выбранным режимом вывода с журналом запуска.
+        Возвращает итог по журналу или None, если план не прошёл проверку.
+        """
+        errors = plan.validate()
+        if errors:
+            for error in errors:
+                self.log(error, "ERROR")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"План не прошёл проверку: {errors[0]}")
+            return None
+        
+        if (options["mode"] in ("link", "move") or options["sync"]) and \
+                any(source_archive_of(op.source_path) for op in plan.operations):
+            self.log("📦 Источник - архив: папки будут скопированы, ссылки, перемещение и синхронизация "
+                     "для него недоступны", "WARNING")
+            options = dict(options, mode="copy", sync=False)
+        
+        plan = self.preflight(plan, options)
+        if plan is None:
+            return None
+        
+        if options["mode"] == "archive" and plan.kind != "renaming":
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Режим архива доступен только для переименования")
+            return None
+        
+        manifest = None
+        if options.get("run_manifest"):
+            manifest = RunManifest(self.run_manifest_dir, plan.kind, plan.attack, options["run_manifest"])
+            self.log(f"📄 Манифест запуска: {manifest.path}", "DETAIL")
+        try:
+            if options["mode"] == "archive":
+                # Недописанный архив продолжить нельзя, поэтому запуск всегда начинается заново
+                journal = RunJournal(self.journal_dir, job)
+                journal.start(plan.operations)
+                self.archive_folders(plan.operations, verb, options, journal, manifest)
+                journal.finish()
+                return journal.summary()
+            
+            for device_name in plan.devices:
+                device_folder = os.path.join(plan.attack_folder, device_name)
+                if not os.path.isdir(device_folder):
+                    os.makedirs(device_folder, exist_ok=True)
+                    self.log(f"📁 Создана папка устройства: {device_name}", "INFO")
+            
+            journal, operations = self.open_journal(job, plan.operations)
+            self.copy_folders(operations, verb, options, log_removed=log_removed, journal=journal, manifest=manifest)
+            journal.finish()
+        finally:
+            if manifest:
+                manifest.close()
+        
+        # Итог берём из журнала - он учитывает и папки из прерванного запуска
+        return journal.summary()
+    
+    def collect_run_params(self):
+        """Снимает значения полей интерфейса для запуска в фоновом потоке"""
+        return {
+            "source_folder": self.source_entry.get(),
+            "dest_folder": self.dest_entry.get(),
+            "device": self.device_var.get(),
+            "attack": self.attack_var.get(),
+            "check_content": self.check_content_var.get(),
+            "replace_numbers": self.replace_entry.get(),
+            "options": self.get_copy_options(),
+        }
+    
+    def load_job_queue(self):
+        """Загружает очередь заданий. Прерванные на середине задания снова ждут запуска"""
+        self.job_queue = []
+        try:
+            if os.path.exists(self.queue_file):
+                with open(self.queue_file, 'r', encoding='utf-8') as f:
+                    self.job_queue = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ошибка загрузки очереди: {e}")
+        for job in self.job_queue:
+            if job["status"] == "running":
+                job["status"] = "pending"
+    
+    def save_job_queue(self):
+        """Сохраняет очередь через временный файл, чтобы сбой не оставил её наполовину записанной"""
+        with self.queue_lock:
+            data = json.dumps(self.job_queue, indent=4, ensure_ascii=False)
+        temp_path = self.queue_file + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(temp_path, self.queue_file)
+    
+    def refresh_queue_view(self):
+        """Перерисовывает таблицу очереди"""
+        self.queue_tree.delete(*self.queue_tree.get_children())
+        with self.queue_lock:
+            jobs = [dict(job) for job in self.job_queue]
+        for job in jobs:
+            status = QUEUE_STATUSES[job["status"]]
+            if job.get("message"):
+                status = f"{status}: {job['message']}"
+            self.queue_tree.insert("", tk.END, iid=str(job["id"]), values=(
+                job["id"], job["source_folder"], job["attack"], job["device"], job["replace_numbers"],
+                OUTPUT_MODES[job["options"]["mode"]], status))
+    
+    def enqueue_jobs(self, jobs):
+        """Добавляет задания (параметры запуска как у collect_run_params) в конец очереди"""
+        with self.queue_lock:
+            next_id = max((job["id"] for job in self.job_queue), default=0) + 1
+            for offset, params in enumerate(jobs):
+                self.job_queue.append(dict(params, id=next_id + offset, status="pending", message=""))
+        self.save_job_queue()
+        self.refresh_queue_view()
+        self.log(f"📋 В очередь добавлено заданий: {len(jobs)}", "INFO")
+    
+    def add_current_to_queue(self):
+        params = self.collect_run_params()
+        if not params["source_folder"] or not params["dest_folder"]:
+            messagebox.showerror("Ошибка", "Пожалуйста, выберите исходную папку и папку назначения")
+            return
+        self.enqueue_jobs([params])
+    
+    def load_batch_file(self):
+        path = filedialog.askopenfilename(title="Выберите файл пакета", filetypes=[("Пакет заданий (JSON)", "*.json")])
+        if not path:
+            return
+        try:
+            jobs = self.read_batch_file(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            messagebox.showerror("Ошибка", f"Не удалось прочитать пакет: {str(e)}")
+            return
+        self.enqueue_jobs(jobs)
+    
+    def read_batch_file(self, path):
+        """
+        Читает файл пакета - JSON-список заданий (или {"jobs": [...]}), например:
+        {"source": "D:/capture", "dest": "E:/ID_001", "attack": "02 2D Mask",
+         "device": "все", "numbers": "", "mode": "copy", "check_content": false}
+        Для режима "archive" можно указать "archive_format" (zip / tar) и "compression" (stored / deflate),
+        для манифеста запуска - "manifest" (csv / jsonl / null - не писать).
+        Необязательные поля и параметры выполнения берутся с вкладки параметров.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if isinstance(entries, dict):
+            entries = entries["jobs"]
+        
+        defaults = self.get_copy_options()
+        jobs = []
+        for number, entry in enumerate(entries, 1):
+            attack = entry["attack"]
+            device = entry.get("device", "все")
+            mode = entry.get("mode", defaults["mode"])
+            if attack not in self.attack_ranges:
+                raise ValueError(f"задание {number}: неизвестная атака {attack}")
+            if device != "все" and device not in DEVICES:
+                raise ValueError(f"задание {number}: неизвестное устройство {device}")
+            if mode not in OUTPUT_MODES:
+                raise ValueError(f"задание {number}: неизвестный режим {mode}")
+            numbers = entry.get("numbers", "")
+            if numbers and self.parse_number_range(numbers) is None:
+                raise ValueError(f"задание {number}: неверный формат номеров {numbers}")
+            options = dict(defaults, mode=mode)
+            if entry.get("archive_format") in ARCHIVE_FORMATS:
+                options["archive_format"] = entry["archive_format"]
+            if entry.get("compression") in ARCHIVE_COMPRESSION:
+                options["archive_compression"] = entry["compression"]
+            if "manifest" in entry:
+                options["run_manifest"] = entry["manifest"] if entry["manifest"] in RUN_MANIFEST_FORMATS else None
+            jobs.append({"source_folder": entry["source"], "dest_folder": entry["dest"],
+                         "device": device, "attack": attack,
+                         "check_content": bool(entry.get("check_content", False)),
+                         "replace_numbers": numbers, "options": options})
+        return jobs
+    
+    def remove_queue_jobs(self):
+        selected = {int(iid) for iid in self.queue_tree.selection()}
+        if not selected:
+            messagebox.showinfo("Очередь", "Выберите задания в таблице")
+            return
+        with self.queue_lock:
+            self.job_queue = [job for job in self.job_queue if job["id"] not in selected]
+        self.save_job_queue()
+        self.refresh_queue_view()
+    
+    def clear_done_jobs(self):
+        with self.queue_lock:
+            self.job_queue = [job for job in self.job_queue if job["status"] != "done"]
+        self.save_job_queue()
+        self.refresh_queue_view()
+    
+    def set_job_status(self, job, status, message=""):
+        with self.queue_lock:
+            job["status"] = status
+            job["message"] = message
+        self.save_job_queue()
+        self.events.put(("queue",))
+    
+    def run_queue(self):
+        """Запускает все невыполненные задания очереди (в том числе завершившиеся ошибкой)"""
+        with self.queue_lock:
+            job_ids = [job["id"] for job in self.job_queue if job["status"] != "done"]
+        if not job_ids:
+            messagebox.showinfo("Очередь", "В очереди нет заданий для выполнения")
+            return
+        self.start_job("Очередь заданий", self.run_batch, job_ids)
+    
+    def job_devices(self, job):
+        """Диски (st_dev) источника и назначения задания"""
+        devices = set()
+        for path in (job["source_folder"], job["dest_folder"]):
+            try:
+                devices.add(os.stat(existing_parent(path)).st_dev)
+            except OSError:
+                pass
+        return frozenset(devices)
     
-    def check_folder_content(self, folder_path, log_errors=True, indent=0, check_names=False, log_to_main=False):
+    def run_batch(self, job_ids):
         """
-        Проверка содержимого папки
-        check_names: если True, проверяет что имена папок числовые (для проверки атак)
-        log_to_main: если True, логирует в основной лог вместо лога проверки
+        Планировщик очереди. Каждая линия берёт первое задание, диски которого (источник и назначение)
+        сейчас свободны: задания на разных дисках идут одновременно, на общем - друг за другом.
         """
-        try:
-            items = os.listdir(folder_path)
-            folders = [item for item in items if os.path.isdir(os.path.join(folder_path, item))]
-            files = [item for item in items if os.path.isfile(os.path.join(folder_path, item))]
-            
-            errors = []
-            warnings = []
-            
-            # Проверка количества папок
-            if len(folders) != 3:
-                errors.append(f"Найдено {len(folders)} папок вместо 3")
-            
-            # Проверка наличия BestShot файла
-            bestshot_files = [f for f in files if "bestshot" in f.lower()]
-            if not bestshot_files:
-                errors.append("Не найден файл BestShot")
-            elif len(bestshot_files) > 1:
-                warnings.append(f"Найдено {len(bestshot_files)} файлов BestShot")
-            
-            # Проверка что папки не пустые
-            for folder in folders:
-                folder_full_path = os.path.join(folder_path, folder)
+        with self.queue_lock:
+            pending = [job for job in self.job_queue if job["id"] in job_ids]
+        devices = {job["id"]: self.job_devices(job) for job in pending}
+        lanes = len(set(devices.values()))
+        total = len(pending)
+        busy = set()
+        finished = []
+        condition = threading.Condition()
+        
+        self.log("=" * 70, "SUCCESS")
+        self.log(f"📋 Запуск очереди: заданий {total}, одновременно до {lanes}", "HEADER")
+        self.events.put(("progress", "Очередь", 0, total, 0, 0))
+        
+        def lane():
+            while True:
+                with condition:
+                    while True:
+                        if self.job_token.cancelled.is_set():
+                            return
+                        job = next((job for job in pending if not devices[job["id"]] & busy), None)
+                        if job is not None:
+                            pending.remove(job)
+                            busy.update(devices[job["id"]])
+                            break
+                        if not pending:
+                            return
+                        condition.wait()
                 try:
-                    if not os.listdir(folder_full_path):
-                        errors.append(f"Папка '{folder}' пустая")
-                except PermissionError:
-                    errors.append(f"Нет доступа к папке '{folder}'")
-            
-            # Проверка числовых имен (только при check_names=True)
-            if check_names:
-                non_numeric = [f for f in folders if not self.is_numeric_folder(f)]
-                if non_numeric:
-                    errors.append(f"Нечисловые имена папок: {', '.join(non_numeric)}")
-            
-            if log_errors:
-                if log_to_main:
-                    # Логирование в основной лог
-                    if errors:
-                        for error in errors:
-                            self.log(f"Ошибка в папке {os.path.basename(folder_path)}: {error}", "ERROR")
-                    if warnings:
-                        for warning in warnings:
-                            self.log(f"Предупреждение в папке {os.path.basename(folder_path)}: {warning}", "WARNING")
-                    if not errors and not warnings:
-                        self.log(f"Папка {os.path.basename(folder_path)}: содержимое в порядке", "SUCCESS")
-                else:
-                    # Логирование в лог проверки
-                    if errors:
-                        for error in errors:
-                            self.check_log(f"Ошибка: {error}", "ERROR", indent)
-                    if warnings:
-                        for warning in warnings:
-                            self.check_log(f"Предупреждение: {warning}", "WARNING", indent)
-                    if not errors and not warnings:
-                        self.check_log("Содержимое папки в порядке", "SUCCESS", indent)
-            
-            return len(errors) == 0
-            
+                    self.run_queue_job(job)
+                finally:
+                    with condition:
+                        busy.difference_update(devices[job["id"]])
+                        finished.append(job)
+                        self.events.put(("progress", "Очередь", len(finished), total, 0, 0))
+                        condition.notify_all()
+        
+        for _ in run_in_pool(lane, [()] * lanes, lanes):
+            pass
+        
+        with self.queue_lock:
+            statuses = [job["status"] for job in finished]
+        done = statuses.count("done")
+        failed = statuses.count("failed")
+        self.log("=" * 70, "SUCCESS")
+        self.log(f"📋 Очередь выполнена: готово {done}, с ошибками {failed}", "SUCCESS" if not failed else "WARNING")
+        self.call_in_ui(messagebox.showinfo, "Очередь", f"Очередь выполнена!\n\n✅ Готово: {done}\n❌ С ошибками: {failed}")
+    
+    def run_queue_job(self, job):
+        """Выполняет задание очереди без диалогов: сообщения собираются в статус задания"""
+        self.unattended.active = True
+        self.unattended.messages = []
+        self.set_job_status(job, "running")
+        self.log(f"📋 Задание {job['id']}: {job['source_folder']} → {job['attack']} ({job['device']})", "HEADER")
+        
+        params = {key: job[key] for key in ("source_folder", "dest_folder", "device", "attack",
+                                            "check_content", "replace_numbers", "options")}
+        try:
+            if job["replace_numbers"]:
+                self.run_replacement(params)
+            else:
+                self.run_renaming(params)
+        except JobCancelled:
+            self.set_job_status(job, "pending", "отменено")
+            raise
         except Exception as e:
-            if log_errors:
-                error_msg = f"Ошибка проверки папки: {str(e)}"
-                if log_to_main:
-                    self.log(f"Ошибка проверки папки {os.path.basename(folder_path)}: {str(e)}", "ERROR")
-                else:
-                    self.check_log(error_msg, "ERROR", indent)
-            return False
+            self.unattended.messages.append(("showerror", str(e)))
+        finally:
+            self.unattended.active = False
+        
+        errors = [text for kind, text in self.unattended.messages if kind != "showinfo"]
+        if errors:
+            self.set_job_status(job, "failed", errors[0].splitlines()[0])
+        else:
+            self.set_job_status(job, "done")
+    
+    def answer_unattended(self, name, args):
+        """Диалог в задании очереди: сообщения запоминаются, на вопросы даётся заранее заданный ответ"""
+        title = args[0] if args else ""
+        if name.startswith("ask"):
+            answer = UNATTENDED_ANSWERS.get(title, False)
+            self.log(f"📋 {title}: {'да' if answer else 'нет'} (ответ для очереди)", "DETAIL")
+            return answer
+        self.unattended.messages.append((name, args[1] if len(args) > 1 else title))
+        return None
     
     def execute_renaming(self):
-        source_folder = self.source_entry.get()
-        dest_folder = self.dest_entry.get()
-        device = self.device_var.get()
-        attack = self.attack_var.get()
-        check_content = self.check_content_var.get()
+        self.start_job("Переименование", self.run_renaming, self.collect_run_params())
+    
+    def run_renaming(self, params):
+        source_folder = params["source_folder"]
+        dest_folder = params["dest_folder"]
+        device = params["device"]
+        attack = params["attack"]
+        check_content = params["check_content"]
         
         if not source_folder or not dest_folder:
-            messagebox.showerror("Ошибка", "Пожалуйста, выберите исходную папку и папку назначения")
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Пожалуйста, выберите исходную папку и папку назначения")
             return
         
         if not os.path.exists(source_folder):
-            messagebox.showerror("Ошибка", "Исходная папка не существует")
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Исходная папка не существует")
             return
         
-        all_folders = [f for f in os.listdir(source_folder) 
-                      if os.path.isdir(os.path.join(source_folder, f))]
-        
-        all_folders.sort(key=self.natural_sort_key)
+        all_folders = list_source_folders(source_folder)
         
         if not all_folders:
-            messagebox.showwarning("Предупреждение", "В исходной папке не найдено папок для обработки")
+            self.call_in_ui(messagebox.showwarning, "Предупреждение", "В исходной папке не найдено папок для обработки")
             return
         
-        # Время съемки считается ТОЛЬКО для обрабатываемых папок
-        shooting_time = self.calculate_shooting_time(all_folders, source_folder)
-        
-        if device != "все" and (attack not in self.attack_ranges or device not in self.attack_ranges[attack]):
-            messagebox.showerror("Ошибка", f"Выбранная комбинация атаки {attack} и устройства {device} недоступна")
+        # План строится до любых операций с диском назначения
+        attack_folder = os.path.join(dest_folder, attack)
+        try:
+            plan = plan_renaming(all_folders, source_folder, attack_folder, attack, device, self.attack_ranges)
+        except ValueError as e:
+            self.call_in_ui(messagebox.showerror, "Ошибка", str(e))
             return
         
-        # ОПРЕДЕЛЯЕМ СКОЛЬКО ПАПОК БУДЕМ ОБРАБАТЫВАТЬ
+        # Время съемки считается ТОЛЬКО для обрабатываемых папок
+        shooting_time = self.calculate_shooting_time(all_folders, source_folder,
+                                                     params["options"].get("exif_workers", DEFAULT_EXIF_WORKERS),
+                                                     params["options"].get("shooting_probe_limit",
+                                                                           DEFAULT_SHOOTING_PROBE_LIMIT))
+        
         expected_count = self.get_attack_expected_count(attack, device)
-        actual_count = len(all_folders)
-        
-        # Определяем сколько папок будем обрабатывать
-        if expected_count > 0:
-            if actual_count > expected_count:
-                self.log(f"⚠️ Внимание: в исходной папке {actual_count} папок, но требуется только {expected_count}", "WARNING")
-                self.log(f"ℹ️ Будет обработано только {expected_count} папок", "INFO")
-                folders_to_process = all_folders[:expected_count]  # Берем только нужное количество
-                processing_count = expected_count
-            else:
-                folders_to_process = all_folders
-                processing_count = actual_count
-        else:
-            folders_to_process = all_folders
-            processing_count = actual_count
+        processing_count = min(len(all_folders), expected_count) if expected_count > 0 else len(all_folders)
         
         try:
-            os.makedirs(dest_folder, exist_ok=True)
-            attack_folder = os.path.join(dest_folder, attack)
-            os.makedirs(attack_folder, exist_ok=True)
+            # В режиме архива папок атаки на диске не создаётся
+            if params["options"]["mode"] != "archive":
+                os.makedirs(attack_folder, exist_ok=True)
+            
+            for level, message in plan.messages:
+                self.log(message, level)
             
             self.log("=" * 70, "SUCCESS")
             self.log(f"🚀 Начало обработки...", "HEADER")
@@ -1070,262 +4535,75 @@ class ModernFolderRenamer:
                 self.log(f"📋 Ожидаемое количество для атаки: {expected_count}", "INFO")
             
             # ПРЕДВАРИТЕЛЬНАЯ ПРОВЕРКА СОДЕРЖИМОГО
-            if check_content:
-                self.log("🔍 Начинается предварительная проверка содержимого...", "INFO")
-                content_errors = False
-                error_details = []
-                
-                for i, folder in enumerate(folders_to_process, 1):
-                    old_path = os.path.join(source_folder, folder)
-                    self.log(f"🔍 Проверка {i}/{len(folders_to_process)}: {folder}", "DETAIL")
-                    
-                    # Подробная проверка с выводом ошибок в ОСНОВНОЙ лог
-                    try:
-                        if not self.check_folder_content(old_path, log_errors=True, indent=1, check_names=False, log_to_main=True):
-                            content_errors = True
-                            error_details.append(folder)
-                            self.log(f"❌ Обнаружены ошибки в папке: {folder}", "ERROR")
-                        else:
-                            self.log(f"✅ Папка {folder} проверена успешно", "SUCCESS")
-                    except Exception as e:
-                        content_errors = True
-                        error_details.append(folder)
-                        self.log(f"❌ Ошибка при проверке папки {folder}: {str(e)}", "ERROR")
-                
-                if content_errors:
-                    self.log("🚫 ОБНАРУЖЕНЫ ОШИБКИ! Переименование отменено.", "ERROR")
-                    self.log(f"📂 Папки с ошибками: {', '.join(error_details)}", "ERROR")
-                    messagebox.showerror("Ошибка", 
-                                        "Обнаружены ошибки в содержимом папок! "
-                                        "Переименование отменено. Проверьте логи для деталей.")
-                    return
-                else:
-                    self.log("✅ Все папки проверены успешно!", "SUCCESS")
-            
-            processed_count = 0
-            
-            if device == "все":
-                # Создаем папки для устройств если их нет
-                devices_in_attack = []
-                for device_name in ["kozen 10", "kozen 12"]:
-                    if attack in self.attack_ranges and device_name in self.attack_ranges[attack]:
-                        devices_in_attack.append(device_name)
-                        device_folder = os.path.join(attack_folder, device_name)
-                        os.makedirs(device_folder, exist_ok=True)
-                        self.log(f"📁 Создана папка устройства: {device_name}", "INFO")
-                
-                if len(devices_in_attack) == 0:
-                    messagebox.showerror("Ошибка", f"Для атаки {attack} не заданы диапазоны")
-                    return
-                
-                if len(devices_in_attack) == 1:
-                    # Если только одно устройство - все папки в него
-                    device_name = devices_in_attack[0]
-                    start_num, end_num = self.attack_ranges[attack][device_name]
-                    available_numbers = list(range(start_num, end_num + 1))
-                    
-                    # Обрабатываем только доступное количество папок
-                    actual_processing = min(len(folders_to_process), len(available_numbers))
-                    if actual_processing < len(folders_to_process):
-                        self.log(f"⚠️ Доступно только {len(available_numbers)} номеров, обрабатываем {actual_processing} папок", "WARNING")
-                    
-                    current_number = start_num
-                    device_folder = os.path.join(attack_folder, device_name)
-                    
-                    for i in range(actual_processing):
-                        folder = folders_to_process[i]
-                        old_path = os.path.join(source_folder, folder)
-                        new_name = str(current_number)
-                        new_path = os.path.join(device_folder, new_name)
-                        
-                        if os.path.exists(new_path):
-                            shutil.rmtree(new_path)
-                            self.log(f"Удалена существующая папка: {new_name}", "WARNING")
-                        
-                        shutil.copytree(old_path, new_path)
-                        self.log(f"Обработано: {folder} → {device_name}/{new_name}", "SUCCESS")
-                        processed_count += 1
-                        current_number += 1
-                else:
-                    # Если два устройства - распределяем поровну
-                    device1, device2 = devices_in_attack
-                    start1, end1 = self.attack_ranges[attack][device1]
-                    start2, end2 = self.attack_ranges[attack][device2]
-                    
-                    available_numbers1 = list(range(start1, end1 + 1))
-                    available_numbers2 = list(range(start2, end2 + 1))
-                    
-                    # РАСПРЕДЕЛЯЕМ ПАПКИ ПОРОВНУ МЕЖДУ УСТРОЙСТВАМИ
-                    half = len(folders_to_process) // 2
-                    first_half = folders_to_process[:half]
-                    second_half = folders_to_process[half:half * 2]  # Берем только нужное количество
-                    
-                    # Обработка первой половины для device1
-                    actual_first_half = min(len(first_half), len(available_numbers1))
-                    if actual_first_half < len(first_half):
-                        self.log(f"⚠️ Для {device1} доступно только {len(available_numbers1)} номеров, обрабатываем {actual_first_half} папок", "WARNING")
-                    
-                    current_number = start1
-                    device1_folder = os.path.join(attack_folder, device1)
-                    
-                    for i in range(actual_first_half):
-                        folder = first_half[i]
-                        old_path = os.path.join(source_folder, folder)
-                        new_name = str(current_number)
-                        new_path = os.path.join(device1_folder, new_name)
-                        
-                        if os.path.exists(new_path):
-                            shutil.rmtree(new_path)
-                            self.log(f"Удалена существующая папка: {device1}/{new_name}", "WARNING")
-                        
-                        shutil.copytree(old_path, new_path)
-                        self.log(f"Обработано: {folder} → {device1}/{new_name}", "SUCCESS")
-                        processed_count += 1
-                        current_number += 1
-                    
-                    # Обработка второй половины для device2
-                    actual_second_half = min(len(second_half), len(available_numbers2))
-                    if actual_second_half < len(second_half):
-                        self.log(f"⚠️ Для {device2} доступно только {len(available_numbers2)} номеров, обрабатываем {actual_second_half} папок", "WARNING")
-                    
-                    current_number = start2
-                    device2_folder = os.path.join(attack_folder, device2)
-                    
-                    for i in range(actual_second_half):
-                        folder = second_half[i]
-                        old_path = os.path.join(source_folder, folder)
-                        new_name = str(current_number)
-                        new_path = os.path.join(device2_folder, new_name)
-                        
-                        if os.path.exists(new_path):
-                            shutil.rmtree(new_path)
-                            self.log(f"Удалена существующая папка: {device2}/{new_name}", "WARNING")
-                        
-                        shutil.copytree(old_path, new_path)
-                        self.log(f"Обработано: {folder} → {device2}/{new_name}", "SUCCESS")
-                        processed_count += 1
-                        current_number += 1
-            else:
-                # Обработка для конкретного устройства
-                device_folder = os.path.join(attack_folder, device)
-                os.makedirs(device_folder, exist_ok=True)
-                
-                start_num, end_num = self.attack_ranges[attack][device]
-                available_numbers = list(range(start_num, end_num + 1))
-                
-                # Обрабатываем только доступное количество папок
-                actual_processing = min(len(folders_to_process), len(available_numbers))
-                if actual_processing < len(folders_to_process):
-                    self.log(f"⚠️ Доступно только {len(available_numbers)} номеров, обрабатываем {actual_processing} папок", "WARNING")
-                
-                current_number = start_num
-                
-                for i in range(actual_processing):
-                    folder = folders_to_process[i]
-                    old_path = os.path.join(source_folder, folder)
-                    new_name = str(current_number)
-                    new_path = os.path.join(device_folder, new_name)
-                    
-                    if os.path.exists(new_path):
-                        shutil.rmtree(new_path)
-                        self.log(f"Удалена существующая папка: {new_name}", "WARNING")
-                    
-                    shutil.copytree(old_path, new_path)
-                    self.log(f"Обработано: {folder} → {new_name}", "SUCCESS")
-                    processed_count += 1
-                    current_number += 1
+            if check_content and not self.precheck_content([op.source for op in plan.operations],
+                                                           source_folder, "Переименование"):
+                return
+            
+            summary = self.execute_plan(
+                plan, "Обработано", params["options"],
+                {"kind": "renaming", "source": os.path.abspath(source_folder),
+                 "attack_folder": os.path.abspath(attack_folder), "device": device,
+                 "mode": params["options"]["mode"]})
+            if summary is None:
+                return
+            processed_count = summary["folders"]
             
             self.log("=" * 70, "SUCCESS")
             self.log(f"✅ Обработка завершена успешно! Обработано: {processed_count} папок", "SUCCESS")
+            self.log(f"💾 Записано: {summary['files']} файлов, {self.format_size(summary['bytes'])}", "INFO")
             self.log(f"⏱️ Общее время съёмки: {shooting_time}", "INFO")
             
-            if len(all_folders) > processing_count:
-                self.log(f"📝 Осталось необработанных папок: {len(all_folders) - processing_count}", "INFO")
+            if plan.skipped:
+                self.log(f"📝 Осталось необработанных папок: {plan.skipped}", "INFO")
             
-            messagebox.showinfo("Успех", 
+            self.call_in_ui(messagebox.showinfo, "Успех", 
                                f"Обработка завершена!\n\n"
                                f"✅ Успешно обработано: {processed_count} папок\n"
                                f"⏱️ Время съёмки: {shooting_time}")
             
         except Exception as e:
             self.log(f"Ошибка: {str(e)}", "ERROR")
-            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка: {str(e)}")
     
     def execute_replacement(self):
-        source_folder = self.source_entry.get()
-        dest_folder = self.dest_entry.get()
-        device = self.device_var.get()
-        attack = self.attack_var.get()
-        replace_numbers_str = self.replace_entry.get()
-        check_content = self.check_content_var.get()
+        self.start_job("Замена", self.run_replacement, self.collect_run_params())
+    
+    def run_replacement(self, params):
+        source_folder = params["source_folder"]
+        dest_folder = params["dest_folder"]
+        device = params["device"]
+        attack = params["attack"]
+        replace_numbers_str = params["replace_numbers"]
+        check_content = params["check_content"]
         
         if not replace_numbers_str:
-            messagebox.showerror("Ошибка", "Введите номера папок для замены")
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Введите номера папок для замены")
             return
         
         replace_numbers = self.parse_number_range(replace_numbers_str)
         if replace_numbers is None:
-            messagebox.showerror("Ошибка", "Неверный формат номеров. Используйте: 522,530-532,528")
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Неверный формат номеров. Используйте: 522,530-532,528")
             return
         
-        source_folders = [f for f in os.listdir(source_folder) 
-                        if os.path.isdir(os.path.join(source_folder, f))]
+        source_folders = list_source_folders(source_folder)
         
-        source_folders.sort(key=self.natural_sort_key)
-        
-        if len(source_folders) != len(replace_numbers):
-            messagebox.showerror("Ошибка", 
-                f"Количество папок в исходной папке ({len(source_folders)}) "
-                f"не соответствует количеству номеров для замены ({len(replace_numbers)})")
+        attack_folder = os.path.join(dest_folder, attack)
+        try:
+            plan = plan_replacement(source_folders, source_folder, attack_folder, attack, device,
+                                    self.attack_ranges, replace_numbers)
+        except ValueError as e:
+            self.call_in_ui(messagebox.showerror, "Ошибка", str(e))
             return
         
         # Время съемки считается ТОЛЬКО для обрабатываемых папок
-        shooting_time = self.calculate_shooting_time(source_folders, source_folder)
-        
-        if device != "все" and (attack not in self.attack_ranges or device not in self.attack_ranges[attack]):
-            messagebox.showerror("Ошибка", f"Выбранная комбинация атаки {attack} и устройства {device} недоступна")
-            return
+        shooting_time = self.calculate_shooting_time(source_folders, source_folder,
+                                                     params["options"].get("exif_workers", DEFAULT_EXIF_WORKERS),
+                                                     params["options"].get("shooting_probe_limit",
+                                                                           DEFAULT_SHOOTING_PROBE_LIMIT))
         
         try:
-            attack_folder = os.path.join(dest_folder, attack)
-            
-            if device == "все":
-                # Определяем устройства в атаке
-                devices_in_attack = []
-                for device_name in ["kozen 10", "kozen 12"]:
-                    if attack in self.attack_ranges and device_name in self.attack_ranges[attack]:
-                        devices_in_attack.append(device_name)
-                
-                if len(devices_in_attack) == 0:
-                    messagebox.showerror("Ошибка", f"Для атаки {attack} не заданы диапазоны")
-                    return
-                
-                # Проверяем что все номера входят в соответствующие диапазоны
-                for i, num in enumerate(replace_numbers):
-                    found_device = None
-                    for device_name in devices_in_attack:
-                        start_num, end_num = self.attack_ranges[attack][device_name]
-                        if start_num <= num <= end_num:
-                            found_device = device_name
-                            break
-                    
-                    # Для атак 10-15 пропускаем проверку диапазонов
-                    if not found_device and attack not in ["10 Indoors", "11 Indoors. With attributes", "12 Indoors. Backlight", 
-                                        "13 Indoors. Insufficient lighting", "14 Indoors. Behind transparent glass", "15 Outside"]:
-                        messagebox.showerror("Ошибка", f"Номер {num} не входит ни в один диапазон атаки {attack}")
-                        return
-            else:
-                # Для обычных атак проверяем диапазон
-                if attack not in ["10 Indoors", "11 Indoors. With attributes", "12 Indoors. Backlight", 
-                                "13 Indoors. Insufficient lighting", "14 Indoors. Behind transparent glass", "15 Outside"]:
-                    start_num, end_num = self.attack_ranges[attack][device]
-                    for num in replace_numbers:
-                        if num < start_num or num > end_num:
-                            messagebox.showerror("Ошибка", f"Номер {num} вне диапазона {start_num}-{end_num}")
-                            return
-            
             if not os.path.exists(attack_folder):
-                messagebox.showerror("Ошибка", f"Папка назначения {attack_folder} не существует")
+                self.call_in_ui(messagebox.showerror, "Ошибка", f"Папка назначения {attack_folder} не существует")
                 return
             
             self.log("=" * 70, "SUCCESS")
@@ -1333,99 +4611,298 @@ class ModernFolderRenamer:
             self.log(f"🔢 Заменяемые номера: {replace_numbers}", "INFO")
             
             # ПРЕДВАРИТЕЛЬНАЯ ПРОВЕРКА СОДЕРЖИМОГО
-            if check_content:
-                self.log("🔍 Начинается предварительная проверка содержимого...", "INFO")
-                content_errors = False
-                error_details = []
-                
-                for i, folder in enumerate(source_folders, 1):
-                    old_path = os.path.join(source_folder, folder)
-                    self.log(f"🔍 Проверка {i}/{len(source_folders)}: {folder}", "DETAIL")
-                    
-                    try:
-                        if not self.check_folder_content(old_path, log_errors=True, indent=1, check_names=False, log_to_main=True):
-                            content_errors = True
-                            error_details.append(folder)
-                            self.log(f"❌ Обнаружены ошибки в папке: {folder}", "ERROR")
-                        else:
-                            self.log(f"✅ Папка {folder} проверена успешно", "SUCCESS")
-                    except Exception as e:
-                        content_errors = True
-                        error_details.append(folder)
-                        self.log(f"❌ Ошибка при проверке папки {folder}: {str(e)}", "ERROR")
-                
-                if content_errors:
-                    self.log("🚫 ОБНАРУЖЕНЫ ОШИБКИ! Замена отменена.", "ERROR")
-                    self.log(f"📂 Папки с ошибками: {', '.join(error_details)}", "ERROR")
-                    messagebox.showerror("Ошибка", 
-                                        "Обнаружены ошибки в содержимом папок! "
-                                        "Замена отменена. Проверьте логи для деталей.")
-                    return
-                else:
-                    self.log("✅ Все папки проверены успешно!", "SUCCESS")
-            
-            replaced_count = 0
+            if check_content and not self.precheck_content(source_folders, source_folder, "Замена"):
+                return
             
-            if device == "все":
-                for i, folder in enumerate(source_folders):
-                    old_path = os.path.join(source_folder, folder)
-                    target_number = replace_numbers[i]
-                    
-                    # Определяем устройство для этого номера
-                    found_device = None
-                    for device_name in devices_in_attack:
-                        start_num, end_num = self.attack_ranges[attack][device_name]
-                        if start_num <= target_number <= end_num:
-                            found_device = device_name
-                            break
-                    
-                    # Если устройство не найдено (для атак 10-15), используем первое доступное
-                    if not found_device and devices_in_attack:
-                        found_device = devices_in_attack[0]
-                    
-                    if not found_device:
-                        self.log(f"❌ Не удалось определить устройство для номера {target_number}", "ERROR")
-                        continue
-                    
-                    device_folder = os.path.join(attack_folder, found_device)
-                    new_name = str(target_number)
-                    new_path = os.path.join(device_folder, new_name)
-                    
-                    if os.path.exists(new_path):
-                        shutil.rmtree(new_path)
-                    
-                    shutil.copytree(old_path, new_path)
-                    self.log(f"Заменено: {folder} → {found_device}/{new_name}", "SUCCESS")
-                    replaced_count += 1
-            else:
-                device_folder = os.path.join(attack_folder, device)
-                
-                for i, folder in enumerate(source_folders):
-                    old_path = os.path.join(source_folder, folder)
-                    target_number = replace_numbers[i]
-                    new_name = str(target_number)
-                    new_path = os.path.join(device_folder, new_name)
-                    
-                    if os.path.exists(new_path):
-                        shutil.rmtree(new_path)
-                    
-                    shutil.copytree(old_path, new_path)
-                    self.log(f"Заменено: {folder} → {new_name}", "SUCCESS")
-                    replaced_count += 1
+            summary = self.execute_plan(
+                plan, "Заменено", params["options"],
+                {"kind": "replacement", "source": os.path.abspath(source_folder),
+                 "attack_folder": os.path.abspath(attack_folder), "device": device,
+                 "numbers": replace_numbers, "mode": params["options"]["mode"]},
+                log_removed=False)
+            if summary is None:
+                return
+            replaced_count = summary["folders"]
             
             self.log("=" * 70, "SUCCESS")
             self.log(f"✅ Замена завершена успешно! Заменено: {replaced_count} папок", "SUCCESS")
+            self.log(f"💾 Записано: {summary['files']} файлов, {self.format_size(summary['bytes'])}", "INFO")
             self.log(f"⏱️ Общее время съёмки: {shooting_time}", "INFO")
             
-            messagebox.showinfo("Успех", 
+            self.call_in_ui(messagebox.showinfo, "Успех", 
                                f"Замена завершена!\n\n"
                                f"✅ Заменено папок: {replaced_count}\n"
                                f"⏱️ Время съёмки: {shooting_time}")
             
         except Exception as e:
             self.log(f"Ошибка при замене: {str(e)}", "ERROR")
-            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка: {str(e)}")
 
+    def build_plan(self, params):
+        """Строит план по полям интерфейса: замена, если указаны номера, иначе переименование"""
+        source_folder = params["source_folder"]
+        folders = list_source_folders(source_folder)
+        attack_folder = os.path.join(params["dest_folder"], params["attack"])
+        
+        if params["replace_numbers"]:
+            numbers = self.parse_number_range(params["replace_numbers"])
+            if numbers is None:
+                raise ValueError("Неверный формат номеров. Используйте: 522,530-532,528")
+            return plan_replacement(folders, source_folder, attack_folder, params["attack"], params["device"],
+                                    self.attack_ranges, numbers)
+        return plan_renaming(folders, source_folder, attack_folder, params["attack"], params["device"],
+                             self.attack_ranges)
+    
+    def preview_plan(self):
+        self.start_job("Предпросмотр плана", self.run_preview_plan, self.collect_run_params())
+    
+    def run_preview_plan(self, params):
+        """Показывает план в логе и предлагает сохранить его в JSON"""
+        if not params["source_folder"] or not params["dest_folder"]:
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Пожалуйста, выберите исходную папку и папку назначения")
+            return
+        
+        if not os.path.isdir(params["source_folder"]) and not is_source_archive(params["source_folder"]):
+            self.call_in_ui(messagebox.showerror, "Ошибка", "Исходная папка не существует")
+            return
+        
+        try:
+            plan = self.build_plan(params)
+        except ValueError as e:
+            self.call_in_ui(messagebox.showerror, "Ошибка", str(e))
+            return
+        
+        kind = "замена" if plan.kind == "replacement" else "переименование"
+        self.log("=" * 70, "SUCCESS")
+        self.log(f"👁 План ({kind}): атака {plan.attack}, операций: {len(plan.operations)}", "HEADER")
+        for level, message in plan.messages:
+            self.log(message, level)
+        for line in plan.preview_lines():
+            self.log(line, "DETAIL")
+        if plan.skipped:
+            self.log(f"📝 Не войдут в план: {plan.skipped} папок", "INFO")
+        
+        errors = plan.validate()
+        for error in errors:
+            self.log(error, "ERROR")
+        if not errors:
+            self.log("✅ План прошёл проверку", "SUCCESS")
+        
+        path = self.call_in_ui(filedialog.asksaveasfilename, title="Сохранить план",
+                               defaultextension=".json", filetypes=[("План (JSON)", "*.json")])
+        if path:
+            plan.to_json(path)
+            self.log(f"💾 План сохранён: {path}", "SUCCESS")
+    
+    def execute_plan_file(self):
+        path = filedialog.askopenfilename(title="Выберите файл плана", filetypes=[("План (JSON)", "*.json")])
+        if path:
+            self.start_job("Выполнение плана", self.run_plan_file, path, self.get_copy_options())
+    
+    def run_plan_file(self, path, options):
+        """Выполняет ранее сохранённый план с текущими параметрами выполнения"""
+        try:
+            plan = RenamePlan.from_json(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Не удалось прочитать план: {str(e)}")
+            return
+        
+        self.log("=" * 70, "SUCCESS")
+        self.log(f"📂 Выполнение плана: {os.path.basename(path)} ({len(plan.operations)} операций)", "HEADER")
+        
+        try:
+            os.makedirs(plan.attack_folder, exist_ok=True)
+            renaming = plan.kind == "renaming"
+            summary = self.execute_plan(plan, "Обработано" if renaming else "Заменено", options,
+                                        {"kind": plan.kind, "plan": os.path.abspath(path), "mode": options["mode"]},
+                                        log_removed=renaming)
+            if summary is None:
+                return
+            
+            self.log("=" * 70, "SUCCESS")
+            self.log(f"✅ План выполнен! Обработано: {summary['folders']} папок", "SUCCESS")
+            self.log(f"💾 Записано: {summary['files']} файлов, {self.format_size(summary['bytes'])}", "INFO")
+            self.call_in_ui(messagebox.showinfo, "Успех", f"План выполнен!\n\n✅ Обработано папок: {summary['folders']}")
+        except Exception as e:
+            self.log(f"Ошибка: {str(e)}", "ERROR")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка: {str(e)}")
+    
+    def get_manifest_folder(self):
+        """Папка для работы с манифестами с вкладки проверки или None"""
+        folder = self.manifest_entry.get()
+        if not folder:
+            messagebox.showerror("Ошибка", "Выберите папку атаки, ID или проекта")
+            return None
+        if not os.path.exists(folder):
+            messagebox.showerror("Ошибка", "Папка не существует")
+            return None
+        return folder
+    
+    def build_manifests(self):
+        """Создание манифестов контрольных сумм"""
+        folder = self.get_manifest_folder()
+        if folder:
+            self.start_job("Создание манифеста", self.run_build_manifests, folder,
+                           self.verify_algorithm_var.get(), self.full_verify_var.get())
+    
+    def verify_manifests(self):
+        """Перепроверка папок по манифестам"""
+        folder = self.get_manifest_folder()
+        if folder:
+            self.start_job("Перепроверка по манифесту", self.run_verify_manifests, folder,
+                           self.full_verify_var.get())
+    
+    def hash_folder_files(self, folder, names, algorithm, workers):
+        """Хэширует файлы папки в пуле потоков, отдаёт (имя, хэш) в исходном порядке"""
+        jobs = [(os.path.join(folder, name), algorithm) for name in names]
+        return zip(names, run_in_pool(file_digest, jobs, workers))
+    
+    def run_build_manifests(self, folder, algorithm, full=False):
+        """
+        Создаёт или обновляет манифесты атак. Суммы файлов с прежними размером и датой
+        берутся из существующего манифеста, хэшируются только новые и изменившиеся.
+        """
+        self.check_log("=" * 60, "HEADER")
+        self.check_log(f"📝 МАНИФЕСТ КОНТРОЛЬНЫХ СУММ: {os.path.basename(folder)} ({algorithm})", "HEADER")
+        self.check_log("=" * 60, "HEADER")
+        
+        attack_folders = find_attack_folders(folder, self.attack_ranges)
+        if not attack_folders:
+            self.check_log("❌ Не найдено ни одной папки атаки", "ERROR")
+            self.call_in_ui(messagebox.showwarning, "Манифест", "Не найдено ни одной папки атаки")
+            return
+        
+        workers = self.get_worker_count(self.copy_workers_var, DEFAULT_COPY_WORKERS)
+        total_files = 0
+        total_hashed = 0
+        processed = 0
+        for attack_folder in attack_folders:
+            manifest = ChecksumManifest(attack_folder)
+            known = {} if full else manifest.load()
+            entries = []
+            attack_files = 0
+            attack_hashed = 0
+            for number_folder in manifest_folders(attack_folder):
+                self.checkpoint()
+                previous = known.get(manifest.folder_key(number_folder))
+                recorded = {}
+                if previous and previous["algorithm"] == algorithm:
+                    recorded = {record[0]: record for record in previous["files"]}
+                
+                stats = folder_file_stats(number_folder)
+                files = []
+                to_hash = []
+                for name in sorted(stats):
+                    record = recorded.get(name)
+                    if record and (record[1], record[2]) == stats[name]:
+                        files.append(record)
+                    else:
+                        to_hash.append(name)
+                for name, digest in self.hash_folder_files(number_folder, to_hash, algorithm, workers):
+                    files.append([name, *stats[name], digest])
+                files.sort()
+                
+                entries.append(manifest.make_entry(number_folder, algorithm, files))
+                attack_files += len(files)
+                attack_hashed += len(to_hash)
+                processed += 1
+                self.report_progress("Манифест", processed)
+            
+            manifest.rewrite(entries)
+            total_files += attack_files
+            total_hashed += attack_hashed
+            self.check_log(f"✅ {os.path.relpath(attack_folder, folder)}: папок {len(entries)}, файлов {attack_files}, "
+                           f"посчитано сумм {attack_hashed}", "SUCCESS", 1)
+        
+        self.check_log(f"📊 Атак: {len(attack_folders)}, файлов: {total_files}, посчитано сумм: {total_hashed}", "INFO")
+        self.call_in_ui(messagebox.showinfo, "Манифест",
+                        f"Манифесты созданы для атак: {len(attack_folders)}\n"
+                        f"Файлов: {total_files}, посчитано сумм: {total_hashed}")
+    
+    def run_verify_manifests(self, folder, full=False):
+        """
+        Сверяет папки атак с манифестами. Без full хэшируются только файлы, у которых
+        изменились размер или дата, поэтому повторная проверка проекта занимает секунды.
+        """
+        self.check_log("=" * 60, "HEADER")
+        self.check_log(f"🔒 ПЕРЕПРОВЕРКА ПО МАНИФЕСТУ: {os.path.basename(folder)}", "HEADER")
+        self.check_log("=" * 60, "HEADER")
+        
+        attack_folders = find_attack_folders(folder, self.attack_ranges)
+        if not attack_folders:
+            self.check_log("❌ Не найдено ни одной папки атаки", "ERROR")
+            self.call_in_ui(messagebox.showwarning, "Перепроверка", "Не найдено ни одной папки атаки")
+            return
+        
+        workers = self.get_worker_count(self.copy_workers_var, DEFAULT_COPY_WORKERS)
+        total_errors = 0
+        total_files = 0
+        total_hashed = 0
+        processed = 0
+        for attack_folder in attack_folders:
+            self.check_log(f"🎯 {os.path.relpath(attack_folder, folder)}", "SECTION")
+            manifest = ChecksumManifest(attack_folder)
+            known = manifest.load()
+            if not known:
+                self.check_log("❌ Манифест отсутствует - создайте его", "ERROR", 1)
+                total_errors += 1
+                continue
+            
+            current = {manifest.folder_key(path): path for path in manifest_folders(attack_folder)}
+            for key in sorted(set(known) - set(current), key=natural_sort_key):
+                self.check_log(f"❌ Папка из манифеста отсутствует: {key}", "ERROR", 1)
+                total_errors += 1
+            for key in sorted(set(current) - set(known), key=natural_sort_key):
+                self.check_log(f"⚠️ Папка не внесена в манифест: {key}", "WARNING", 1)
+                total_errors += 1
+            
+            touched = False
+            attack_errors = 0
+            for key, path in current.items():
+                if key not in known:
+                    continue
+                self.checkpoint()
+                entry = known[key]
+                recorded = {record[0]: record for record in entry["files"]}
+                stats = folder_file_stats(path)
+                
+                missing = sorted(set(recorded) - set(stats))
+                added = sorted(set(stats) - set(recorded))
+                to_hash = [name for name in sorted(recorded)
+                           if name in stats and (full or (recorded[name][1], recorded[name][2]) != stats[name])]
+                modified = []
+                for name, digest in self.hash_folder_files(path, to_hash, entry["algorithm"], workers):
+                    if digest != recorded[name][3]:
+                        modified.append(name)
+                    elif (recorded[name][1], recorded[name][2]) != stats[name]:
+                        # Изменилась только дата - запоминаем, чтобы не хэшировать файл снова
+                        recorded[name][1:3] = stats[name]
+                        touched = True
+                
+                for title, names in (("изменены", modified), ("отсутствуют", missing), ("лишние", added)):
+                    if names:
+                        shown = ", ".join(names[:5]) + (" ..." if len(names) > 5 else "")
+                        self.check_log(f"❌ {key}: {title} файлы ({len(names)}): {shown}", "ERROR", 1)
+                        attack_errors += 1
+                total_files += len(stats)
+                total_hashed += len(to_hash)
+                processed += 1
+                self.report_progress("Перепроверка", processed)
+            
+            if touched:
+                manifest.rewrite(sorted(known.values(), key=lambda entry: natural_sort_key(entry["folder"])))
+            if attack_errors == 0:
+                self.check_log(f"✅ Файлы совпадают с манифестом", "SUCCESS", 1)
+            total_errors += attack_errors
+        
+        self.check_log("=" * 60, "HEADER")
+        self.check_log(f"📊 Файлов: {total_files}, пересчитано сумм: {total_hashed}, ошибок: {total_errors}",
+                       "SUCCESS" if total_errors == 0 else "ERROR")
+        if total_errors == 0:
+            self.call_in_ui(messagebox.showinfo, "Перепроверка завершена", "Все файлы совпадают с манифестами")
+        else:
+            self.call_in_ui(messagebox.showwarning, "Перепроверка завершена", f"Обнаружены расхождения: {total_errors}")
+    
     def check_attack(self):
         """Проверка отдельной атаки"""
         attack_folder = self.attack_check_entry.get()
@@ -1438,6 +4915,9 @@ class ModernFolderRenamer:
             messagebox.showerror("Ошибка", "Папка атаки не существует")
             return
         
+        self.start_job("Проверка атаки", self.run_check_attack, attack_folder)
+    
+    def run_check_attack(self, attack_folder):
         self.check_log("=" * 60, "HEADER")
         self.check_log(f"🔍 ПРОВЕРКА АТАКИ: {os.path.basename(attack_folder)}", "HEADER")
         self.check_log("=" * 60, "HEADER")
@@ -1504,6 +4984,8 @@ class ModernFolderRenamer:
                                 if not self.check_folder_content(folder_path, log_errors=True, indent=3, check_names=False):
                                     folder_errors += 1
                                 total_checked += 1
+                                self.checkpoint()
+                                self.report_progress("Проверка", total_checked)
                             
                             total_errors += folder_errors
                             total_folders += actual_count
@@ -1525,7 +5007,7 @@ class ModernFolderRenamer:
                     folders = [f for f in all_items 
                               if os.path.isdir(os.path.join(attack_folder, f)) and self.is_numeric_folder(f)]
                     
-                    other_items = [item for item in all_items if item not in folders]
+                    other_items = [item for item in all_items if item not in folders and item not in SERVICE_ENTRIES]
                     if other_items:
                         self.check_log(f"⚠️ Посторонние элементы: {', '.join(other_items)}", "WARNING", 1)
                     
@@ -1549,6 +5031,8 @@ class ModernFolderRenamer:
                         if not self.check_folder_content(folder_path, log_errors=True, indent=3, check_names=False):
                             folder_errors += 1
                         total_checked += 1
+                        self.checkpoint()
+                        self.report_progress("Проверка", total_checked)
                     
                     total_errors += folder_errors
                     total_folders += actual_count
@@ -1566,15 +5050,15 @@ class ModernFolderRenamer:
             if total_errors == 0:
                 self.check_log(f"✅ ПРОВЕРКА ЗАВЕРШЕНА УСПЕШНО!", "SUCCESS")
                 self.check_log(f"📊 Проверено папок: {total_checked}", "SUCCESS")
-                messagebox.showinfo("Проверка завершена", "Атака проверена успешно! Ошибок не обнаружено.")
+                self.call_in_ui(messagebox.showinfo, "Проверка завершена", "Атака проверена успешно! Ошибок не обнаружено.")
             else:
                 self.check_log(f"❌ ПРОВЕРКА ЗАВЕРШЕНА С ОШИБКАМИ", "ERROR")
                 self.check_log(f"📊 Обнаружено ошибок: {total_errors}", "ERROR")
-                messagebox.showwarning("Проверка завершена", f"Обнаружены ошибки: {total_errors}")
+                self.call_in_ui(messagebox.showwarning, "Проверка завершена", f"Обнаружены ошибки: {total_errors}")
                 
         except Exception as e:
             self.check_log(f"❌ Ошибка при проверке атаки: {str(e)}", "ERROR")
-            messagebox.showerror("Ошибка", f"Произошла ошибка при проверке: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка при проверке: {str(e)}")
 
     def check_attack_structure(self, attack_folder, attack_type):
         """Проверяет структуру папки атаки и возвращает информацию о ней"""
@@ -1618,6 +5102,9 @@ class ModernFolderRenamer:
             messagebox.showerror("Ошибка", "Папка ID не существует")
             return
         
+        self.start_job("Проверка ID", self.run_check_id, id_folder)
+    
+    def run_check_id(self, id_folder):
         self.check_log("=" * 60, "HEADER")
         self.check_log(f"🆔 ПРОВЕРКА ID: {os.path.basename(id_folder)}", "HEADER")
         self.check_log("=" * 60, "HEADER")
@@ -1637,6 +5124,7 @@ class ModernFolderRenamer:
             total_errors = 0
             total_attacks = len(attack_folders)
             total_content_errors = 0
+            checked_folders = 0
             
             self.check_log(f"📊 Найдено атак: {total_attacks}", "INFO")
             self.check_log("", "INFO")
@@ -1689,6 +5177,9 @@ class ModernFolderRenamer:
                                     for folder in folders:
                                         folder_path = os.path.join(device_folder, folder)
                                         self.check_log(f"📂 Папка {folder}:", "DETAIL", 3)
+                                        checked_folders += 1
+                                        self.checkpoint()
+                                        self.report_progress("Проверка", checked_folders)
                                         if not self.check_folder_content(folder_path, log_errors=True, indent=4, check_names=False):
                                             device_content_errors += 1
                                             content_errors += 1
@@ -1720,6 +5211,9 @@ class ModernFolderRenamer:
                             for folder in folders:
                                 folder_path = os.path.join(attack_folder, folder)
                                 self.check_log(f"📂 Папка {folder}:", "DETAIL", 3)
+                                checked_folders += 1
+                                self.checkpoint()
+                                self.report_progress("Проверка", checked_folders)
                                 if not self.check_folder_content(folder_path, log_errors=True, indent=4, check_names=False):
                                     flat_content_errors += 1
                                     content_errors += 1
@@ -1752,18 +5246,18 @@ class ModernFolderRenamer:
                 self.check_log(f"✅ ПРОВЕРКА ID ЗАВЕРШЕНА УСПЕШНО!", "SUCCESS")
                 self.check_log(f"📊 Проверено атак: {total_attacks}", "SUCCESS")
                 self.check_log(f"🔍 Ошибок содержимого: {total_content_errors}", "SUCCESS")
-                messagebox.showinfo("Проверка завершена", "ID проверен успешно! Ошибок не обнаружено.")
+                self.call_in_ui(messagebox.showinfo, "Проверка завершена", "ID проверен успешно! Ошибок не обнаружено.")
             else:
                 self.check_log(f"❌ ПРОВЕРКА ID ЗАВЕРШЕНА С ОШИБКАМИ", "ERROR")
                 self.check_log(f"📊 Обнаружено ошибок: {total_errors}", "ERROR")
                 self.check_log(f"🔍 Ошибок содержимого: {total_content_errors}", "ERROR")
-                messagebox.showwarning("Проверка завершена", 
+                self.call_in_ui(messagebox.showwarning, "Проверка завершена", 
                                      f"Обнаружены ошибки: {total_errors}\n"
                                      f"Ошибок содержимого: {total_content_errors}")
                 
         except Exception as e:
             self.check_log(f"❌ Ошибка при проверке ID: {str(e)}", "ERROR")
-            messagebox.showerror("Ошибка", f"Произошла ошибка при проверке: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка при проверке: {str(e)}")
 
     def check_global(self):
         """Общая проверка проекта с проверкой содержимого папок"""
@@ -1777,6 +5271,9 @@ class ModernFolderRenamer:
             messagebox.showerror("Ошибка", "Общая папка проекта не существует")
             return
         
+        self.start_job("Общая проверка", self.run_check_global, project_folder)
+    
+    def run_check_global(self, project_folder):
         self.check_log("=" * 60, "HEADER")
         self.check_log(f"🌐 ОБЩАЯ ПРОВЕРКА ПРОЕКТА", "HEADER")
         self.check_log(f"📁 Папка: {project_folder}", "HEADER")
@@ -1801,6 +5298,7 @@ class ModernFolderRenamer:
             total_errors = 0
             total_ids = len(id_folders)
             total_content_errors = 0
+            checked_folders = 0
             
             self.check_log(f"📊 Найдено ID: {total_ids}", "INFO")
             self.check_log("", "INFO")
@@ -1878,6 +5376,9 @@ class ModernFolderRenamer:
                                             for folder in folders:
                                                 folder_path = os.path.join(device_folder, folder)
                                                 self.check_log(f"📂 Папка {folder}:", "DETAIL", 4)
+                                                checked_folders += 1
+                                                self.checkpoint()
+                                                self.report_progress("Проверка", checked_folders)
                                                 if not self.check_folder_content(folder_path, log_errors=True, indent=5, check_names=False):
                                                     device_content_errors += 1
                                                     attack_content_errors += 1
@@ -1909,6 +5410,9 @@ class ModernFolderRenamer:
                                     for folder in folders:
                                         folder_path = os.path.join(attack_folder, folder)
                                         self.check_log(f"📂 Папка {folder}:", "DETAIL", 4)
+                                        checked_folders += 1
+                                        self.checkpoint()
+                                        self.report_progress("Проверка", checked_folders)
                                         if not self.check_folder_content(folder_path, log_errors=True, indent=5, check_names=False):
                                             flat_content_errors += 1
                                             attack_content_errors += 1
@@ -1953,21 +5457,143 @@ class ModernFolderRenamer:
                 self.check_log(f"✅ ОБЩАЯ ПРОВЕРКА ЗАВЕРШЕНА УСПЕШНО!", "SUCCESS")
                 self.check_log(f"📊 Проверено ID: {total_ids}", "SUCCESS")
                 self.check_log(f"🔍 Ошибок содержимого: {total_content_errors}", "SUCCESS")
-                messagebox.showinfo("Проверка завершена", "Проект проверен успешно! Ошибок не обнаружено.")
+                self.call_in_ui(messagebox.showinfo, "Проверка завершена", "Проект проверен успешно! Ошибок не обнаружено.")
             else:
                 self.check_log(f"❌ ОБЩАЯ ПРОВЕРКА ЗАВЕРШЕНА С ОШИБКАМИ", "ERROR")
                 self.check_log(f"📊 Обнаружено ошибок: {total_errors}", "ERROR")
                 self.check_log(f"📊 Проверено ID: {total_ids}", "INFO")
                 self.check_log(f"🔍 Ошибок содержимого: {total_content_errors}", "ERROR")
-                messagebox.showwarning("Проверка завершена", 
+                self.call_in_ui(messagebox.showwarning, "Проверка завершена", 
                                      f"Обнаружены ошибки: {total_errors}\n"
                                      f"Ошибок содержимого: {total_content_errors}\n"
                                      f"Проверено ID: {total_ids}")
                 
         except Exception as e:
             self.check_log(f"❌ Ошибка при общей проверке проекта: {str(e)}", "ERROR")
-            messagebox.showerror("Ошибка", f"Произошла ошибка при проверке: {str(e)}")
+            self.call_in_ui(messagebox.showerror, "Ошибка", f"Произошла ошибка при проверке: {str(e)}")
 
+    def shooting_report(self):
+        """Отчёт по времени съёмки всего проекта по ID, атакам и устройствам"""
+        project_folder = self.global_check_entry.get()
+        
+        if not project_folder:
+            messagebox.showerror("Ошибка", "Выберите общую папку проекта")
+            return
+        
+        if not os.path.exists(project_folder):
+            messagebox.showerror("Ошибка", "Общая папка проекта не существует")
+            return
+        
+        path = filedialog.asksaveasfilename(title="Сохранить отчёт по времени съёмки", defaultextension=".csv",
+                                            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")])
+        if path:
+            options = self.get_copy_options()
+            self.start_job("Отчёт по времени съёмки", self.run_shooting_report, project_folder, path,
+                           options["exif_workers"], options["shooting_probe_limit"])
+    
+    def shooting_report_row(self, level, group):
+        """Строка отчёта для устройства, атаки или ID: сессии по всем датированным папкам уровня"""
+        folder = group["folder"]
+        times = group["times"]
+        clusters = cluster_sessions(times)
+        seconds = clusters.total
+        if times and not seconds:
+            # Как в calculate_shooting_time: минимум 30 секунд на папку
+            seconds = len(times) * MIN_SESSION_SECONDS
+        return {"level": level, "id": folder.id,
+                "attack": folder.attack if level != "id" else "",
+                "device": folder.device if level == "device" else "", "number": "",
+                "folders": group["folders"], "dated": len(times),
+                "days": len(clusters.day_sessions) - 1, "sessions": len(clusters.session_start),
+                "seconds": round(seconds), "duration": self.format_duration(seconds),
+                "first": wall_clock_datetime(clusters.session_start[0]).isoformat() if times else "",
+                "last": wall_clock_datetime(clusters.session_end[-1]).isoformat() if times else ""}
+    
+    def run_shooting_report(self, project_folder, path, workers, probe_limit):
+        """
+        Время съёмки всех папок номеров проекта за один параллельный проход (с кэшем дат).
+        Итоги по устройствам, атакам и ID пишутся в отчёт сразу по завершении группы,
+        поэтому в памяти хранятся только моменты съёмки текущего ID.
+        """
+        self.check_log("=" * 60, "HEADER")
+        self.check_log(f"⏱ ОТЧЁТ ПО ВРЕМЕНИ СЪЁМКИ: {os.path.basename(os.path.normpath(project_folder))}", "HEADER")
+        self.check_log("=" * 60, "HEADER")
+        
+        def job(folder):
+            return folder, self.read_folder_shooting_time(folder.path, probe_limit)
+        
+        jobs = ((folder,) for folder in iter_project_folders(project_folder, self.attack_ranges))
+        # Уровни от вложенного к внешнему: группа закрывается, когда меняется её ключ
+        levels = ("device", "attack", "id")
+        groups = dict.fromkeys(levels)
+        project = {"folders": 0, "dated": 0, "seconds": 0, "ids": 0}
+        writer = ShootingReportWriter(path)
+        
+        def close_group(level):
+            row = self.shooting_report_row(level, groups[level])
+            writer.write(row)
+            groups[level] = None
+            if level == "id":
+                project["ids"] += 1
+                project["folders"] += row["folders"]
+                project["dated"] += row["dated"]
+                project["seconds"] += row["seconds"]
+                self.check_log(f"🆔 {row['id']}: папок {row['folders']}, с датой {row['dated']}, "
+                               f"время съёмки {row['duration']}", "INFO", 1)
+        
+        try:
+            for done, (folder, moment) in enumerate(stream_in_pool(job, jobs, workers), 1):
+                self.checkpoint()
+                keys = {"device": (folder.id, folder.attack, folder.device),
+                        "attack": (folder.id, folder.attack), "id": folder.id}
+                for level in levels:
+                    if groups[level] and groups[level]["key"] != keys[level]:
+                        close_group(level)
+                for level in levels:
+                    if groups[level] is None:
+                        groups[level] = {"key": keys[level], "folder": folder, "times": array('d'), "folders": 0}
+                    groups[level]["folders"] += 1
+                    if moment:
+                        groups[level]["times"].append(wall_clock_seconds(moment))
+                
+                writer.write({"level": "folder", "id": folder.id, "attack": folder.attack, "device": folder.device,
+                              "number": folder.number, "folders": 1, "dated": 1 if moment else 0,
+                              "days": "", "sessions": "", "seconds": "", "duration": "",
+                              "first": moment.isoformat() if moment else "", "last": moment.isoformat() if moment else ""})
+                if done % 100 == 0:
+                    self.report_progress("Время съёмки проекта", done)
+                # Кэш сохраняется по ходу, чтобы прерванный отчёт не читал изображения заново
+                if done % 5000 == 0 and self.shooting_cache is not None:
+                    self.shooting_cache.save()
+            
+            for level in levels:
+                if groups[level]:
+                    close_group(level)
+            writer.write({"level": "project", "id": "", "attack": "", "device": "", "number": "",
+                          "folders": project["folders"], "dated": project["dated"], "days": "", "sessions": "",
+                          "seconds": project["seconds"], "duration": self.format_duration(project["seconds"]),
+                          "first": "", "last": ""})
+        finally:
+            writer.close()
+            if self.shooting_cache is not None:
+                try:
+                    self.shooting_cache.save()
+                except sqlite3.Error as e:
+                    self.check_log(f"Не удалось сохранить кэш времени съёмки: {str(e)}", "WARNING")
+        
+        if not project["ids"]:
+            self.check_log("❌ В проекте не найдено папок номеров", "ERROR")
+            self.call_in_ui(messagebox.showwarning, "Отчёт", "В проекте не найдено папок номеров")
+            return
+        
+        self.check_log("=" * 60, "HEADER")
+        self.check_log(f"✅ ID: {project['ids']}, папок: {project['folders']} (с датой {project['dated']}), "
+                       f"время съёмки: {self.format_duration(project['seconds'])}", "SUCCESS")
+        self.check_log(f"💾 Отчёт сохранён: {path}", "SUCCESS")
+        self.call_in_ui(messagebox.showinfo, "Отчёт", f"Отчёт по времени съёмки сохранён!\n\n"
+                                                   f"⏱ Время съёмки: {self.format_duration(project['seconds'])}\n"
+                                                   f"📁 Папок: {project['folders']}")
+    
     def load_attack_data(self, event=None):
         """Загрузка данных выбранной атаки для редактирования"""
         attack = self.edit_attack_var.get()
@@ -0,0 +1,158 @@
+"""
+Журнал запуска: продолжение после сбоя одной папки при параллельном копировании
+и восстановление перемещения, прерванного до записи в журнал.
+Окно Tk не создаётся: приложение собирается без __init__, поля интерфейса заменены простыми значениями.
+
+Запуск: python -m pytest tests
+"""
+import os
+import queue
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folder_renamer as fr
+
+
+class Field:
+    """Замена tk-переменной или поля ввода: get/set"""
+    
+    def __init__(self, value):
+        self.value = value
+    
+    def get(self):
+        return self.value
+    
+    def set(self, value):
+        self.value = value
+
+
+def make_app(root, **fields):
+    """Приложение без окна: журналы и манифесты в root, лог собирается в app.messages"""
+    app = fr.ModernFolderRenamer.__new__(fr.ModernFolderRenamer)
+    app.attack_ranges = {"02 2D Mask": {"kozen 10": (91, 170), "kozen 12": (171, 250)}}
+    app.messages = []
+    app.log = lambda message, level="INFO": app.messages.append((level, message))
+    app.check_log = lambda message, level="INFO", indent=0: app.messages.append((level, message))
+    values = dict(copy_workers_var=4, exif_workers_var=4, shooting_probe_limit_var=20, file_workers_var=1,
+                  check_content_var=False, device_var="kozen 10", attack_var="02 2D Mask", replace_entry="",
+                  output_mode_var=fr.OUTPUT_MODES["copy"], sync_var=False, sync_hash_var=False,
+                  preserve_metadata_var=True, keep_trash_var=False, verify_var=False,
+                  verify_algorithm_var="blake2b", archive_format_var="ZIP", archive_compression_var="Без сжатия",
+                  run_manifest_var=False, run_manifest_format_var="CSV",
+                  source_entry=os.path.join(root, "src"), dest_entry=os.path.join(root, "dst"))
+    values.update(fields)
+    for name, value in values.items():
+        setattr(app, name, Field(value))
+    app.journal_dir = os.path.join(root, "journals")
+    app.run_manifest_dir = os.path.join(root, "manifests")
+    app.events = queue.Queue()
+    app.size_cache = {}
+    app.size_cache_lock = threading.Lock()
+    app.job_token = fr.CancelToken()
+    app.unattended = threading.local()
+    app.io_scheduler = fr.IOScheduler()
+    app.shooting_cache = None
+    return app
+
+
+def make_source(root, count):
+    """Папки захвата cap1..capN: BestShot и три подпапки с файлами"""
+    for i in range(1, count + 1):
+        folder = os.path.join(root, f"cap{i}")
+        for sub in ("Captures", "Focus", "Other"):
+            os.makedirs(os.path.join(folder, sub))
+            for j in range(3):
+                with open(os.path.join(folder, sub, f"{j}.jpg"), "wb") as f:
+                    f.write(os.urandom(500))
+        with open(os.path.join(folder, "BestShot.jpg"), "wb") as f:
+            f.write(f"cap{i}".encode())
+
+
+class CopyJournalTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.source = os.path.join(self.root, "src")
+        self.target = os.path.join(self.root, "dst", "02 2D Mask", "kozen 10")
+        patcher = mock.patch.object(fr, "messagebox")
+        patcher.start().askyesno.return_value = True
+        self.addCleanup(patcher.stop)
+    
+    def run_job(self, app):
+        app.run_renaming(app.collect_run_params())
+    
+    def targets(self):
+        return sorted(os.listdir(self.target), key=int)
+    
+    def test_resume_after_partial_parallel_failure(self):
+        make_source(self.source, 12)
+        app = make_app(self.root)
+        copy_folder_job = fr.copy_folder_job
+        others_done = threading.Semaphore(0)
+        
+        def failing(source, *args, **kwargs):
+            # Сбой первой папки приходит, когда остальные одиннадцать уже скопированы
+            if os.path.basename(source) == "cap1":
+                for _ in range(11):
+                    others_done.acquire(timeout=10)
+                raise OSError("диск недоступен")
+            result = copy_folder_job(source, *args, **kwargs)
+            others_done.release()
+            return result
+        
+        with mock.patch.object(fr, "copy_folder_job", failing):
+            self.run_job(app)
+        self.assertEqual(self.targets(), [str(number) for number in range(92, 103)])
+        
+        # Повторный запуск копирует только папку, на которой был сбой: остальные отмечены в журнале
+        copied = []
+        
+        def counting(source, *args, **kwargs):
+            copied.append(os.path.basename(source))
+            return copy_folder_job(source, *args, **kwargs)
+        
+        with mock.patch.object(fr, "copy_folder_job", counting):
+            self.run_job(app)
+        self.assertEqual(copied, ["cap1"])
+        self.assertEqual(self.targets(), [str(number) for number in range(91, 103)])
+        with open(os.path.join(self.target, "91", "BestShot.jpg"), "rb") as f:
+            self.assertEqual(f.read(), b"cap1")
+    
+    def test_move_recovers_after_crash_before_journal(self):
+        make_source(self.source, 6)
+        app = make_app(self.root, output_mode_var=fr.OUTPUT_MODES["move"], copy_workers_var=1)
+        copy_folder_job = fr.copy_folder_job
+        
+        def crashing(source, *args, **kwargs):
+            if os.path.basename(source) == "cap4":
+                raise KeyboardInterrupt
+            return copy_folder_job(source, *args, **kwargs)
+        
+        # Процесс падает на четвёртой папке, а три перенесённые так и не попали в журнал
+        with mock.patch.object(fr, "copy_folder_job", crashing), \
+                mock.patch.object(fr.RunJournal, "record"), \
+                self.assertRaises(KeyboardInterrupt):
+            self.run_job(app)
+        self.assertEqual(sorted(os.listdir(self.source)), ["cap4", "cap5", "cap6"])
+        self.assertEqual(self.targets(), ["91", "92", "93"])
+        
+        app.messages.clear()
+        self.run_job(app)
+        self.assertEqual(os.listdir(self.source), [])
+        self.assertEqual(self.targets(), [str(number) for number in range(91, 97)])
+        for number, name in zip(range(91, 97), ("cap1", "cap2", "cap3", "cap4", "cap5", "cap6")):
+            with open(os.path.join(self.target, str(number), "BestShot.jpg"), "rb") as f:
+                self.assertEqual(f.read(), name.encode())
+        skipped = [message for _, message in app.messages if "Папка уже перенесена" in message]
+        self.assertEqual(len(skipped), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+Разбор EXIF по заголовку (read_exif_datetime): порядок байт TIFF, короткие значения внутри записи IFD,
+JPEG с сегментом XMP перед Exif.
+
+Запуск: python -m pytest tests
+"""
+import datetime
+import io
+import os
+import struct
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_renamer import read_exif_datetime
+
+
+def ifd(order, entries, offset, next_ifd=0):
+    """IFD с данными значений сразу за ним; строки до 4 байт лежат в самой записи"""
+    data_offset = offset + 2 + len(entries) * 12 + 4
+    table = struct.pack(order + "H", len(entries))
+    data = b""
+    for tag, value_type, value in sorted(entries):
+        if value_type == 2:
+            raw = value.encode("ascii") + b"\0"
+            if len(raw) <= 4:
+                table += struct.pack(order + "HHI4s", tag, 2, len(raw), raw)
+            else:
+                table += struct.pack(order + "HHII", tag, 2, len(raw), data_offset + len(data))
+                data += raw
+        else:
+            table += struct.pack(order + "HHII", tag, 4, 1, value)
+    return table + struct.pack(order + "I", next_ifd) + data
+
+
+def make_tiff(order, date, subsec=None):
+    """TIFF-заголовок: IFD0 с указателем на Exif IFD, в нём DateTimeOriginal и SubSecTimeOriginal"""
+    ifd0_entries = [(0x010F, 2, "Kozen"), (0x0132, 2, "2000:01:01 00:00:00")]
+    ifd0_size = len(ifd(order, ifd0_entries + [(0x8769, 4, 0)], 8))
+    exif_entries = [(0x8827, 4, 100), (0x9003, 2, date)]
+    if subsec is not None:
+        exif_entries.append((0x9291, 2, subsec))
+    magic = b"II*\0" if order == "<" else b"MM\0*"
+    return (magic + struct.pack(order + "I", 8)
+            + ifd(order, ifd0_entries + [(0x8769, 4, 8 + ifd0_size)], 8)
+            + ifd(order, exif_entries, 8 + ifd0_size))
+
+
+def segment(marker, body):
+    return b"\xff" + bytes([marker]) + struct.pack(">H", len(body) + 2) + body
+
+
+def make_jpeg(tiff, before=b""):
+    """JPEG до начала данных изображения: SOI, сегменты перед Exif, APP1 Exif, SOS"""
+    jfif = segment(0xE0, b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0")
+    sos = segment(0xDA, b"\x01\x01\x00\x3f\x00")
+    return b"\xff\xd8" + jfif + before + segment(0xE1, b"Exif\0\0" + tiff) + sos + b"\0" * 16 + b"\xff\xd9"
+
+
+class ReadExifDatetimeTest(unittest.TestCase):
+    
+    def test_little_endian_jpeg(self):
+        data = make_jpeg(make_tiff("<", "2024:03:15 10:20:30", "250"))
+        self.assertEqual(read_exif_datetime(io.BytesIO(data)), datetime.datetime(2024, 3, 15, 10, 20, 30, 250000))
+    
+    def test_big_endian_jpeg(self):
+        data = make_jpeg(make_tiff(">", "2024:03:15 10:20:30", "250"))
+        self.assertEqual(read_exif_datetime(io.BytesIO(data)), datetime.datetime(2024, 3, 15, 10, 20, 30, 250000))
+    
+    def test_big_endian_tiff(self):
+        data = make_tiff(">", "2023:12:31 23:59:59")
+        self.assertEqual(read_exif_datetime(io.BytesIO(data)), datetime.datetime(2023, 12, 31, 23, 59, 59))
+    
+    def test_inline_values(self):
+        # "7\0" и "123\0" помещаются в 4 байта записи и хранятся без смещения, в любом порядке байт
+        for order in ("<", ">"):
+            for subsec, microsecond in (("7", 700000), ("123", 123000)):
+                with self.subTest(order=order, subsec=subsec):
+                    data = make_jpeg(make_tiff(order, "2022:06:01 08:00:00", subsec))
+                    self.assertEqual(read_exif_datetime(io.BytesIO(data)),
+                                     datetime.datetime(2022, 6, 1, 8, 0, 0, microsecond))
+    
+    def test_xmp_app1_before_exif(self):
+        xmp = segment(0xE1, b"http://ns.adobe.com/xap/1.0/\0<x:xmpmeta xmlns:x='adobe:ns:meta/'/>")
+        data = make_jpeg(make_tiff("<", "2021:10:31 02:30:00"), before=xmp)
+        self.assertEqual(read_exif_datetime(io.BytesIO(data)), datetime.datetime(2021, 10, 31, 2, 30))
+    
+    def test_jpeg_without_exif(self):
+        data = b"\xff\xd8" + segment(0xE0, b"JFIF\0\x01\x01\0\0\x01\0\x01\0\0") + segment(0xDA, b"\0") + b"\xff\xd9"
+        self.assertIsNone(read_exif_datetime(io.BytesIO(data)))
+    
+    def test_other_format(self):
+        with self.assertRaises(ValueError):
+            read_exif_datetime(io.BytesIO(b"\x89PNG\r\n\x1a\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
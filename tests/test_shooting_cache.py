@@ -0,0 +1,68 @@
+"""
+Кэш дат съёмки: время по местным часам снимка не сдвигается при переходе на летнее время
+и при смене часового пояса машины между запусками.
+
+Запуск: python -m pytest tests
+"""
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import folder_renamer as fr
+
+
+@unittest.skipIf(fr.sqlite3 is None, "нет sqlite3")
+@unittest.skipUnless(hasattr(time, "tzset"), "часовой пояс меняется только через TZ и time.tzset")
+class ShootingTimeCacheTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        self.path = os.path.join(self.root, "shooting_time.sqlite")
+        old_tz = os.environ.get("TZ")
+        self.addCleanup(self.set_timezone, old_tz)
+    
+    def set_timezone(self, name):
+        if name is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = name
+        time.tzset()
+    
+    def round_trip(self, taken, write_tz, read_tz):
+        self.set_timezone(write_tz)
+        cache = fr.ShootingTimeCache(self.path)
+        cache.put("/photos/BestShot.jpg", 100, 1, taken)
+        cache.save()
+        cache.close()
+        
+        self.set_timezone(read_tz)
+        cache = fr.ShootingTimeCache(self.path)
+        try:
+            return cache.get("/photos/BestShot.jpg", 100, 1)
+        finally:
+            cache.close()
+    
+    def test_dst_gap(self):
+        # 2021-03-28 02:30 в Берлине не существует: часы переводятся с 02:00 сразу на 03:00
+        taken = datetime.datetime(2021, 3, 28, 2, 30, 15, 500000)
+        self.assertEqual(self.round_trip(taken, "Europe/Berlin", "Europe/Berlin"), taken)
+    
+    def test_dst_overlap(self):
+        # 2021-10-31 02:30 в Берлине бывает дважды
+        taken = datetime.datetime(2021, 10, 31, 2, 30)
+        self.assertEqual(self.round_trip(taken, "Europe/Berlin", "Europe/Berlin"), taken)
+    
+    def test_timezone_change_between_runs(self):
+        taken = datetime.datetime(2021, 7, 1, 12, 0)
+        self.assertEqual(self.round_trip(taken, "Europe/Berlin", "America/New_York"), taken)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""
+Архив-источник: какая корневая папка раскрывается при построении индекса, для ZIP и TAR.
+
+Запуск: python -m pytest tests
+"""
+import io
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from folder_renamer import SourceArchive
+
+
+def write_zip(path, names):
+    with zipfile.ZipFile(path, "w") as archive:
+        for name in names:
+            archive.writestr(name, b"x")
+
+
+def write_tar(path, names, mode="w"):
+    with tarfile.open(path, mode) as archive:
+        for name in names:
+            info = tarfile.TarInfo(name)
+            info.size = 1
+            archive.addfile(info, io.BytesIO(b"x"))
+
+
+class RootUnwrapTest(unittest.TestCase):
+    
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+    
+    def folders(self, names):
+        """Папки источника по индексу ZIP, TAR и TAR.GZ с одинаковым содержимым; все три должны совпасть"""
+        result = {}
+        for suffix, write in ((".zip", write_zip), (".tar", write_tar),
+                              (".tar.gz", lambda path, items: write_tar(path, items, "w:gz"))):
+            path = os.path.join(self.root, f"source{suffix}")
+            write(path, names)
+            archive = SourceArchive(path)
+            try:
+                result[suffix] = archive.folder_names()
+            finally:
+                archive.close()
+        self.assertEqual(len({tuple(folders) for folders in result.values()}), 1, result)
+        return result[".zip"]
+    
+    def test_single_capture_folder_is_kept(self):
+        # Одна папка захвата без BestShot - это не обёртка вокруг папок Captures и Focus
+        self.assertEqual(self.folders(["cap1/Captures/a.jpg", "cap1/Focus/a.jpg"]), ["cap1"])
+    
+    def test_single_capture_folder_with_bestshot_is_kept(self):
+        self.assertEqual(self.folders(["cap1/BestShot.jpg", "cap1/Captures/a.jpg"]), ["cap1"])
+    
+    def test_wrapper_of_capture_folders_is_unwrapped(self):
+        names = ["export/cap1/BestShot.jpg", "export/cap1/Captures/a.jpg",
+                 "export/cap2/Focus/a.jpg", "export/cap10/BestShot.jpg"]
+        self.assertEqual(self.folders(names), ["cap1", "cap2", "cap10"])
+    
+    def test_wrapper_with_own_files_is_unwrapped(self):
+        self.assertEqual(self.folders(["export/readme.txt", "export/cap1/BestShot.jpg"]), ["cap1"])
+    
+    def test_wrapper_without_capture_folders_is_kept(self):
+        self.assertEqual(self.folders(["export/photos/a.jpg", "export/photos/b.jpg"]), ["export"])
+    
+    def test_several_top_folders(self):
+        self.assertEqual(self.folders(["cap2/Captures/a.jpg", "cap1/Captures/a.jpg"]), ["cap1", "cap2"])
+
+
+if __name__ == "__main__":
+    unittest.main()